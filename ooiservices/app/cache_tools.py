@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+'''
+ooiservices.cache_tools
+
+Helpers for values shared through the redis cache.
+
+VersionedValue keeps an in-process copy of a cached value. Each time the value is published a new
+version stamp is written next to it ('<key>_version'); readers compare the stamp with the version of
+their local copy and only fetch and unpickle the value itself when it has changed. With a
+check_interval, the version stamp itself is checked at most once every check_interval seconds; a new
+version published by another process is still seen at once by processes subscribed to invalidations
+(memory_cache).
+
+RefreshingValue serves a cached value while it is stale (stale-while-revalidate): a value older than
+its soft timeout is returned as is while a single worker rebuilds it in the background; a missing value
+(expired, or deleted through /cache_keys) is rebuilt by a single worker while the others wait for it.
+Rebuilds are single-flight across processes through a lock key in redis ('<key>_lock', set only if
+absent and released only by its holder). Hits, stale hits, misses and rebuild times are counted per key
+(cache_metrics).
+'''
+
+from flask import current_app
+from ooiservices.app import cache, redis_store
+from ooiservices.app.concurrency import run_in_background
+from ooiservices.app.memory_cache import on_invalidate, invalidate, start_listener
+import os
+import threading
+import time
+
+WAIT_INTERVAL = 0.5
+
+# Delete the lock key only if it still holds the token of the caller.
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def new_version():
+    """ Return a new, unique version stamp.
+    """
+    return '%.6f-%d' % (time.time(), os.getpid())
+
+
+class VersionedValue(object):
+    """ In-process copy of the cached value stored under key, reloaded when its version stamp changes.
+    """
+    def __init__(self, key, timeout=None, check_interval=None):
+        self.key = key
+        self.version_key = key + '_version'
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+        self._checked = 0
+        on_invalidate(self.version_key, self._expire)
+
+    def _expire(self):
+        self._checked = 0
+
+    def get(self):
+        """ Return the current value (None when not available).
+        """
+        start_listener()
+        if self.check_interval and self._version is not None and \
+                time.time() - self._checked < self.check_interval:
+            return self._value
+        version = cache.get(self.version_key)
+        if version is None:
+            return None
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    value = cache.get(self.key)
+                    if value is None:
+                        return None
+                    self._value, self._version = value, version
+        self._checked = time.time()
+        return self._value
+
+    def publish(self, value):
+        """ Store value in the cache with a new version stamp; returns the version.
+        """
+        version = new_version()
+        cache.set(self.key, value, timeout=self.timeout)
+        cache.set(self.version_key, version, timeout=self.timeout)
+        invalidate(self.version_key)
+        with self._lock:
+            self._value, self._version = value, version
+            self._checked = time.time()
+        return version
+
+    def clear(self):
+        """ Remove the value from the cache and the local copy.
+        """
+        cache.delete(self.key)
+        cache.delete(self.version_key)
+        with self._lock:
+            self._value, self._version = None, None
+        invalidate(self.version_key)
+
+
+def _count(key, name, seconds=None):
+    with _metrics_lock:
+        item = _metrics.get(key, None)
+        if item is None:
+            item = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'waits': 0, 'wait_timeouts': 0, 'rebuilds': 0,
+                    'background_rebuilds': 0, 'rebuild_errors': 0, 'rebuild_seconds': 0.0,
+                    'last_rebuild_seconds': None}
+            _metrics[key] = item
+        item[name] += 1
+        if seconds is not None:
+            item['rebuild_seconds'] += seconds
+            item['last_rebuild_seconds'] = seconds
+
+
+def cache_metrics():
+    """ Return {key: counters} for the refreshing values used by this process.
+    """
+    with _metrics_lock:
+        return dict((key, dict(item)) for key, item in _metrics.iteritems())
+
+
+class RefreshingValue(object):
+    """ Cached value served stale while it is rebuilt.
+
+    build() computes the value, caches it (as set does, or through its own publishing) and returns it;
+    read() returns the cached value, or None (default: cache.get(key)). Values older than soft_timeout
+    seconds are rebuilt in the background; timeout is the (hard) timeout the value is cached with. With a
+    check_interval, the build time is checked at most once every check_interval seconds. An optional store
+    (e.g. a sharded_cache.ShardedValue) reads and caches the value in place of cache.get and cache.set.
+    """
+    def __init__(self, key, build, soft_timeout, timeout, read=None, lock_timeout=600, wait_timeout=None,
+                 check_interval=None, store=None):
+        self.key = key
+        self.built_key = key + '_built'
+        self.lock_key = key + '_lock'
+        self.build = build
+        self.soft_timeout = soft_timeout
+        self.timeout = timeout
+        self.store = store
+        if read is None:
+            read = store.get if store is not None else (lambda: cache.get(key))
+        self.read = read
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout or lock_timeout
+        self.check_interval = check_interval
+        self._built = None
+        self._checked = 0
+
+    def get(self):
+        """ Return the value; stale values are returned while being rebuilt, missing values are built (or
+        waited for, when another worker is building). Raises an exception if the value can not be built.
+        """
+        value = self.read()
+        if value is not None:
+            built = self._built_time()
+            if built is None:
+                # Age unknown (cached without a build time); count it from now.
+                self.mark_built()
+                _count(self.key, 'hits')
+            elif time.time() - built > self.soft_timeout:
+                _count(self.key, 'stale_hits')
+                token = self._acquire()
+                if token:
+                    _count(self.key, 'background_rebuilds')
+                    run_in_background(self._rebuild, token)
+            else:
+                _count(self.key, 'hits')
+            return value
+
+        _count(self.key, 'misses')
+        deadline = time.time() + self.wait_timeout
+        waited = False
+        while True:
+            token = self._acquire()
+            if token:
+                return self._rebuild(token)
+            if not waited:
+                _count(self.key, 'waits')
+                waited = True
+            time.sleep(WAIT_INTERVAL)
+            value = self.read()
+            if value is not None:
+                return value
+            if time.time() > deadline:
+                _count(self.key, 'wait_timeouts')
+                message = 'Timed out waiting for %s to be rebuilt.' % self.key
+                current_app.logger.info(message)
+                raise Exception(message)
+
+    def set(self, value, timeout=None):
+        """ Cache value, recording its build time.
+        """
+        if self.store is not None:
+            self.store.set(value, timeout=timeout or self.timeout)
+        else:
+            cache.set(self.key, value, timeout=timeout or self.timeout)
+        self.mark_built()
+
+    def mark_built(self):
+        """ Record the value (cached by other means) as built now.
+        """
+        self._built = time.time()
+        self._checked = self._built
+        cache.set(self.built_key, self._built, timeout=self.timeout)
+
+    def _built_time(self):
+        now = time.time()
+        if self.check_interval and self._built is not None and now - self._checked < self.check_interval:
+            return self._built
+        self._built = cache.get(self.built_key)
+        self._checked = now
+        return self._built
+
+    def _acquire(self):
+        token = new_version()
+        if redis_store.set(self.lock_key, token, nx=True, ex=self.lock_timeout):
+            return token
+        return None
+
+    def _release(self, token):
+        try:
+            redis_store.eval(RELEASE_SCRIPT, 1, self.lock_key, token)
+        except Exception as err:
+            current_app.logger.info('Unable to release %s: %s' % (self.lock_key, str(err)))
+
+    def _rebuild(self, token):
+        start = time.time()
+        try:
+            value = self.build()
+            self.mark_built()
+            _count(self.key, 'rebuilds', time.time() - start)
+        except Exception:
+            _count(self.key, 'rebuild_errors')
+            raise
+        finally:
+            self._release(token)
+        if value is None:
+            value = self.read()
+        return value
@@ -1,4 +1,5 @@
 from celery.schedules import crontab
+from datetime import timedelta
 
 CELERYBEAT_SCHEDULE = {
     'get-assets-rd': {
@@ -46,4 +47,9 @@ CELERYBEAT_SCHEDULE = {
         'schedule': crontab(minute=0, hour='*/1'),
         'args': (),
         },
+    'poll-c2-instrument-status': {
+        'task': 'tasks.poll_c2_instrument_status',
+        'schedule': timedelta(seconds=15),
+        'args': (),
+        },
     }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+'''
+ooiservices.concurrency
+
+Bounded concurrent execution of blocking (uframe) requests.
+
+When the process has been monkey patched by gevent a gevent pool is used, otherwise a pool of
+threads. Each unit of work runs within its own application context (and a copy of the current
+request's path and query string, so functions reading request.args behave as in the request).
+'''
+
+from flask import current_app, request, has_request_context
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+
+
+def gevent_enabled():
+    """ True when gevent is installed and the socket module has been monkey patched.
+    """
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched('socket')
+    except ImportError:
+        return False
+
+
+def _context_factory():
+    """ Return a callable producing a new context equivalent to the current one.
+    """
+    app = current_app._get_current_object()
+    if has_request_context():
+        path = request.path
+        args = request.args.copy()
+        headers = list(request.headers.items())
+        return lambda: app.test_request_context(path, query_string=args, headers=headers)
+    return app.app_context
+
+
+def run_concurrently(func, items, max_workers=4, timeout=None):
+    """ Call func(item) for each item, with at most max_workers calls in progress at once.
+
+    Returns a list, in item order, of (result, error) tuples: error is None on success, otherwise
+    a message describing the failure. An item which has not completed timeout seconds after the
+    work started is reported as timed out (and its result discarded).
+    """
+    items = list(items)
+    if not items:
+        return []
+    make_context = _context_factory()
+
+    def work(item):
+        with make_context():
+            try:
+                return func(item), None
+            except Exception as err:
+                message = str(err.message) if getattr(err, 'message', None) else str(err)
+                current_app.logger.info('Concurrent request failed for %s: %s' % (item, message))
+                return None, message
+
+    max_workers = max(min(max_workers, len(items)), 1)
+    timed_out = (None, 'Timed out after %s seconds.' % timeout)
+
+    if gevent_enabled():
+        import gevent
+        from gevent.pool import Pool
+        pool = Pool(max_workers)
+        greenlets = [pool.spawn(work, item) for item in items]
+        gevent.joinall(greenlets, timeout=timeout)
+        results = []
+        for greenlet in greenlets:
+            if greenlet.ready():
+                results.append(greenlet.value)
+            else:
+                greenlet.kill(block=False)
+                results.append(timed_out)
+        return results
+
+    pool = ThreadPool(max_workers)
+    try:
+        pending = [pool.apply_async(work, (item,)) for item in items]
+        deadline = time.time() + timeout if timeout else None
+        results = []
+        for async_result in pending:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0)
+            async_result.wait(remaining)
+            if async_result.ready():
+                results.append(async_result.get())
+            else:
+                results.append(timed_out)
+        return results
+    finally:
+        # Do not wait for timed out work; the pool's threads exit when it completes.
+        pool.close()
+
+
+def run_in_background(func, *args):
+    """ Call func(*args) in the background (a greenlet or a daemon thread) within a copy of the current
+    context; exceptions are logged. Returns immediately.
+    """
+    make_context = _context_factory()
+
+    def work():
+        with make_context():
+            try:
+                func(*args)
+            except Exception as err:
+                message = str(err.message) if getattr(err, 'message', None) else str(err)
+                current_app.logger.info('Background work failed: %s' % message)
+
+    if gevent_enabled():
+        import gevent
+        gevent.spawn(work)
+        return
+    thread = threading.Thread(target=work)
+    thread.daemon = True
+    thread.start()
@@ -16,7 +16,7 @@ from ooiservices.app.models import (SystemEventDefinition, SystemEvent, UserEven
 from ooiservices.app.uframe.assets import get_assets
 from sqlalchemy import desc
 
-import requests
+from ooiservices.app.uframe.client import uframe_client
 import json
 import datetime as dt
 import calendar
@@ -1176,7 +1176,7 @@ def delete_alertfilter(id):
     try:
         uframe_url, timeout, timeout_read = get_uframe_alerts_info()
         url = "/".join([uframe_url, 'alertfilters', str(id)])
-        response = requests.delete(url, timeout=(timeout, timeout_read))
+        response = uframe_client.delete(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             message = '(%r) Failed to execute alertfilter deletion (id: %d)' % (response.status_code, id)
             raise Exception(message)
@@ -1205,7 +1205,7 @@ def get_alertfilter(id):
     try:
         uframe_url, timeout, timeout_read = get_uframe_alerts_info()
         url = "/".join([uframe_url, 'alertfilters', str(id)])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             message = '(%d) Failed to get alertfilter from uframe' % response.status_code
             if response.content is not None:
@@ -1348,7 +1348,7 @@ def uframe_create_alertfilter(uframe_data):
     uframe_url, timeout, timeout_read = get_uframe_alerts_info()
     url = "/".join([uframe_url, 'alertfilters'])
     data = json.dumps(uframe_data)
-    response = requests.post(url, timeout=(timeout, timeout_read), headers=headers(), data=data)
+    response = uframe_client.post(url, timeout=(timeout, timeout_read), headers=headers(), data=data)
     return response
 
 
@@ -1357,7 +1357,7 @@ def uframe_update_alertfilter(uframe_data, alertfilter_id):
     uframe_url, timeout, timeout_read = get_uframe_alerts_info()
     url = "/".join([uframe_url, 'alertfilters', str(alertfilter_id)])
     data = json.dumps(uframe_data)
-    response = requests.put(url, timeout=(timeout, timeout_read), headers=headers(), data=data)
+    response = uframe_client.put(url, timeout=(timeout, timeout_read), headers=headers(), data=data)
     return response
 
 
@@ -1379,7 +1379,7 @@ def uframe_acknowledge_alert_alarm(uframe_event_id, value):
         uframe_data['eventId'] = str(uframe_event_id)
         uframe_data['acknowledgedBy'] = str(value)
         data = json.dumps(uframe_data)
-        response = requests.put(url, timeout=(timeout, timeout_read), headers=headers(), data=data)
+        response = uframe_client.put(url, timeout=(timeout, timeout_read), headers=headers(), data=data)
         if response.status_code != 200:
             message = 'Failure to issue uframe acknowledge for alert_alarm (event id: %d) in uframe. ' % uframe_event_id
             current_app.logger.info('[uframe_acknowledge_alert_alarm] %s ' % message)
@@ -1410,7 +1410,7 @@ def uframe_instrument_available(ref):
         mooring, platform, instrument = ref.split('-', 2)
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, mooring, platform, instrument, 'metadata'])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             return bad_request('(%d) Failure to retrieve metadata from uframe.' % response.status_code)
         metadata = response.json()
@@ -1449,7 +1449,7 @@ def uframe_get_instrument_metadata(ref):
         mooring, platform, instrument = ref.split('-', 2)
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, mooring, platform, instrument, 'metadata'])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code == 200:
             metadata = response.json()
             if 'parameters' in metadata:
@@ -1459,7 +1459,7 @@ def uframe_get_instrument_metadata(ref):
 
         # Get instrument methods
         url = "/".join([uframe_url, mooring, platform, instrument])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code == 200:
             methods = response.json()
         if methods is None:
@@ -1468,7 +1468,7 @@ def uframe_get_instrument_metadata(ref):
         # Get streams for each method (expects unique list of methods from uframe; no duplicates)
         for method in methods:
             url = "/".join([uframe_url, mooring, platform, instrument, method])
-            response = requests.get(url, timeout=(timeout, timeout_read))
+            response = uframe_client.get(url, timeout=(timeout, timeout_read))
             if response.status_code == 200:
                 streams_data = response.json()
                 if streams_data is not None:
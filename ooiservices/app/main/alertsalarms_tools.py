@@ -6,8 +6,7 @@ Supporting functions used by assets and status dashboard (for alerts and alarms)
 __author__ = 'Edna Donoughe'
 
 from flask import current_app
-import requests
-import requests.exceptions
+from ooiservices.app.uframe.client import uframe_client
 from requests.exceptions import ConnectionError, Timeout
 import json
 
@@ -88,12 +87,50 @@ def _compile_asset_rds():
         return {}, []
 
 
+def _patch_asset_rds(asset_rds, rds, delta):
+    """ Update asset_rds (dictionary with key of asset_id) for the instruments added and removed since it was
+    compiled; rds are the instrument reference designators in the current toc and delta the toc delta
+    (lists of reference designators 'added', 'removed' and 'changed'). Asset ids are retrieved from uframe
+    only for reference designators (instruments, and their platforms and moorings) new to the toc; asset ids
+    of reference designators no longer in the toc are removed. Returns asset_rds.
+    """
+    def expand(rd):
+        parts = rd.split('-', 2)
+        return ['-'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+    current = set()
+    for rd in rds:
+        current.update(expand(rd))
+    previous = set()
+    for rd in (set(rds) - set(delta['added'])) | set(delta['removed']):
+        previous.update(expand(rd))
+
+    dropped = previous - current
+    for id, rd in asset_rds.items():
+        if rd in dropped:
+            del asset_rds[id]
+
+    uframe_url, timeout, timeout_read = get_uframe_assets_info()
+    for rd in sorted(current - previous):
+        try:
+            ids = get_asset_id_by_reference_designator(rd, uframe_url, timeout, timeout_read)
+        except Exception as err:
+            message = 'Exception raised in get_asset_id_by_reference_designator: %s' % err.message
+            raise Exception(message)
+        if ids:
+            ids.sort()
+            for id in ids:
+                if id not in asset_rds:
+                    asset_rds[id] = rd
+    return asset_rds
+
+
 def get_toc_information():
     """ Get uframe /sensor/inv/toc. If exception, log error and return empty list.
     """
     try:
         url, timeout, timeout_read = get_uframe_toc_url()
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code == 200:
             toc = response.json()
         else:
@@ -272,7 +309,7 @@ def get_asset_id_by_reference_designator(rd, uframe_url=None, timeout=None, time
 
         # Query uframe for reference designator asset ids.
         if debug: print '\n debug --- url: ', url
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             if info:
                 message = '(%d) Failed to get uframe asset id for reference designator: %s' % (response.status_code,rd)
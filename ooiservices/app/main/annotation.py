@@ -16,14 +16,14 @@ from datetime import datetime
 from dateutil.parser import parse as date_parse
 import sqlalchemy as sa
 import json
-import requests
+from ooiservices.app.uframe.client import uframe_client
 
 #List all annotations. build 6
 @api.route('/annotation/<string:instrument>/<string:stream>')
 def get_annotations(instrument,stream):
     try:
         url = current_app.config['UFRAME_ANNOTATION_URL'] + current_app.config['UFRAME_ANNOTATION_BASE']+"/find/"+instrument
-        r = requests.get(url)
+        r = uframe_client.get(url)
         data = r.json()
 
         return jsonify( {'annotations' : data }), 201
@@ -36,7 +36,7 @@ def get_annotations(instrument,stream):
 def get_all_annotations():
     try:
         url = current_app.config['UFRAME_ANNOTATION_URL'] + current_app.config['UFRAME_ANNOTATION_BASE']+"/find/all"
-        r = requests.get(url)
+        r = uframe_client.get(url)
         data = r.json()
 
         return jsonify( {'annotations' : data }), 200
@@ -62,7 +62,7 @@ def process_annotation(begin_dt,end_dt,annotation_text,ref_def,annotation_id=Non
     uframe_link = current_app.config['UFRAME_ANNOTATION_URL'] + current_app.config['UFRAME_ANNOTATION_BASE']
     annotation_url = "/".join([uframe_link,'add',ref_def])
 
-    r = requests.post(annotation_url , data=json.dumps(post_req) , timeout=10)
+    r = uframe_client.post(annotation_url , data=json.dumps(post_req) , timeout=10)
 
     if r.status_code == 200:
         return jsonify( {} ), 201
@@ -4,19 +4,22 @@ API v1.0 Command and Control (C2) routes
 """
 __author__ = 'Edna Donoughe'
 
-from flask import jsonify, current_app, request
+from flask import jsonify, current_app, request, g
 from ooiservices.app import cache
+from ooiservices.app.cache_tools import RefreshingValue
+from ooiservices.app.concurrency import run_concurrently
+from ooiservices.app.sharded_cache import ShardedValue
 from ooiservices.app.decorators import scope_required
 from ooiservices.app.main import api
 from ooiservices.app.main.errors import bad_request
 from ooiservices.app.main.authentication import auth
-from ooiservices.app.uframe.vocab import get_display_name_by_rd, get_long_display_name_by_rd
+from ooiservices.app.main.c2_status import (get_stored_statuses, get_stored_reference_designators,
+                                             store_statuses)
+from ooiservices.app.uframe.vocab import get_display_name_by_rd, resolve_names
 from ooiservices.app.models import Array
 import json, os
-import requests
-import requests.exceptions
+from ooiservices.app.uframe.client import uframe_client
 from requests.exceptions import ConnectionError, Timeout
-from datetime import datetime as dt
 from copy import deepcopy
 import datetime as dt
 import calendar
@@ -24,8 +27,11 @@ import pytz
 import tzlocal
 from operator import itemgetter
 import math
+import time
+import hashlib
 
 CACHE_TIMEOUT = 86400
+SOFT_TIMEOUT = 3600
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - -
@@ -88,7 +94,7 @@ def c2_get_array_current_status_display(array_code):
 
     toc = _compile_c2_toc()
     if toc is not None:
-        cache.set('c2_toc', toc, timeout=CACHE_TIMEOUT)
+        c2_toc_cache.set(toc)
     """
         print "[+] C2 toc cache reset..."
     else:
@@ -174,85 +180,156 @@ def c2_get_platform_current_status_display(reference_designator):
     Get C2 platform Current Status tab contents, return current_status_display.
     Was: #status = _c2_get_instrument_driver_status(instrument['reference_designator'])
     """
-    start = dt.datetime.now()
-    timing = False
     contents = []
-    platform_info = {}
     platform_deployment = _get_platform(reference_designator)
     if platform_deployment:
         platform_code = "-".join([platform_deployment['mooring_code'], platform_deployment['platform_code'] ])
         # Get instruments for this platform
         instruments, oinstruments = _get_instruments(platform_code)
+        # Get instrument operational status (based on instrument driver and agent status)
+        statuses = get_instrument_statuses(oinstruments)
         for instrument in instruments:
-            istart = dt.datetime.now()
             row = {}
             if not instrument['display_name']:
                 row['display_name'] = instrument['reference_designator']
             else:
                 row['display_name'] = instrument['display_name']
             row['reference_designator'] = instrument['reference_designator']
-
-            # Get instrument operational status based on instrument driver and agent status
-            status = _get_instrument_operational_status(instrument['reference_designator'])
-
-            row['operational_status'] = status
-            platform_info[instrument['reference_designator']] = row
-            if timing:
-                iend = dt.datetime.now()
-                iexecution_time = str(iend-istart)
-                message = '\t debug --- Execution time:  %s ' % iexecution_time
-                print '\n', message
-        # Create list of dictionaries representing row(s) for 'data' (ordered by reference_designator)
-        # 'data' == rows for initial grid ('Current Status')
-        for instrument_reference_designator in oinstruments:
-            if instrument_reference_designator in platform_info:
-                contents.append(platform_info[instrument_reference_designator])
-    if timing:
-        end = dt.datetime.now()
-        execution_time = str(end-start)
-        message = '\t debug --- Total Execution time:  %s ' % execution_time
-        print '\n', message
+            row['operational_status'] = statuses[instrument['reference_designator']]
+            contents.append(row)
 
     return jsonify(current_status_display=contents)
 
 
 def _get_instrument_operational_status(rd):
-    """ Get instrument operational status, using ping and instrument/api/rd.
+    """ Get instrument operational status, from the instrument status store (when updated within the last
+    C2_STATUS_MAX_AGE seconds); otherwise checked now, using ping and instrument/api/rd.
+    """
+    return get_instrument_statuses([rd])[rd]
+
+
+def _check_instrument_status(rd):
+    """ Check instrument operational status, using ping and instrument/api/rd; return a status store entry.
     """
     debug = False
-    status = 'Unknown'
+    entry = {'reference_designator': rd, 'operational_status': 'Unknown', 'ping': False, 'driver_state': None,
+             'error': None, 'updated': time.time()}
     offline_driver_states = ['DRIVER_STATE_UNCONFIGURED', 'DRIVER_STATE_DISCONNECTED',
                              'DRIVER_STATE_INSTRUMENT_DISCONNECTED']
     try:
         # If ping result is empty, instrument driver offline; otherwise instrument driver online
         temp = _c2_get_instrument_driver_ping(rd)
         if not temp:
-            status = 'Offline'
+            entry['operational_status'] = 'Offline'
         else:
             # instrument driver is running, check instrument agent...
+            entry['ping'] = True
             _status = get_instrument_status(rd)
             if _status:
                 if 'value' in _status:
                     if 'state' in _status['value']:
                         if _status['value']['state']:
                             current_driver_state = _status['value']['state']
+                            entry['driver_state'] = current_driver_state
                             if current_driver_state in offline_driver_states:
-                                status = 'Offline'
+                                entry['operational_status'] = 'Offline'
                             else:
-                                status = 'Online'
-                        else:
-                            status = 'Unknown'
+                                entry['operational_status'] = 'Online'
             else:
-                status = 'Offline'
+                entry['operational_status'] = 'Offline'
                 message = 'Instrument driver running; instrument status returned empty state.'
                 current_app.logger.warning(message)
 
-        if debug: print '\n debug --- operational status: ', status
-        return status
+        if debug: print '\n debug --- operational status: ', entry['operational_status']
+        return entry
     except Exception as err:
         if debug: print '\n debug --- Exception - operational status: ', 'Unknown'
         current_app.logger.warning(err.message)
-        return 'Unknown'
+        entry['error'] = str(err.message)
+        return entry
+
+
+def get_instrument_statuses(reference_designators):
+    """ Get the operational status of instruments, {rd: status}, from the instrument status store. The status
+    of instruments not stored (or not updated within the last C2_STATUS_MAX_AGE seconds) is checked now.
+    """
+    entries = get_stored_statuses(reference_designators, current_app.config.get('C2_STATUS_MAX_AGE', 300))
+    missing = [rd for rd, entry in entries.iteritems() if entry is None]
+    if missing:
+        entries.update(refresh_instrument_statuses(missing))
+    return dict((rd, entry['operational_status']) for rd, entry in entries.iteritems())
+
+
+def refresh_instrument_statuses(reference_designators=None):
+    """ Check the operational status of instruments (all instruments in the C2 toc when reference_designators
+    is None; stored statuses of instruments no longer in the toc are then removed) and store them.
+    Returns {rd: status store entry}.
+    """
+    remove = None
+    if reference_designators is None:
+        toc = _get_toc()
+        if not toc:
+            raise Exception('Unable to get C2 toc; instrument statuses not refreshed.')
+        reference_designators = sorted(set([instrument['reference_designator'] for instrument in toc['instruments']]))
+        remove = list(set(get_stored_reference_designators()) - set(reference_designators))
+    entries = collect_instrument_statuses(reference_designators, get_status=_check_instrument_status, default=None)
+    for rd in entries:
+        if entries[rd] is None:
+            entries[rd] = {'reference_designator': rd, 'operational_status': 'Unknown', 'ping': False,
+                           'driver_state': None, 'error': 'Status not available in time.', 'updated': time.time()}
+    try:
+        store_statuses(entries.values(), remove)
+    except Exception as err:
+        current_app.logger.info('Unable to store instrument statuses: %s' % str(err))
+    return entries
+
+
+@api.route('/c2/instrument/<string:reference_designator>/status/refresh', methods=['POST'])
+@auth.login_required
+@scope_required(u'command_control')
+def c2_refresh_instrument_status(reference_designator):
+    """ Check the operational status of an instrument now and update the instrument status store; return the
+    status store entry.
+    Sample: http://localhost:4000/c2/instrument/CP02PMCO-WFP01-05-PARADK000/status/refresh [POST]
+    """
+    try:
+        if not _get_instrument(reference_designator):
+            return bad_request('unknown instrument (reference_designator: \'%s\')' % reference_designator)
+        entries = refresh_instrument_statuses([reference_designator])
+        return jsonify(status=entries[reference_designator])
+    except Exception as err:
+        return bad_request(err.message)
+
+
+def collect_instrument_statuses(reference_designators, get_status=None, default='Unknown'):
+    """ Get the status of each instrument concurrently, at most C2_STATUS_WORKERS at a time; get_status(rd)
+    defaults to _get_instrument_operational_status. The instrument/api requests made for an instrument are
+    limited to C2_STATUS_TIMEOUT seconds (each); an instrument whose status fails or is not returned in time
+    is given the default status. Returns {reference_designator: status}.
+    """
+    get_status = get_status or _get_instrument_operational_status
+    reference_designators = list(reference_designators)
+    if not reference_designators:
+        return {}
+    max_workers = current_app.config.get('C2_STATUS_WORKERS', 8)
+    deadline = current_app.config.get('C2_STATUS_TIMEOUT', 10)
+
+    def instrument_status(rd):
+        g.c2_timeout_read = deadline
+        return get_status(rd)
+
+    # Each instrument makes at most two requests (ping, status); bound the collection as a whole accordingly.
+    rounds = int(math.ceil(len(reference_designators) / float(max_workers)))
+    timeout = rounds * 2 * (deadline + current_app.config['UFRAME_TIMEOUT_CONNECT'])
+    results = run_concurrently(instrument_status, reference_designators, max_workers=max_workers, timeout=timeout)
+    statuses = {}
+    for rd, (status, error) in zip(reference_designators, results):
+        if error is not None:
+            current_app.logger.info('Status of %s not available: %s' % (rd, error))
+            status = default
+        statuses[rd] = status
+    return statuses
+
 
 @api.route('/c2/platform/<string:reference_designator>/history', methods=['GET'])
 @auth.login_required
@@ -270,7 +347,6 @@ def c2_get_platform_history(reference_designator):
     return jsonify(history=history)
 
 
-# todo put content processing back in.
 @api.route('/c2/platform/<string:reference_designator>/ports_display', methods=['GET'])
 @auth.login_required
 @scope_required(u'command_control')
@@ -294,8 +370,6 @@ def c2_get_platform_ports_display(reference_designator):
                        ]}
     """
     contents = []
-    '''
-    platform_info = {}
     if not reference_designator:
         return bad_request('reference_designator parameter empty.')
     platform_deployment = _get_platform(reference_designator)
@@ -303,7 +377,9 @@ def c2_get_platform_ports_display(reference_designator):
         # Get instruments for this platform
         platform_code = "-".join([platform_deployment['mooring_code'], platform_deployment['platform_code'] ])
         instruments, oinstruments = _get_instruments(platform_code)
-        # create list of reference_designators (instruments) and accumulate dict result (key=reference_designator) for output
+        # Get instrument driver status for all instruments, concurrently
+        statuses = collect_instrument_statuses(oinstruments, get_status=_c2_get_instrument_driver_status,
+                                               default={})
         for instrument_deployment in instruments:
             rd = instrument_deployment['reference_designator']
             port    = rd[15:15+2]
@@ -324,19 +400,8 @@ def c2_get_platform_ports_display(reference_designator):
                 row['display_name'] = rd
             else:
                 row['display_name'] = instrument_deployment['display_name']
-            try:
-                status = _c2_get_instrument_driver_status(rd)
-            except:
-                status = {}
-            row['instrument_status'] = status
-            platform_info[rd] = row
-
-        # Create list of dictionaries representing row(s) for 'data' (ordered by reference_designator)
-        # 'data' == rows for initial grid ('Current Status')
-        for instrument_reference_designator in oinstruments:
-            if instrument_reference_designator in platform_info:
-                contents.append(platform_info[instrument_reference_designator])
-    '''
+            row['instrument_status'] = statuses[rd] or {}
+            contents.append(row)
     return jsonify(ports_display=contents)
 
 #TODO complete with commands from uframe when platform/api available (post R5)
@@ -594,9 +659,21 @@ def json_get_uframe_platform_commands(platform):
 def c2_get_instruments_status():
     """ Get status of all instrument agents, return json.
     Sample: localhost:12572/instrument/api
+
+    With the query argument platform (a platform reference designator), return the operational status
+    of each instrument on the platform instead (see get_instrument_statuses):
+        [{'reference_designator': rd, 'operational_status': 'Online'|'Offline'|'Unknown'}, ...]
+    Sample: localhost:4000/c2/instruments/status?platform=CP02PMCO-WFP01
     """
     statuses = []
     try:
+        platform = request.args.get('platform', None)
+        if platform:
+            _, oinstruments = _get_instruments(platform)
+            operational_statuses = get_instrument_statuses(oinstruments)
+            statuses = [{'reference_designator': rd, 'operational_status': operational_statuses[rd]}
+                        for rd in oinstruments]
+            return jsonify(statuses=statuses)
         data = _c2_get_instruments_status()
         if data:
             statuses = data
@@ -748,7 +825,7 @@ def uframe_get_instruments_status():
     """
     try:
         url, timeout, timeout_read = get_uframe_info()
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         return response
     except Exception as err:
         message = str(err.message)
@@ -818,39 +895,20 @@ def _c2_get_instrument_driver_status(reference_designator):
                 pass
             data['streams'] = streams
 
-            # - - - - - - - - - - - - - - - - - - - - - -
-            # Get READ_WRITE display_parameters for pull downs
-            # - - - - - - - - - - - - - - - - - - - - - -
+            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+            # Get READ_WRITE, READ_ONLY and IMMUTABLE display_parameters for pull downs (processed once
+            # per driver metadata, see get_driver_metadata)
+            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+            data['parameter_display_values'] = {}
+            data['ro_parameter_display_values'] = {}
             try:
-                _params = None
-                if data['value']['metadata']:
-                    _params = data['value']['metadata']['parameters']
-                temp = {}
-                if _params:
-                    temp = get_parameter_display_values(_params)
-                data['parameter_display_values'] = temp
+                metadata = get_driver_metadata(reference_designator, data)
+                if metadata is not None:
+                    data['parameter_display_values'] = metadata['parameter_display_values']
+                    data['ro_parameter_display_values'] = metadata['ro_parameter_display_values']
             except Exception as err:
-                message = 'Exception from get_parameter_display_values: %s' % str(err)
+                message = 'Exception from get_driver_metadata: %s' % str(err)
                 current_app.logger.info(message)
-                data['parameter_display_values'] = {}
-                pass
-
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            # Get READ_ONLY and IMMUTABLE display_parameters for pull downs
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            try:
-                _params = None
-                if data['value']['metadata']:
-                    _params = data['value']['metadata']['parameters']
-                temp = {}
-                if _params:
-                    temp = get_ro_parameter_display_values(_params)
-                data['ro_parameter_display_values'] = temp
-            except Exception as err:
-                message = 'Exception from get_ro_parameter_display_values: %s' % str(err)
-                current_app.logger.info(message)
-                data['ro_parameter_display_values'] = {}
-                pass
 
         return data
     except Exception:
@@ -864,7 +922,7 @@ def uframe_get_instrument_driver_status(reference_designator):
     try:
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, reference_designator])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response is None:
             message = 'instrument driver status returned None.'
             current_app.logger.info(message)
@@ -987,15 +1045,16 @@ def _c2_get_instrument_driver_parameters(reference_designator):
     response_status['message'] = ""
     try:
         data = {}
-        # Get instrument status, retrieve parameters and state
+        # Get instrument status (state read live), parameters processed once per driver metadata
         try:
-            status = _c2_get_instrument_driver_status(reference_designator)
+            status = get_instrument_status(reference_designator)
+            metadata = get_driver_metadata(reference_designator, status)
         except:
-            status = None
+            metadata = None
 
         state = None
         # Error: unable to obtain current instrument status; retry
-        if status is None:
+        if metadata is None:
             response_status['status_code'] = 400
             response_status['message'] = "unable to obtain instrument parameters and state; retry."
             data['response'] = response_status
@@ -1008,13 +1067,10 @@ def _c2_get_instrument_driver_parameters(reference_designator):
         else:
             data = {}
             # verify parameters and state are in status
-            status_value = status['value']
-            if 'parameters' in status['value']['metadata'] and 'state' in status['value']:
-                if 'parameters' in status['value']['metadata']:
-                    data['parameters'] = status['value']['metadata']['parameters']
-                if 'state' in status_value:
-                    data['state'] = status['value']['state']
-                    state = status['value']['state']
+            if metadata['parameters'] is not None and 'state' in status['value']:
+                data['parameters'] = metadata['parameters']
+                data['state'] = status['value']['state']
+                state = status['value']['state']
             # missing parameters and state, set response_status accordingly (error)
             else:
                 response_status['status_code'] = 400
@@ -1100,7 +1156,7 @@ def uframe_get_instrument_driver_parameter_values(reference_designator, command)
     try:
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, reference_designator, command])
-        response = requests.get(url, timeout=(timeout, timeout_read),
+        response = uframe_client.get(url, timeout=(timeout, timeout_read),
                                 data={'resource': json.dumps('DRIVER_PARAMETER_ALL')})
         return response
     except Exception as err:
@@ -1772,57 +1828,61 @@ def get_ro_parameter_display_values(parameters):
         raise
 
 
-def get_range_dictionary(resource, _status, reference_designator):
-    """
+def _get_parameter_key_dict(parameters):
+    """ Get the type, display name, description and range of each READ_WRITE parameter in the instrument
+    'parameters' dictionary (as used by populate_and_check_range_values).
     """
     key_dict = {}
-    parameter_dict = {}
-    try:
-        # Get parameters from status.
-        _parameters = get_instrument_parameters(_status)
-        if _parameters is None:
-            message = 'Failed to retrieve instrument (%s) parameters from status.' % reference_designator
-            raise Exception(message)
-
-        # Create parameter type dictionary.
-        _parameters_list = _parameters.keys()
-        for parameter in _parameters_list:
+    for parameter in parameters.keys():
 
-            # Process READ_WRITE_parameters
-            tmp = _parameters[parameter]
+        # Process READ_WRITE_parameters
+        tmp = parameters[parameter]
 
-            if tmp['visibility'] == 'READ_WRITE':
+        if tmp['visibility'] == 'READ_WRITE':
 
-                parameter_dict[parameter] = str(tmp['value']['type'])
+            # Create range value checking dictionary
+            key_dict[parameter] = {}
+            key_dict[parameter]['type'] = str(tmp['value']['type'])
+            key_dict[parameter]['display_name'] = str(tmp['display_name'])
+            if 'description' in tmp:
+                key_dict[parameter]['desc'] = str(tmp['description'])
+            else:
+                key_dict[parameter]['desc'] = None
 
-                # Create range value checking dictionary
-                key_dict[parameter] = {}
-                key_dict[parameter]['type'] = str(tmp['value']['type'])
-                key_dict[parameter]['display_name'] = str(tmp['display_name'])
-                if 'description' in tmp:
-                    key_dict[parameter]['desc'] = str(tmp['description'])
+            # Prepare for instrument parameters without 'range' attribute
+            if 'range' in tmp:
+                if tmp['range'] is None or not tmp['range']:
+                    key_dict[parameter]['range'] = None
                 else:
-                    key_dict[parameter]['desc'] = None
+                    key_dict[parameter]['range'] = tmp['range']
+            else:
+                key_dict[parameter]['range'] = None
 
-                # Prepare for instrument parameters without 'range' attribute
-                if 'range' in tmp:
-                    if tmp['range'] is None or not tmp['range']:
-                        key_dict[parameter]['range'] = None
-                    else:
-                        key_dict[parameter]['range'] = tmp['range']
-                else:
-                    key_dict[parameter]['range'] = None
+            key_dict[parameter]['min'] = None
+            key_dict[parameter]['max'] = None
+            key_dict[parameter]['set'] = []
+    return key_dict
 
-                key_dict[parameter]['min'] = None
-                key_dict[parameter]['max'] = None
-                key_dict[parameter]['set'] = []
 
+def get_range_dictionary(resource, _status, reference_designator):
+    """ Get the types (parameter_dict) and ranges (key_dict_ranges) of the READ_WRITE parameters in resource,
+    from the processed metadata of the instrument driver (_status).
+    """
+    try:
+        metadata = get_driver_metadata(reference_designator, _status)
+        if metadata is None or metadata['parameters'] is None:
+            message = 'Failed to retrieve instrument (%s) parameters from status.' % reference_designator
+            raise Exception(message)
+
+        parameter_dict = metadata['parameter_types']
         if resource is None or not parameter_dict:
             message = 'The payload [resource] element is None or parameters dictionary is empty.'
             raise Exception(message)
 
         # Utilize parameter 'range' attribute
-        key_dict_ranges = populate_and_check_range_values(resource, key_dict)
+        key_dict_ranges = {}
+        for parameter in resource:
+            key_dict_ranges[parameter] = metadata['ranges'][parameter]
 
         return parameter_dict, key_dict_ranges
 
@@ -1832,6 +1892,48 @@ def get_range_dictionary(resource, _status, reference_designator):
         raise
 
 
+def _driver_metadata_key(reference_designator):
+    return 'c2_driver_metadata_%s' % reference_designator
+
+
+def process_driver_metadata(status):
+    """ Process the metadata of an instrument driver status (as returned by _c2_get_instrument_driver_status):
+    returns the parameters, the types and ranges of READ_WRITE parameters and the parameter display values.
+    """
+    parameters = None
+    if status['value'].get('metadata', None):
+        parameters = status['value']['metadata'].get('parameters', None)
+    result = {'parameters': parameters, 'parameter_types': {}, 'ranges': {},
+              'parameter_display_values': {}, 'ro_parameter_display_values': {}}
+    if parameters:
+        key_dict = _get_parameter_key_dict(parameters)
+        result['parameter_types'] = dict((key, value['type']) for key, value in key_dict.iteritems())
+        result['ranges'] = populate_and_check_range_values(key_dict, key_dict)
+        result['parameter_display_values'] = get_parameter_display_values(parameters)
+        result['ro_parameter_display_values'] = get_ro_parameter_display_values(parameters) or {}
+    return result
+
+
+def get_driver_metadata(reference_designator, status):
+    """ Get the processed parameter metadata (see process_driver_metadata) of an instrument driver status just
+    retrieved, with the 'hash' of the driver metadata. Driver metadata only changes when the driver is
+    restarted, so the result is cached per instrument and reused while the hash is unchanged. The driver
+    state is not cached; read it from the status. Returns None when the status has no value.
+    """
+    if not status or 'value' not in status:
+        return None
+    key = _driver_metadata_key(reference_designator)
+    metadata = status['value'].get('metadata', None)
+    digest = hashlib.sha1(json.dumps(metadata, sort_keys=True)).hexdigest()
+    cached = cache.get(key)
+    if cached is not None and cached['hash'] == digest:
+        return cached
+    result = process_driver_metadata(status)
+    result['hash'] = digest
+    cache.set(key, result, timeout=current_app.config.get('C2_DRIVER_METADATA_TIMEOUT', 3600))
+    return result
+
+
 @api.route('/c2/instrument/<string:reference_designator>/get_last_particle/<string:_method>/<string:_stream>',
            methods=['GET'])
 @auth.login_required
@@ -2087,7 +2189,7 @@ def get_uframe_stream_contents(mooring, platform, instrument, stream_type, strea
         uframe_url, timeout, timeout_read = get_uframe_data_info()
         rd = '-'.join([mooring, platform, instrument])
         url = "/".join([uframe_url, mooring, platform, instrument, stream_type, stream + query])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if not response or response is None:
             message = 'No data available from uFrame for this request. Instrument: %s, Method: %s, Stream: %s' % \
                             (instrument, stream_type, stream)
@@ -2150,7 +2252,7 @@ def _c2_get_instrument_metadata(reference_designator):
         uframe_url, timeout, timeout_read = get_uframe_data_info()
         mooring, platform, instrument = reference_designator.split('-', 2)
         url = '/'.join([uframe_url, mooring, platform, instrument, 'metadata'])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         return response
     except ConnectionError:
         message = 'ConnectionError for get instrument metadata (%s).' % reference_designator
@@ -2401,7 +2503,7 @@ def _uframe_post_instrument_driver_set(reference_designator, command, data):
             timeout_read = 200
         url = "/".join([uframe_url, reference_designator, command])
         if debug: print '\n debug -- (_uframe_post_instrument_driver_set) url: ', url
-        response = requests.post(url, data=data, timeout=(timeout, timeout_read), headers=_post_headers())
+        response = uframe_client.post(url, data=data, timeout=(timeout, timeout_read), headers=_post_headers())
         return response
 
     except ConnectionError:
@@ -2835,7 +2937,7 @@ def uframe_get_instrument_driver_command(reference_designator, command):
     try:
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, reference_designator, command])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         return response
 
     except ConnectionError:
@@ -2860,7 +2962,7 @@ def uframe_post_instrument_driver_command(reference_designator, command, suffix)
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, reference_designator, command])
         url = "?".join([url, suffix])
-        response = requests.post(url, timeout=(timeout, timeout_read), headers=_post_headers())
+        response = uframe_client.post(url, timeout=(timeout, timeout_read), headers=_post_headers())
         return response
     except ConnectionError:
         message = 'ConnectionError for post instrument driver command.'
@@ -2884,6 +2986,8 @@ def get_uframe_info(type='instrument'):
             uframe_url = "".join([current_app.config['UFRAME_INST_URL'], current_app.config['UFRAME_PLAT_BASE']])
         timeout = current_app.config['UFRAME_TIMEOUT_CONNECT']
         timeout_read = current_app.config['UFRAME_TIMEOUT_READ']
+        # Requests made for collect_instrument_statuses are limited to its per-instrument deadline.
+        timeout_read = min(timeout_read, getattr(g, 'c2_timeout_read', None) or timeout_read)
         return uframe_url, timeout, timeout_read
     except ConnectionError:
         message = 'ConnectionError for instrument/api configuration values.'
@@ -2995,20 +3099,26 @@ def _eval_POST_response_data(response_data, msg=None):
         raise
 
 
+def _build_c2_toc():
+    toc = _compile_c2_toc()
+    if toc is None:
+        message = 'Unable to compile C2 toc.'
+        raise Exception(message)
+    c2_toc_cache.set(toc)
+    return toc
+
+
+# The toc (with its index) is also held decoded in each worker's memory cache.
+c2_toc_store = ShardedValue('c2_toc', timeout=CACHE_TIMEOUT)
+c2_toc_cache = RefreshingValue('c2_toc', _build_c2_toc, SOFT_TIMEOUT, CACHE_TIMEOUT, store=c2_toc_store)
+
+
 def _get_toc():
     """ Returns a toc dictionary of arrays, moorings, platforms and instruments.
-    Augmented by the UI database for vocabulary and arrays.
+    Augmented by the UI database for vocabulary and arrays. Served from cache (rebuilt when stale or missing).
     """
     try:
-
-        cached = cache.get('c2_toc')
-        if cached:
-            toc = cached
-        else:
-            toc = _compile_c2_toc()
-            if toc is not None:
-                cache.set('c2_toc', toc, timeout=CACHE_TIMEOUT)
-        return toc
+        return c2_toc_cache.get()
 
     except Exception as err:
         message = str(err.message)
@@ -3023,6 +3133,10 @@ def _compile_c2_toc_standard():
     Note: was named _compile_c2_toc, but changed when we went with C2 toc
     from instruments (instrument/api) and not data on 12576.
     To retrieve C2 toc from data port (12576) use this function.
+
+    Each level of the hierarchy (platforms of all moorings, instruments of all platforms, then the stream
+    methods of all instruments) is requested concurrently, C2_TOC_WORKERS requests at a time, using the
+    pooled uframe sessions; display names are resolved in bulk once the hierarchy is known.
     """
     # Use instrument/api server for toc info
     tmp_uframe_base = current_app.config['UFRAME_INST_URL']
@@ -3030,50 +3144,85 @@ def _compile_c2_toc_standard():
     UFRAME_DATA = uframe_base + current_app.config['UFRAME_URL_BASE']
     timeout = current_app.config['UFRAME_TIMEOUT_CONNECT']
     timeout_read = current_app.config['UFRAME_TIMEOUT_READ']
+    max_workers = current_app.config.get('C2_TOC_WORKERS', 8)
+
+    def get_children(path):
+        url = "/".join([UFRAME_DATA] + list(path))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
+        if response.status_code != 200:
+            raise Exception('(%d) Failed to get %s' % (response.status_code, url))
+        return response.json()
+
+    def log_progress(message):
+        current_app.logger.info('C2 toc crawl: %s (%.2f seconds)' % (message, time.time() - start))
+
     try:
+        start = time.time()
         toc = {}
         mooring_list = []
         platform_list = []
         instrument_list = []
         url = "/".join([UFRAME_DATA])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             raise Exception('uframe connection cannot be made.')
         moorings = response.json()
+        log_progress('%d moorings' % len(moorings))
+
+        # Platforms of all moorings
+        platform_paths = []
+        results = run_concurrently(lambda mooring: get_children([mooring]), moorings, max_workers=max_workers)
+        for mooring, (platforms, error) in zip(moorings, results):
+            if error is None:
+                platform_paths.extend([(mooring, platform) for platform in platforms])
+        log_progress('%d platforms' % len(platform_paths))
+
+        # Instruments of all platforms; verify valid reference designators, skip those malformed
+        instrument_paths = []
+        results = run_concurrently(get_children, platform_paths, max_workers=max_workers)
+        for (mooring, platform), (instruments, error) in zip(platform_paths, results):
+            if error is None:
+                for instrument in instruments:
+                    reference_designator = _get_validate_instrument_rd(mooring, platform, instrument,
+                                                                       check_streams=False)
+                    if reference_designator is not None:
+                        instrument_paths.append((mooring, platform, instrument, reference_designator))
+        log_progress('%d instruments' % len(instrument_paths))
+
+        # Keep instruments with streams
+        results = run_concurrently(_instrument_has_streams, [path[3] for path in instrument_paths],
+                                   max_workers=max_workers)
+        instrument_paths = [path for path, (has_streams, _) in zip(instrument_paths, results) if has_streams]
+        log_progress('%d instruments with streams' % len(instrument_paths))
+
+        names = resolve_names(moorings + ["-".join(path) for path in platform_paths] +
+                              [path[3] for path in instrument_paths])
         for mooring in moorings:
             mooring_list.append({'reference_designator': mooring,
                                  'array_code': mooring[:2],
-                                 'display_name': get_display_name_by_rd(mooring)
+                                 'display_name': names[mooring]['name']
                                  })
-            url = "/".join([UFRAME_DATA, mooring])
-            response = requests.get(url, timeout=(timeout, timeout_read))
-            if response.status_code == 200:
-                platforms = response.json()
-                for platform in platforms:
-                    platform_list.append({'reference_designator': "-".join([mooring, platform]),
-                                          'mooring_code': mooring,
-                                          'platform_code': platform,
-                                          'display_name': get_long_display_name_by_rd("-".join([mooring, platform]))
-                                          })
-                    url = "/".join([UFRAME_DATA, mooring, platform])
-                    response = requests.get(url, timeout=(timeout, timeout_read))
-                    if response.status_code == 200:
-                        instruments = response.json()
-                        for instrument in instruments:
-                            # Verify valid reference designator, if not skip
-                            reference_designator = _get_validate_instrument_rd(mooring, platform, instrument)
-                            if reference_designator is not None:
-                                instrument_list.append({'mooring_code': mooring,
-                                                        'platform_code': platform,
-                                                        'instrument_code': instrument,
-                                                        'reference_designator': reference_designator,
-                                                        'display_name': get_display_name_by_rd(reference_designator)
-                                                        })
-                arrays = Array.query.all()
-                toc['arrays'] = [array.to_json() for array in arrays]
-                toc['moorings'] = mooring_list
-                toc['platforms'] = platform_list
-                toc['instruments'] = instrument_list
+        for mooring, platform in platform_paths:
+            platform_list.append({'reference_designator': "-".join([mooring, platform]),
+                                  'mooring_code': mooring,
+                                  'platform_code': platform,
+                                  'display_name': names["-".join([mooring, platform])]['long_name']
+                                  })
+        for mooring, platform, instrument, reference_designator in instrument_paths:
+            instrument_list.append({'mooring_code': mooring,
+                                    'platform_code': platform,
+                                    'instrument_code': instrument,
+                                    'reference_designator': reference_designator,
+                                    'display_name': names[reference_designator]['name']
+                                    })
+        if moorings:
+            arrays = Array.query.all()
+            toc['arrays'] = [array.to_json() for array in arrays]
+            toc['moorings'] = mooring_list
+            toc['platforms'] = platform_list
+            toc['instruments'] = instrument_list
+            toc['index'] = index_c2_toc(toc)
+        log_progress('completed')
 
         return toc
 
@@ -3091,8 +3240,9 @@ def _compile_c2_toc_standard():
         return None
 
 
-def _get_validate_instrument_rd(mooring, platform, instrument):
-    """ Verify an instrument reference designator is not malformed; if malformed, return None.
+def _get_validate_instrument_rd(mooring, platform, instrument, check_streams=True):
+    """ Verify an instrument reference designator is not malformed (and, when check_streams, has streams);
+    if malformed, return None.
     """
     if mooring is None:
         return None
@@ -3115,7 +3265,7 @@ def _get_validate_instrument_rd(mooring, platform, instrument):
     if rd:
         if len(rd) != 27:
             return None
-        if not _instrument_has_streams(rd):
+        if check_streams and not _instrument_has_streams(rd):
             return None
         return rd
 
@@ -3163,13 +3313,8 @@ def _get_platforms(array):
     try:
         dataset = _get_toc()
         if dataset:
-            _platforms = dataset['platforms']
-            platforms = []
-            if _platforms:
-                for platform in _platforms:
-                    if platform['reference_designator'][0:2] == array:
-                        platforms.append(platform)
-            return platforms
+            index = _get_toc_index(dataset)
+            return [dataset['platforms'][i] for i in index['array_platforms'].get(array, [])]
     except:
         return None
 
@@ -3180,13 +3325,8 @@ def _get_platform(reference_designator):
     try:
         dataset = _get_toc()
         if dataset:
-            platforms = dataset['platforms']
-            platform_deployment = None
-            for platform in platforms:
-                if platform['reference_designator'] == reference_designator:
-                    platform_deployment = platform
-                    break
-            return platform_deployment
+            i = _get_toc_index(dataset)['platforms'].get(reference_designator, None)
+            return dataset['platforms'][i] if i is not None else None
     except:
         return None
 
@@ -3197,13 +3337,8 @@ def _get_instrument(reference_designator):
     try:
         dataset = _get_toc()
         if dataset:
-            instruments = dataset['instruments']
-            _instrument = None
-            for instrument in instruments:
-                if instrument['reference_designator'] == reference_designator:
-                    _instrument = instrument
-                    break
-            return _instrument
+            i = _get_toc_index(dataset)['instruments'].get(reference_designator, None)
+            return dataset['instruments'][i] if i is not None else None
     except:
         return None
 
@@ -3215,14 +3350,47 @@ def _get_instruments(platform):
     oinstruments = []       # list of reference_designators
     dataset = _get_toc()
     _instruments = dataset['instruments']
-    for instrument in _instruments:
-        if platform in instrument['reference_designator']:
-            if instrument['reference_designator'] not in oinstruments:
-                oinstruments.append(instrument['reference_designator'])
-                instruments.append(instrument)
+    positions = _get_toc_index(dataset)['platform_instruments'].get(platform, None)
+    if positions is None:
+        # Not a platform reference designator; match instruments containing it.
+        positions = [i for i, instrument in enumerate(_instruments) if platform in instrument['reference_designator']]
+    for i in positions:
+        instrument = _instruments[i]
+        if instrument['reference_designator'] not in oinstruments:
+            oinstruments.append(instrument['reference_designator'])
+            instruments.append(instrument)
     return instruments, oinstruments
 
 
+def index_c2_toc(toc):
+    """ Returns the index of a C2 toc: the positions (in toc['platforms'] and toc['instruments']) of each
+    platform and instrument by reference designator, of the platforms of each array and of the instruments
+    of each platform (in toc order):
+        {'platforms': {rd: i}, 'instruments': {rd: i}, 'array_platforms': {array_code: [i, ...]},
+         'platform_instruments': {platform rd: [i, ...]}}
+    """
+    index = {'platforms': {}, 'instruments': {}, 'array_platforms': {}, 'platform_instruments': {}}
+    for i, platform in enumerate(toc.get('platforms', [])):
+        rd = platform['reference_designator']
+        index['platforms'].setdefault(rd, i)
+        index['array_platforms'].setdefault(rd[0:2], []).append(i)
+    for i, instrument in enumerate(toc.get('instruments', [])):
+        rd = instrument['reference_designator']
+        index['instruments'].setdefault(rd, i)
+        index['platform_instruments'].setdefault(rd[0:14], []).append(i)
+    return index
+
+
+def _get_toc_index(toc):
+    """ Returns the index of the C2 toc, compiled with the toc (indexed now for tocs cached without one).
+    """
+    index = toc.get('index', None)
+    if index is None:
+        index = index_c2_toc(toc)
+        toc['index'] = index
+    return index
+
+
 @api.route('/c2/instrument/<string:reference_designator>/metadata', methods=['GET'])
 @auth.login_required
 @scope_required(u'command_control')
@@ -3440,7 +3608,8 @@ def c2_get_toc():
     try:
         data = _compile_c2_toc()
         if data:
-            toc = data
+            toc = dict(data)
+            toc.pop('index', None)
         return jsonify(toc)
     except Exception as err:
         return bad_request(err.message)
@@ -3491,9 +3660,9 @@ def _compile_c2_toc():
             . . .
         ]
     """
-    moorings = []
-    platforms = []
-    instruments = []
+    moorings = set()
+    platforms = set()
+    instruments = set()
     try:
         toc = {}
         mooring_list = []
@@ -3507,7 +3676,7 @@ def _compile_c2_toc():
 
         # Get list of instruments from instrument/api
         uframe_url, timeout, timeout_read = get_uframe_info()
-        response = requests.get(uframe_url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(uframe_url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             message = '(%d) Failed to get instrument/api list of instruments.' % response.status_code
             raise Exception(message)
@@ -3552,14 +3721,15 @@ def _compile_c2_toc():
 
             # Add entries for moorings, platforms and instruments dictionaries
             if _mooring not in moorings:
-                moorings.append(_mooring)
+                moorings.add(_mooring)
                 mooring_list.append({'reference_designator': _mooring,
                                      'array_code': array_code,
                                      'display_name': mooring_display_name
                                      })
-            if _platform not in platforms:
-                platforms.append(_platform)
-                platform_list.append({'reference_designator': "-".join([_mooring, _platform]),
+            platform_rd = "-".join([_mooring, _platform])
+            if platform_rd not in platforms:
+                platforms.add(platform_rd)
+                platform_list.append({'reference_designator': platform_rd,
                                       'mooring_code': _mooring,
                                       'platform_code': _platform,
                                       'display_name': platform_display_name
@@ -3568,8 +3738,8 @@ def _compile_c2_toc():
                 instrument_name = get_display_name_by_rd(rd)
                 if instrument_name is None:
                     instrument_name = rd
-                if _instrument not in instruments:
-                    instruments.append(_instrument)
+                if rd not in instruments:
+                    instruments.add(rd)
                     instrument_list.append({'mooring_code': _mooring,
                                             'platform_code': _platform,
                                             'instrument_code': _instrument,
@@ -3578,11 +3748,11 @@ def _compile_c2_toc():
                                             })
 
         # Assemble toc for response
-        arrays = Array.query.all()
         toc['arrays'] = [array.to_json() for array in arrays]
         toc['moorings'] = mooring_list
         toc['platforms'] = platform_list
         toc['instruments'] = instrument_list
+        toc['index'] = index_c2_toc(toc)
 
         return toc
 
@@ -10,7 +10,7 @@ from ooiservices.app.main.errors import bad_request
 from ooiservices.app.main.authentication import auth
 from ooiservices.app.decorators import scope_required
 import json
-import requests
+from ooiservices.app.uframe.client import uframe_client
 from base64 import b64encode
 import datetime as dt
 
@@ -762,20 +762,20 @@ def uframe_issue_get_request(method='get', suffix=None, data=None):
         # Methods: 'get' and 'delete'
         if method == 'get' or method == 'delete':
             if method == 'get':
-                response = requests.get(url, timeout=(timeout, timeout_read))
+                response = uframe_client.get(url, timeout=(timeout, timeout_read))
             elif method == 'delete':
-                response = requests.delete(url, timeout=(timeout, timeout_read))
+                response = uframe_client.delete(url, timeout=(timeout, timeout_read))
 
         # Methods: 'post' and 'put'
         else:
             if method == 'post':
-                response = requests.post(url, timeout=(timeout, timeout_read), data=data)
+                response = uframe_client.post(url, timeout=(timeout, timeout_read), data=data)
 
             if method == 'put':
                 if data:
-                    response = requests.put(url, timeout=(timeout, timeout_read), headers=headers, data=data)
+                    response = uframe_client.put(url, timeout=(timeout, timeout_read), headers=headers, data=data)
                 else:
-                    response = requests.put(url, timeout=(timeout, timeout_read), headers=headers)
+                    response = uframe_client.put(url, timeout=(timeout, timeout_read), headers=headers)
 
 
         return response
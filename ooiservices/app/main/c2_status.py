@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+"""
+Instrument operational status store for Command and Control (C2).
+
+The operational status of every instrument in the C2 toc is polled in the background (celery task
+tasks.poll_c2_instrument_status, every C2_STATUS_POLL_INTERVAL seconds) and kept in the redis hash
+'c2_instrument_status', one json entry per reference designator:
+    {'reference_designator': rd, 'operational_status': 'Online'|'Offline'|'Unknown',
+     'ping': True|False, 'driver_state': 'DRIVER_STATE_COMMAND'|None, 'error': None|message,
+     'updated': seconds since the epoch}
+so C2 status displays read statuses with one redis request instead of asking the instrument/api.
+"""
+
+from flask import current_app
+from ooiservices.app import redis_store
+from ooiservices.app.cache_tools import RELEASE_SCRIPT, new_version
+import json
+import time
+
+STATUS_KEY = 'c2_instrument_status'
+POLLED_KEY = 'c2_instrument_status_polled'
+POLL_LOCK_KEY = 'c2_instrument_status_polling'
+
+
+def _decode(value):
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def _is_current(entry, max_age):
+    return entry is not None and (max_age is None or time.time() - entry['updated'] <= max_age)
+
+
+def get_stored_statuses(reference_designators, max_age=None):
+    """ Return {rd: entry} for the stored statuses of reference_designators (entry is None when not stored,
+    or stored more than max_age seconds ago).
+    """
+    reference_designators = list(reference_designators)
+    if not reference_designators:
+        return {}
+    try:
+        values = redis_store.hmget(STATUS_KEY, reference_designators)
+    except Exception as err:
+        current_app.logger.info('Unable to read instrument statuses: %s' % str(err))
+        values = [None] * len(reference_designators)
+    result = {}
+    for rd, value in zip(reference_designators, values):
+        entry = _decode(value)
+        result[rd] = entry if _is_current(entry, max_age) else None
+    return result
+
+
+def get_stored_status(reference_designator, max_age=None):
+    """ Return the stored status entry for an instrument, or None.
+    """
+    return get_stored_statuses([reference_designator], max_age)[reference_designator]
+
+
+def get_stored_reference_designators():
+    """ Return the reference designators with a stored status.
+    """
+    return redis_store.hkeys(STATUS_KEY)
+
+
+def store_statuses(entries, remove=None):
+    """ Store status entries (dictionaries with 'reference_designator'); remove the entries of the
+    reference designators in remove.
+    """
+    pipe = redis_store.pipeline()
+    if entries:
+        pipe.hmset(STATUS_KEY, dict((entry['reference_designator'], json.dumps(entry)) for entry in entries))
+    if remove:
+        pipe.hdel(STATUS_KEY, *remove)
+    pipe.execute()
+
+
+def start_poll(interval, force=False):
+    """ Start a poll of all instruments when one should be made now: no poll was completed during the last
+    interval seconds (unless force) and no other poll is in progress. Returns the token identifying the poll
+    (to pass to finish_poll), or None when no poll should be made.
+    """
+    if not force:
+        polled = redis_store.get(POLLED_KEY)
+        if polled is not None and time.time() - float(polled) < interval:
+            return None
+    # A poll which did not complete (process killed) is considered abandoned after 10 intervals.
+    token = new_version()
+    if redis_store.set(POLL_LOCK_KEY, token, nx=True, ex=int(interval * 10) or 1):
+        return token
+    return None
+
+
+def finish_poll(token, completed=True):
+    """ Mark the poll started by start_poll (token) as no longer in progress (and, if completed, as the last
+    poll). The poll lock is only removed while it is still held by this poll, not after it was abandoned
+    and taken by another poll.
+    """
+    if completed:
+        redis_store.set(POLLED_KEY, time.time())
+    redis_store.eval(RELEASE_SCRIPT, 1, POLL_LOCK_KEY, token)
@@ -7,6 +7,9 @@ __author__ = 'M@Campbell'
 
 from flask import jsonify, current_app, request
 from ooiservices.app.main import api
+from ooiservices.app.uframe.client import uframe_client
+from ooiservices.app.cache_tools import cache_metrics
+from ooiservices.app.memory_cache import memory_cache, invalidate, is_subscribed
 from celery.task.control import discard_all
 import urllib
 import subprocess
@@ -31,6 +34,27 @@ def list_routes():
     return jsonify({'routes': routes})
 
 
+@api.route('/uframe_client_metrics', methods=['GET'])
+def uframe_client_metrics():
+    """
+    Latency metrics of uframe requests issued by this worker, by endpoint.
+    :return: JSON
+    """
+    return jsonify({'metrics': uframe_client.metrics()})
+
+
+@api.route('/cache_metrics', methods=['GET'])
+def cache_metrics_list():
+    """
+    Hits, stale hits, misses and rebuild times of cached values served while being rebuilt, by key,
+    and the size and hit counts of the memory cache, for this worker.
+    :return: JSON
+    """
+    memory = memory_cache.stats()
+    memory['subscribed'] = is_subscribed()
+    return jsonify({'metrics': cache_metrics(), 'memory_cache': memory})
+
+
 @api.route('/cache_keys', methods=['GET'])
 @api.route('/cache_keys/<string:key>', methods=['DELETE'])
 def cache_list(key=None):
@@ -91,6 +115,10 @@ def cache_list(key=None):
                                            stdout=subprocess.PIPE)
             output, err = pipe_output.communicate()
 
+            # drop the copies held in memory by the workers
+            if redis_key.startswith('flask_cache_'):
+                invalidate(redis_key[len('flask_cache_'):])
+
             # we'll discard all previous celery jobs, so new ones can be queued up.
             # Note, this does NOT issue a cache reload.  It simply removes any
             # backloged tasks.  Keep it tight, like a tiger.
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+'''
+ooiservices.memory_cache
+
+Per-process (L1) memory cache in front of redis for hot cached values.
+
+Entries are kept in least recently used order and evicted once their total size exceeds L1_CACHE_BYTES
+(the size of an entry is an estimate of the memory used by its decoded value), so repeated reads are served
+without a network round trip or decoding. Entries stored under versioned keys (e.g. the shards of a
+sharded value) never change and are only evicted. Entries under keys whose value changes (e.g. the
+manifest of a sharded value) are invalidated in every process when the value is replaced: the writer
+publishes the key on the redis channel L1_CACHE_CHANNEL and each process drops its copy (and calls the
+callbacks registered for the key) as the message is received. As a safeguard against lost messages, and
+for processes where redis pub/sub is not available, such entries are also dropped L1_CACHE_MAX_AGE
+seconds after they were read.
+
+The subscription is made lazily by each process (after uwsgi forks its workers) on first use.
+'''
+
+from flask import current_app, has_app_context
+from ooiservices.app import redis_store
+from collections import OrderedDict
+import os
+import threading
+import time
+
+L1_DEFAULTS = {
+    'L1_CACHE_BYTES': 67108864,
+    'L1_CACHE_MAX_AGE': 60,
+    'L1_CACHE_CHANNEL': 'ooiservices_cache_invalidate',
+}
+RETRY_INTERVAL = 30
+
+
+def _config(name):
+    if has_app_context():
+        return current_app.config.get(name, L1_DEFAULTS[name])
+    return L1_DEFAULTS[name]
+
+
+class MemoryCache(object):
+    """ Least recently used cache of values, bounded by the total size of its entries.
+    """
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key):
+        """ Return the value cached for key, or None.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._counts['misses'] += 1
+                return None
+            value, size, expires = entry
+            if expires is not None and time.time() > expires:
+                self._bytes -= size
+                self._counts['expirations'] += 1
+                self._counts['misses'] += 1
+                return None
+            self._entries[key] = entry
+            self._counts['hits'] += 1
+            return value
+
+    def set(self, key, value, size, volatile=False):
+        """ Cache value (of size bytes) for key. Volatile values (values replaced under the same key, which
+        are invalidated when replaced) are also dropped after L1_CACHE_MAX_AGE seconds. Values larger than
+        the cache are not cached.
+        """
+        max_bytes = self.max_bytes or _config('L1_CACHE_BYTES')
+        expires = time.time() + _config('L1_CACHE_MAX_AGE') if volatile else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            if size > max_bytes:
+                return
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            while self._bytes > max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                self._bytes -= entry[1]
+                self._counts['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+                self._counts['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """ Return the number of entries, their size and the hit, miss and eviction counts.
+        """
+        with self._lock:
+            result = dict(self._counts)
+            result.update({'entries': len(self._entries), 'bytes': self._bytes,
+                           'max_bytes': self.max_bytes or _config('L1_CACHE_BYTES')})
+            return result
+
+
+memory_cache = MemoryCache()
+
+_callbacks_lock = threading.Lock()
+_callbacks = {}
+_listener = {'pid': None, 'retry_at': 0, 'subscribed': False}
+
+
+def on_invalidate(key, callback):
+    """ Call callback() in each process when the value for key is invalidated.
+    """
+    with _callbacks_lock:
+        _callbacks.setdefault(key, []).append(callback)
+
+
+def _invalidate_local(key):
+    memory_cache.delete(key)
+    with _callbacks_lock:
+        callbacks = list(_callbacks.get(key, []))
+    for callback in callbacks:
+        callback()
+
+
+def invalidate(key):
+    """ Drop the copies of the value for key held by this and (through redis pub/sub) every other process.
+    """
+    _invalidate_local(key)
+    try:
+        redis_store.publish(_config('L1_CACHE_CHANNEL'), key)
+    except Exception as err:
+        if has_app_context():
+            current_app.logger.info('Unable to publish cache invalidation of %s: %s' % (key, str(err)))
+
+
+def is_subscribed():
+    """ True when this process receives invalidations published by other processes.
+    """
+    return _listener['subscribed'] and _listener['pid'] == os.getpid()
+
+
+def start_listener():
+    """ Subscribe this process to invalidations, once per process; after a failure, the subscription is
+    retried every RETRY_INTERVAL seconds.
+    """
+    pid = os.getpid()
+    if _listener['pid'] == pid or time.time() < _listener['retry_at']:
+        return
+    with _callbacks_lock:
+        if _listener['pid'] == pid:
+            return
+        _listener['pid'] = pid
+        _listener['subscribed'] = False
+    channel = _config('L1_CACHE_CHANNEL')
+    thread = threading.Thread(target=_listen, args=(pid, channel))
+    thread.daemon = True
+    thread.start()
+
+
+def _listen(pid, channel):
+    try:
+        pubsub = redis_store.pubsub()
+        pubsub.subscribe(channel)
+        for message in pubsub.listen():
+            if message.get('type') == 'subscribe':
+                _listener['subscribed'] = True
+                # Values read before the subscription may have been replaced since.
+                memory_cache.clear()
+            elif message.get('type') == 'message':
+                _invalidate_local(message['data'])
+    except Exception:
+        pass
+    # Subscription lost (or never made); entries age out after L1_CACHE_MAX_AGE until resubscribed.
+    with _callbacks_lock:
+        if _listener['pid'] == pid:
+            _listener['pid'] = None
+            _listener['subscribed'] = False
+            _listener['retry_at'] = time.time() + RETRY_INTERVAL
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+'''
+ooiservices.sharded_cache
+
+Storage of large cached values (lists and dictionaries of several MB) in shards.
+
+A value is stored as a small manifest under its key and its items (for a dictionary, its (key, value)
+pairs) in shards of CACHE_SHARD_SIZE items ('<key>_<version>_<n>'). The manifest records the number of
+items; a group index ('<key>_<version>_groups') records, per group (a dictionary key, or the group of a
+list item, e.g. its reference designator), the positions of the group's items. So a page of items or a
+single group is read and decoded without the rest of the value.
+
+Decoded shards and manifests are kept in the per-process memory cache (memory_cache); shards are stored
+under versioned keys and never change, manifests are invalidated in every process when a value is replaced.
+A decoded shard is charged to the memory cache at its uncompressed encoded size times DECODED_SIZE_FACTOR
+(measured for stream list shards: decoded objects use about 5 times the msgpack and 4 times the pickle size).
+
+Shards are encoded with msgpack when it is installed and CACHE_CODEC is 'msgpack' (pickle otherwise,
+or for shards msgpack can not encode) and compressed with zlib or lz4 as set by CACHE_COMPRESSION ('zlib',
+'lz4' or ''). Each shard records its own encoding, so readers do not depend on the current configuration.
+'''
+
+from flask import current_app, has_app_context
+from ooiservices.app import cache
+from ooiservices.app.cache_tools import new_version
+from ooiservices.app.memory_cache import memory_cache, invalidate, start_listener
+import cPickle as pickle
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+SHARD_DEFAULTS = {
+    'CACHE_CODEC': 'msgpack',
+    'CACHE_COMPRESSION': 'zlib',
+    'CACHE_SHARD_SIZE': 500,
+}
+MANIFEST_MARKER = '__sharded__'
+MISSING = object()
+MANIFEST_SIZE = 256
+DECODED_SIZE_FACTOR = {'m': 5, 'p': 4}
+
+
+def _config(name):
+    if has_app_context():
+        return current_app.config.get(name, SHARD_DEFAULTS[name])
+    return SHARD_DEFAULTS[name]
+
+
+def _msgpack_loads(data):
+    try:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    except TypeError:
+        # msgpack < 1.0
+        return msgpack.unpackb(data, encoding='utf-8')
+
+
+def encode(value, codec=None, compression=None):
+    """ Encode value; the first two bytes of the result record the codec ('m' msgpack, 'p' pickle) and
+    the compression ('z' zlib, 'l' lz4, 'n' none).
+    """
+    codec = _config('CACHE_CODEC') if codec is None else codec
+    compression = _config('CACHE_COMPRESSION') if compression is None else compression
+    data = None
+    if codec == 'msgpack' and msgpack is not None:
+        try:
+            data = 'm' + msgpack.packb(value, use_bin_type=True)
+        except (TypeError, ValueError, OverflowError):
+            data = None
+    if data is None:
+        data = 'p' + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    if compression == 'zlib':
+        return data[0] + 'z' + zlib.compress(data[1:], 1)
+    if compression == 'lz4' and lz4_frame is not None:
+        return data[0] + 'l' + lz4_frame.compress(data[1:])
+    return data[0] + 'n' + data[1:]
+
+
+def decode(data):
+    """ Decode data produced by encode.
+    """
+    return decode_sized(data)[0]
+
+
+def decode_sized(data):
+    """ Decode data produced by encode; return (value, estimated size in memory of the value in bytes).
+    """
+    codec, compression, body = data[0], data[1], data[2:]
+    if compression == 'z':
+        body = zlib.decompress(body)
+    elif compression == 'l':
+        if lz4_frame is None:
+            raise Exception('Cached value is lz4 compressed; lz4 is not installed.')
+        body = lz4_frame.decompress(body)
+    size = len(body) * DECODED_SIZE_FACTOR.get(codec, 1)
+    if codec == 'm':
+        if msgpack is None:
+            raise Exception('Cached value is msgpack encoded; msgpack is not installed.')
+        return _msgpack_loads(body), size
+    return pickle.loads(body), size
+
+
+def is_manifest(value):
+    return isinstance(value, dict) and MANIFEST_MARKER in value
+
+
+class ShardedValue(object):
+    """ Large list or dictionary cached under key in shards. For lists, group(item) names the group of an
+    item (items without a group, or for which group raises an exception, are not grouped).
+    The items returned are shared with the other readers in the process (memory_cache); do not modify them.
+    """
+    def __init__(self, key, timeout=None, group=None, shard_size=None):
+        self.key = key
+        self.timeout = timeout
+        self.group = group
+        self.shard_size = shard_size
+
+    def _shard_key(self, version, n):
+        return '%s_%s_%d' % (self.key, version, n)
+
+    def _groups_key(self, version):
+        return '%s_%s_groups' % (self.key, version)
+
+    def _shard_keys(self, manifest):
+        keys = [self._shard_key(manifest['version'], n) for n in range(manifest['shards'])]
+        return keys + [self._groups_key(manifest['version'])]
+
+    def set(self, value, timeout=None):
+        """ Cache value (list or dictionary); shards of a previously cached value are removed.
+        """
+        timeout = timeout or self.timeout
+        kind = 'dict' if isinstance(value, dict) else 'list'
+        items = value.items() if kind == 'dict' else list(value)
+        shard_size = self.shard_size or _config('CACHE_SHARD_SIZE')
+
+        groups = {}
+        for i, item in enumerate(items):
+            if kind == 'dict':
+                name = item[0]
+            elif self.group is None:
+                continue
+            else:
+                try:
+                    name = self.group(item)
+                except Exception:
+                    continue
+            if name is not None:
+                groups.setdefault(name, []).append(i)
+
+        version = new_version()
+        shards = {}
+        for n, start in enumerate(range(0, len(items), shard_size)):
+            shards[self._shard_key(version, n)] = encode(items[start:start + shard_size])
+        shards[self._groups_key(version)] = encode(groups)
+        cache.set_many(shards, timeout=timeout)
+
+        previous = cache.get(self.key)
+        manifest = {MANIFEST_MARKER: True, 'version': version, 'kind': kind, 'count': len(items),
+                    'shard_size': shard_size, 'shards': len(shards) - 1}
+        cache.set(self.key, manifest, timeout=timeout)
+        invalidate(self.key)
+        if is_manifest(previous):
+            cache.delete_many(*self._shard_keys(previous))
+
+    def delete(self):
+        """ Remove the value and its shards.
+        """
+        manifest = cache.get(self.key)
+        cache.delete(self.key)
+        invalidate(self.key)
+        if is_manifest(manifest):
+            cache.delete_many(*self._shard_keys(manifest))
+
+    def _manifest(self):
+        start_listener()
+        manifest = memory_cache.get(self.key)
+        if manifest is None:
+            manifest = cache.get(self.key)
+            if is_manifest(manifest):
+                memory_cache.set(self.key, manifest, MANIFEST_SIZE, volatile=True)
+        return manifest
+
+    def _load(self, keys):
+        """ Return {key: decoded value} for shard (or group index) keys, None if any of them is missing.
+        """
+        result = {}
+        fetch = []
+        for key in keys:
+            value = memory_cache.get(key)
+            if value is None:
+                fetch.append(key)
+            else:
+                result[key] = value
+        if fetch:
+            for key, data in zip(fetch, cache.get_many(*fetch)):
+                if data is None:
+                    return None
+                result[key], size = decode_sized(data)
+                memory_cache.set(key, result[key], size)
+        return result
+
+    def _read(self, read):
+        """ Call read(manifest, shards) where shards(numbers) returns {n: items} for the shard numbers (None
+        if a shard is missing; read then returns MISSING); the manifest is read again once if shards were
+        replaced meanwhile. Returns (None, None) if not cached, (None, value) for values cached as a whole
+        (before sharding).
+        """
+        for attempt in range(2):
+            manifest = self._manifest()
+            if manifest is None:
+                return None, None
+            if not is_manifest(manifest):
+                return None, manifest
+
+            def shards(numbers):
+                numbers = sorted(set(numbers))
+                keys = [self._shard_key(manifest['version'], n) for n in numbers]
+                loaded = self._load(keys)
+                if loaded is None:
+                    return None
+                return dict((n, loaded[key]) for n, key in zip(numbers, keys))
+
+            result = read(manifest, shards)
+            if result is not MISSING:
+                return result, None
+            # The local copy of the manifest may be out of date.
+            memory_cache.delete(self.key)
+        return None, None
+
+    def get(self):
+        """ Return the cached list or dictionary, or None.
+        """
+        def read(manifest, shards):
+            loaded = shards(range(manifest['shards']))
+            if loaded is None:
+                return MISSING
+            items = []
+            for n in sorted(loaded):
+                items.extend(loaded[n])
+            if manifest['kind'] == 'dict':
+                return dict((item[0], item[1]) for item in items)
+            return items
+
+        result, whole = self._read(read)
+        return whole if whole is not None else result
+
+    def _items(self, manifest, shards, positions):
+        size = manifest['shard_size']
+        loaded = shards([i // size for i in positions])
+        if loaded is None:
+            return None
+        return [loaded[i // size][i % size] for i in positions]
+
+    def page(self, start_at=0, count=None):
+        """ Return (items, total) for a page of the cached list (None, None if not cached).
+        """
+        def read(manifest, shards):
+            total = manifest['count']
+            stop = total if count is None else min(start_at + count, total)
+            items = self._items(manifest, shards, range(start_at, stop))
+            if items is None:
+                return MISSING
+            return items, total
+
+        result, whole = self._read(read)
+        if whole is not None:
+            stop = None if count is None else start_at + count
+            return whole[start_at:stop], len(whole)
+        if result is None:
+            return None, None
+        return result
+
+    def get_group(self, name):
+        """ Return the items of a group of the cached list, or the value for a key of the cached dictionary.
+        None if the value is not cached or (dictionary) does not contain the key.
+        """
+        def read(manifest, shards):
+            key = self._groups_key(manifest['version'])
+            groups = self._load([key])
+            if groups is None:
+                return MISSING
+            positions = groups[key].get(name, [])
+            items = self._items(manifest, shards, positions)
+            if items is None:
+                return MISSING
+            if manifest['kind'] == 'list':
+                return items
+            return items[0][1] if items else None
+
+        result, whole = self._read(read)
+        if whole is not None:
+            if isinstance(whole, dict):
+                return whole.get(name, None)
+            return [item for item in whole if self._group_of(item) == name]
+        return result
+
+    def _group_of(self, item):
+        try:
+            return self.group(item) if self.group else None
+        except Exception:
+            return None
+
+    def count(self):
+        """ Number of items cached (None if not cached).
+        """
+        manifest = self._manifest()
+        if manifest is None:
+            return None
+        if is_manifest(manifest):
+            return manifest['count']
+        return len(manifest)
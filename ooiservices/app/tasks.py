@@ -2,9 +2,10 @@
 __author__ = 'M@Campbell'
 
 from ooiservices.app import create_celery_app
-from ooiservices.app.main.c2 import _compile_c2_toc
+from ooiservices.app.main.c2 import _compile_c2_toc, c2_toc_cache, refresh_instrument_statuses
+from ooiservices.app.main.c2_status import start_poll, finish_poll
 from flask.globals import current_app
-import requests
+from ooiservices.app.uframe.client import uframe_client
 from flask.ext.cache import Cache
 
 
@@ -24,6 +25,7 @@ Caches created/utilized:
   asset_list
   asset_rds
   c2_toc
+  c2_instrument_status (redis hash)
   stream_list
   event_list
   glider_tracks
@@ -35,12 +37,16 @@ Caches created/utilized:
 
 from ooiservices.app.uframe.assetController import _compile_assets, _compile_bad_assets
 from ooiservices.app.uframe.assetController import _compile_events
-from ooiservices.app.uframe.controller import dfs_streams
+from ooiservices.app.uframe.event_index import cache_event_list
+from ooiservices.app.uframe.controller import compile_stream_list, refresh_uframe_toc
+from ooiservices.app.uframe.toc_cache import (toc_delta_since, get_toc_reference_designators,
+                                              get_built_toc_version, set_built_toc_version)
 from ooiservices.app.uframe.controller import _compile_glider_tracks
-from ooiservices.app.uframe.controller import _compile_cam_images
-from ooiservices.app.uframe.controller import _compile_large_format_files
-from ooiservices.app.uframe.vocab import _compile_vocab
-from ooiservices.app.main.alertsalarms_tools import _compile_asset_rds, get_assets_dict_from_list
+from ooiservices.app.uframe.controller import _compile_cam_images, cam_images_cache
+from ooiservices.app.uframe.assets import asset_list_cache
+from ooiservices.app.uframe.controller import _compile_large_format_files, large_format_store, glider_tracks_store
+from ooiservices.app.uframe.vocab import _compile_vocab, publish_vocab
+from ooiservices.app.main.alertsalarms_tools import _compile_asset_rds, _patch_asset_rds, get_assets_dict_from_list
 
 @celery.task(name='tasks.compile_assets')
 def compile_assets():
@@ -51,14 +57,14 @@ def compile_assets():
             cache = Cache(config={'CACHE_TYPE': 'redis', 'CACHE_REDIS_DB': 0})
             cache.init_app(current_app)
             url = current_app.config['UFRAME_ASSETS_URL'] + '/%s' % ('assets')
-            payload = requests.get(url)
+            payload = uframe_client.get(url)
             if payload.status_code is 200:
 
                 # Cache assets_list
                 data = payload.json()
                 assets, asset_rds = _compile_assets(data)
                 if "error" not in assets:
-                    cache.set('asset_list', assets, timeout=CACHE_TIMEOUT)
+                    asset_list_cache.set(assets)
                     print "[+] Asset list cache reset"
 
                     # Cache assets_dict (based on success of _compile_assets returning assets)
@@ -99,14 +105,25 @@ def compile_assets_rd():
 
             cache = Cache(config={'CACHE_TYPE': 'redis', 'CACHE_REDIS_DB': 0})
             cache.init_app(current_app)
+            toc_version = None
             try:
-                asset_rds, _ = _compile_asset_rds()
+                # Patch the cached asset_rds for instruments added or removed since it was compiled.
+                _, toc_version = refresh_uframe_toc()
+                cached = cache.get('asset_rds')
+                delta = None
+                if cached and toc_version is not None:
+                    delta = toc_delta_since(get_built_toc_version('asset_rds'))
+                if delta is not None:
+                    asset_rds = _patch_asset_rds(dict(cached), get_toc_reference_designators(), delta)
+                else:
+                    asset_rds, _ = _compile_asset_rds()
             except Exception as err:
                 message = 'Error processing _compile_asset_rds: ', err.message
                 current_app.logger.warning(message)
 
         if asset_rds:
             cache.set('asset_rds', asset_rds, timeout=CACHE_TIMEOUT)
+            set_built_toc_version('asset_rds', toc_version)
             print "[+] Asset reference designators cache reset..."
         else:
             print "[-] Error in cache update"
@@ -125,10 +142,10 @@ def compile_streams():
             cache = Cache(config={'CACHE_TYPE': 'redis', 'CACHE_REDIS_DB': 0})
             cache.init_app(current_app)
 
-            streams = dfs_streams()
+            # Only streams of instruments added or changed since the last compile are rebuilt.
+            streams = compile_stream_list()
 
             if "error" not in streams:
-                cache.set('stream_list', streams, timeout=CACHE_TIMEOUT)
                 print "[+] Streams cache reset."
             else:
                 print "[-] Error in cache update"
@@ -146,13 +163,13 @@ def compile_events():
             cache.init_app(current_app)
 
             url = current_app.config['UFRAME_ASSETS_URL'] + '/events'
-            payload = requests.get(url)
+            payload = uframe_client.get(url)
             if payload.status_code is 200:
                 data = payload.json()
                 events = _compile_events(data)
 
                 if "error" not in events:
-                    cache.set('event_list', events, timeout=CACHE_TIMEOUT)
+                    cache_event_list(events)
                     print "[+] Events cache reset."
                 else:
                     print "[-] Error in cache update"
@@ -172,7 +189,7 @@ def compile_glider_tracks():
             glider_tracks = _compile_glider_tracks(True)
 
             if "error" not in glider_tracks:
-                cache.set('glider_tracks', glider_tracks, timeout=CACHE_TIMEOUT)
+                glider_tracks_store.set(glider_tracks)
                 print "[+] Glider tracks cache reset."
             else:
                 print "[-] Error in cache update"
@@ -193,7 +210,7 @@ def compile_cam_images():
             cam_images = _compile_cam_images()
 
             if "error" not in cam_images:
-                cache.set('cam_images', cam_images, timeout=CACHE_TIMEOUT)
+                cam_images_cache.set(cam_images)
                 print "[+] cam images cache reset."
             else:
                 print "[-] Error in cache update"
@@ -219,7 +236,7 @@ def compile_large_format_files():
             data = _compile_large_format_files()
 
             if "error" not in data:
-                cache.set('large_format', data, timeout=CACHE_TIMEOUT)
+                large_format_store.set(data)
                 print "[+] large format files updated."
             else:
                 print "[-] Error in large file format update"
@@ -243,7 +260,7 @@ def compile_c2_toc():
                 current_app.logger.warning(message)
 
             if c2_toc is not None:
-                cache.set('c2_toc', c2_toc, timeout=CACHE_TIMEOUT)
+                c2_toc_cache.set(c2_toc)
                 print "[+] C2 toc cache reset..."
             else:
                 print "[-] Error in cache update"
@@ -253,6 +270,28 @@ def compile_c2_toc():
         current_app.logger.warning(message)
 
 
+
+@celery.task(name='tasks.poll_c2_instrument_status')
+def poll_c2_instrument_status():
+    """ Refresh the instrument status store (scheduled often; polls every C2_STATUS_POLL_INTERVAL seconds).
+    """
+    try:
+        with current_app.test_request_context():
+            token = start_poll(current_app.config.get('C2_STATUS_POLL_INTERVAL', 60))
+            if token is None:
+                return
+            completed = False
+            try:
+                print "[+] Starting c2 instrument status refresh..."
+                entries = refresh_instrument_statuses()
+                completed = True
+                print "[+] C2 instrument status refreshed (%d instruments)." % len(entries)
+            finally:
+                finish_poll(token, completed)
+    except Exception as err:
+        message = 'poll_c2_instrument_status exception: %s' % err.message
+        current_app.logger.warning(message)
+
 @celery.task(name='tasks.compile_bad_assets')
 def compile_bad_assets():
     try:
@@ -261,7 +300,7 @@ def compile_bad_assets():
             cache = Cache(config={'CACHE_TYPE': 'redis', 'CACHE_REDIS_DB': 0})
             cache.init_app(current_app)
             url = current_app.config['UFRAME_ASSETS_URL'] + '/assets'
-            payload = requests.get(url)
+            payload = uframe_client.get(url)
             if payload.status_code is 200:
                 data = payload.json()
                 bad_assets = _compile_bad_assets(data)
@@ -280,19 +319,12 @@ def compile_vocabulary():
     try:
         with current_app.test_request_context():
             print "[+] Starting vocabulary cache reset..."
-            cache = Cache(config={'CACHE_TYPE': 'redis', 'CACHE_REDIS_DB': 0})
-            cache.init_app(current_app)
-            url = current_app.config['UFRAME_VOCAB_URL'] + '/vocab'
-            payload = requests.get(url)
-            if payload.status_code is 200:
-                data = payload.json()
-                vocab_dict, vocab_codes = _compile_vocab(data)
-                if "error" not in vocab_dict:
-                    cache.set('vocab_dict', vocab_dict, timeout=CACHE_TIMEOUT)
-                    cache.set('vocab_codes', codes, timeout=CACHE_TIMEOUT)
-                    print "[+] Vocabulary cache reset"
-                else:
-                    print "[-] Error in cache update"
+            vocab_dict, vocab_codes = _compile_vocab()
+            if vocab_dict and vocab_codes:
+                publish_vocab(vocab_dict, vocab_codes)
+                print "[+] Vocabulary cache reset"
+            else:
+                print "[-] Error in cache update"
     except Exception as err:
         message = 'compile_vocabulary exception: %s' % err.message
         current_app.logger.warning(message)
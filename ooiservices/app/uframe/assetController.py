@@ -10,7 +10,8 @@ from flask import jsonify, current_app, request
 from ooiservices.app.uframe import uframe as api
 from ooiservices.app.uframe.vocab import get_display_name_by_rd as get_dn_by_rd
 from ooiservices.app.uframe.vocab import get_long_display_name_by_rd as get_ldn_by_rd
-import requests, requests.adapters
+from ooiservices.app.uframe.vocab import resolve_names
+from ooiservices.app.uframe.client import uframe_client
 import re
 import math
 from netCDF4 import num2date
@@ -18,7 +19,6 @@ from operator import itemgetter
 from ooiservices.app import cache
 from ooiservices.app.main.alertsalarms_tools import _compile_asset_rds
 
-requests.adapters.DEFAULT_RETRIES = 2
 CACHE_TIMEOUT = 86400
 
 
@@ -34,6 +34,21 @@ def _compile_events(data):
         raise Exception(message)
 
 
+def _prefetch_asset_names(dict_asset_ids):
+    """ Resolve display names for the reference designators of all assets (and their array, mooring and
+    platform) at once, instead of one database query per asset.
+    """
+    try:
+        rds = set()
+        for rd in (dict_asset_ids or {}).itervalues():
+            if rd:
+                rds.update([rd, rd[:2], rd[:8], rd[:14]])
+        resolve_names(list(rds))
+    except Exception as err:
+        message = 'Unable to resolve asset display names: %s' % str(err)
+        current_app.logger.info(message)
+
+
 def _compile_assets(data):
     """ Process list of asset dictionaries from uframe; transform into (ooi-ui-services) list of asset dictionaries.
 
@@ -93,6 +108,7 @@ def _compile_assets(data):
 
     # Process uframe list of asset dictionaries (data)
     print '\n Compiling assets...'
+    _prefetch_asset_names(dict_asset_ids)
     valid_asset_classes = ['.InstrumentAssetRecord', '.NodeAssetRecord', '.AssetRecord']
     for row in data:
         ref_des = ''
@@ -524,7 +540,7 @@ def associate_events(id):
     """
     uframe_url = current_app.config['UFRAME_ASSETS_URL'] + '/assets/%s/events' % (id)
     result = []
-    payload = requests.get(uframe_url)
+    payload = uframe_client.get(uframe_url)
     if payload.status_code != 200:
         return [{"error": "server responded with error code: %s" %
                 payload.status_code}]
@@ -577,46 +593,57 @@ def associate_events(id):
     return result
 
 
+def _event_ref_des(row):
+    """ Get reference designator of an event (from 'referenceDesignator' or the asset 'Ref Des' metadata).
+    """
+    ref_des = ""
+    if 'referenceDesignator' in row and row['referenceDesignator']['full']:
+        ref_des = (row['referenceDesignator']['subsite'] + '-' + row['referenceDesignator']['node'] +
+                   '-' + row['referenceDesignator']['sensor'])
+    else:
+        if row['asset']['metaData']:
+            for metaData in row['asset']['metaData']:
+                if metaData['key'] == 'Ref Des':
+                    ref_des = metaData['value']
+    return ref_des
+
+
+def _format_event(row, ref_des):
+    """ Format event for responses by reference designator.
+    """
+    temp_dict = {}
+    temp_dict['ref_des'] = ref_des
+    temp_dict['id'] = row['id']
+    temp_dict['eventClass'] = row['eventClass']
+    if row['eventClass'] == '.DeploymentEvent':
+        temp_dict['cruise_number'] = row['cruiseNumber']
+        temp_dict['cruise_plan_doc'] = row['cruisePlanDocument']
+        temp_dict['depth'] = row['depth']
+        temp_dict['lat_lon'] = row['locationLonLat']
+        temp_dict['deployment_number'] = row['deploymentNumber']
+    temp_dict['tense'] = row['tense']
+    start_date = num2date(float(row['startDate'])/1000, units='seconds since 1970-01-01 00:00:00', calendar='gregorian')
+    temp_dict['start_date'] = start_date.strftime("%B %d %Y, %I:%M:%S %p")
+    if row['endDate'] is not None:
+        end_date = num2date(float(row['endDate'])/1000, units='seconds since 1970-01-01 00:00:00', calendar='gregorian')
+        temp_dict['end_date'] = end_date.strftime("%B %d %Y, %I:%M:%S %p")
+    temp_dict['event_description'] = row['eventDescription']
+    temp_dict['event_type'] = row['eventType']
+    temp_dict['notes'] = row['notes']
+    return temp_dict
+
+
 def get_events_by_ref_des(data, ref_des):
     """ Create the container for the processed response.
+    For cached events use event_index.get_events_by_rd, which does not scan the event list.
     """
     result = []
     # Get all the events to begin searching though...
     for row in data:
-        # variables used in loop
-        temp_dict = {}
-        ref_des_check = ""
         try:
-
-            if 'referenceDesignator' in row and row['referenceDesignator']['full']:
-                ref_des_check = (row['referenceDesignator']['subsite'] + '-' + row['referenceDesignator']['node'] +
-                                 '-' + row['referenceDesignator']['sensor'])
-            else:
-                if row['asset']['metaData']:
-                    for metaData in row['asset']['metaData']:
-                        if metaData['key'] == 'Ref Des':
-                            ref_des_check = metaData['value']
+            ref_des_check = _event_ref_des(row)
             if ref_des_check == ref_des:
-                temp_dict['ref_des'] = ref_des_check
-                temp_dict['id'] = row['id']
-                temp_dict['eventClass'] = row['eventClass']
-                if row['eventClass'] == '.DeploymentEvent':
-                    temp_dict['cruise_number'] = row['cruiseNumber']
-                    temp_dict['cruise_plan_doc'] = row['cruisePlanDocument']
-                    temp_dict['depth'] = row['depth']
-                    temp_dict['lat_lon'] = row['locationLonLat']
-                    temp_dict['deployment_number'] = row['deploymentNumber']
-                temp_dict['tense'] = row['tense']
-                start_date = num2date(float(row['startDate'])/1000, units='seconds since 1970-01-01 00:00:00', calendar='gregorian')
-                temp_dict['start_date'] = start_date.strftime("%B %d %Y, %I:%M:%S %p")
-                if row['endDate'] is not None:
-                    end_date = num2date(float(row['endDate'])/1000, units='seconds since 1970-01-01 00:00:00', calendar='gregorian')
-                    temp_dict['end_date'] = end_date.strftime("%B %d %Y, %I:%M:%S %p")
-                temp_dict['event_description'] = row['eventDescription']
-                temp_dict['event_type'] = row['eventType']
-                temp_dict['notes'] = row['notes']
-                result.append(temp_dict)
-                temp_dict = {}
+                result.append(_format_event(row, ref_des_check))
         except (KeyError, TypeError):
             raise
     result = jsonify({ 'events' : result })
@@ -687,6 +714,7 @@ def _compile_bad_assets(data):
         raise Exception(message)
 
     # Process uframe list of asset dictionaries (data)
+    _prefetch_asset_names(dict_asset_ids)
     valid_asset_classes = ['.InstrumentAssetRecord', '.NodeAssetRecord', '.AssetRecord']
     for row in data:
         ref_des = ''
@@ -3,6 +3,8 @@ from ooiservices.app.uframe import uframe as api
 from ooiservices.app.uframe.assetController import _compile_assets, _compile_bad_assets
 from ooiservices.app.uframe.assetController import _uframe_headers
 from ooiservices.app import cache
+from ooiservices.app.cache_tools import RefreshingValue
+from ooiservices.app.sharded_cache import ShardedValue
 from operator import itemgetter
 from copy import deepcopy
 
@@ -10,13 +12,13 @@ import json
 import sys
 import requests
 import requests.exceptions
-import requests.adapters
+from ooiservices.app.uframe.client import uframe_client
 from requests.exceptions import ConnectionError, Timeout
 from ooiservices.app.main.errors import (bad_request, internal_server_error)
 
 
-requests.adapters.DEFAULT_RETRIES = 2
 CACHE_TIMEOUT = 172800
+SOFT_TIMEOUT = 7200
 
 
 @api.route('/assets', methods=['GET'])
@@ -30,10 +32,9 @@ def get_assets(use_min=False, normal_data=False, reset=False):
         if dict_cached:
             assets_dict = dict_cached
 
-        # Get 'asset_list' if cached, else process uframe assets and cache
-        cached = cache.get('asset_list')
-        if cached and reset is not True:
-            data = cached
+        # Get 'asset_list' if cached (rebuilt when stale or missing), else process uframe assets and cache
+        if reset is not True:
+            data = asset_list_cache.get()
         else:
             data = get_assets_payload()
 
@@ -55,12 +56,14 @@ def get_assets(use_min=False, normal_data=False, reset=False):
         current_app.logger.info(str(err))
         pass
 
-    # If using minimized ('min') or use_min, then strip asset data
+    # If using minimized ('min') or use_min, then strip asset data (from copies; the cached assets are
+    # shared with other requests)
     if request.args.get('min') == 'True' or use_min is True:
         showDeployments = False
         deploymentEvents = []
         if request.args.get('deployments') == 'True':
             showDeployments = True
+        data = [dict(obj) for obj in data]
         for obj in data:
             try:
                 if 'metaData' in obj:
@@ -126,13 +129,13 @@ def get_assets(use_min=False, normal_data=False, reset=False):
 
                 if (obj['ref_des'] not in unique):
 
+                    # Read only; the cached assets are shared with other requests.
                     unique.add(obj['ref_des'])
-                    asset['assetInfo'] = obj.pop('assetInfo')
-                    asset['assetInfo']['refDes'] = obj.pop('ref_des')
-                    asset['coordinates'] = obj.pop('coordinates')
+                    asset['assetInfo'] = dict(obj['assetInfo'], refDes=obj['ref_des'])
+                    asset['coordinates'] = obj['coordinates']
 
                     if 'depth' in obj:
-                        asset['assetInfo']['depth'] = obj.pop('depth')
+                        asset['assetInfo']['depth'] = obj['depth']
 
                     json = {
                             'array_id': asset['assetInfo']['refDes'][:2],
@@ -270,7 +273,7 @@ def get_assets_payload():
         # Get uframe connect and timeout information
         uframe_url, timeout, timeout_read = get_uframe_assets_info()
         url = '/'.join([uframe_url, 'assets'])
-        payload = requests.get(url, timeout=(timeout, timeout_read))
+        payload = uframe_client.get(url, timeout=(timeout, timeout_read))
         if payload.status_code != 200:
             message = '(%d) Failed to get uframe assets.' % payload.status
             current_app.logger.info(message)
@@ -279,8 +282,7 @@ def get_assets_payload():
         result = payload.json()
         data, assets_dict = _compile_assets(result)
         if "error" not in data:
-            cache.set('asset_list', data, timeout=CACHE_TIMEOUT)
-            data = cache.get('asset_list')
+            asset_list_cache.set(data)
 
         return data
 
@@ -298,12 +300,26 @@ def get_assets_payload():
         raise
 
 
+def _build_asset_list():
+    data = get_assets_payload()
+    if not isinstance(data, list):
+        message = 'Unable to compile asset list from uframe assets.'
+        current_app.logger.info(message)
+        raise Exception(message)
+    return data
+
+
+asset_list_store = ShardedValue('asset_list', timeout=CACHE_TIMEOUT, group=itemgetter('ref_des'))
+asset_list_cache = RefreshingValue('asset_list', _build_asset_list, SOFT_TIMEOUT, CACHE_TIMEOUT,
+                                   store=asset_list_store)
+
+
 def get_assets_from_uframe():
     try:
         # Get uframe connect and timeout information
         uframe_url, timeout, timeout_read = get_uframe_assets_info()
         url = '/'.join([uframe_url, 'assets'])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             message = '(%d) Failed to get uframe assets.' % response.status_code
             current_app.logger.info(message)
@@ -340,7 +356,7 @@ def get_asset(id):
             return make_response(error, 400)
 
         url = '/'.join([uframe_url, 'assets', str(id)])
-        payload = requests.get(url, timeout=(timeout, timeout_read))
+        payload = uframe_client.get(url, timeout=(timeout, timeout_read))
         if payload.status_code != 200:
             error = 'Unable to locate an asset with an id of %d.' % id
             current_app.logger.info(error)
@@ -376,7 +392,7 @@ def get_asset_events(id):
 
         uframe_url, timeout, timeout_read = get_uframe_assets_info()
         url = "/".join([uframe_url, 'assets', str(id), 'events'])
-        payload = requests.get(url, timeout=(timeout, timeout_read), headers=_uframe_headers())
+        payload = uframe_client.get(url, timeout=(timeout, timeout_read), headers=_uframe_headers())
         if payload.status_code != 200:
             error = '(%d) GET request failed for asset (id %d) events.' % (payload.status_code, id)
             current_app.logger.info(error)
@@ -420,7 +436,7 @@ def create_asset():
             data['@class'] = data.pop('asset_class')
 
         # Create asset in uframe
-        response = requests.post(url, data=json.dumps(data), headers=_uframe_headers())
+        response = uframe_client.post(url, data=json.dumps(data), headers=_uframe_headers())
 
         if response.status_code == 201:
             json_response = json.loads(response.text)
@@ -436,11 +452,10 @@ def create_asset():
                 raise Exception('_compile_assets returned empty or None result.')
 
             # Update asset cache ('asset_list')
-            asset_cache = cache.get('asset_list')
+            asset_cache = asset_list_store.get()
             if asset_cache:
-                cache.delete('asset_list')
                 asset_cache.append(compiled_data[0])
-                cache.set('asset_list', asset_cache, timeout=CACHE_TIMEOUT)
+                asset_list_store.set(asset_cache)
         else:
             return bad_request('Failed to create asset!')
 
@@ -504,7 +519,7 @@ def update_asset(id):
             data['@class'] = data.pop('asset_class')
 
         url = current_app.config['UFRAME_ASSETS_URL'] + '/%s/%s' % ('assets', id)
-        response = requests.put(url, data=json.dumps(data), headers=_uframe_headers())
+        response = uframe_client.put(url, data=json.dumps(data), headers=_uframe_headers())
         if response.status_code != 200:
             message = '(%d) Failed to update asset %d.' % (response.status_code, id)
             return bad_request(message)
@@ -519,18 +534,17 @@ def update_asset(id):
             if not compiled_data or compiled_data is None:
                 raise Exception('_compile_assets returned empty or None result.')
 
-            asset_cache = cache.get('asset_list')
-            if "error" in asset_cache:
+            asset_cache = asset_list_store.get()
+            if asset_cache and "error" in asset_cache:
                 message = 'Error returned in \'asset_list\' cache; unable to update cache.'
                 return bad_request(message)
 
             if asset_cache:
-                cache.delete('asset_list')
-                for row in asset_cache:
+                for i, row in enumerate(asset_cache):
                     if row['id'] == id:
-                        row.update(compiled_data[0])
+                        asset_cache[i] = dict(row, **compiled_data[0])
                         break
-                cache.set('asset_list', asset_cache, timeout=CACHE_TIMEOUT)
+                asset_list_store.set(asset_cache)
 
         return response.text, response.status_code
 
@@ -555,19 +569,17 @@ def delete_asset(id):
     this_asset = ""
     try:
         url = current_app.config['UFRAME_ASSETS_URL'] + '/assets/%s' % str(id)
-        response = requests.delete(url, headers=_uframe_headers())
+        response = uframe_client.delete(url, headers=_uframe_headers())
 
-        asset_cache = cache.get('asset_list')
+        asset_cache = asset_list_store.get()
         if asset_cache:
-            cache.delete('asset_list')
             for row in asset_cache:
                 if row['id'] == id:
                     this_asset = row
                     break
             if this_asset:
-                cache.delete('asset_list')
                 asset_cache.remove(this_asset)
-                cache.set('asset_list', asset_cache, timeout=CACHE_TIMEOUT)
+                asset_list_store.set(asset_cache)
 
         return response.text, response.status_code
 
@@ -657,16 +669,7 @@ def _get_all_assets():
     """
     try:
         # Get 'good' assets
-        asset_cache = cache.get('asset_list')
-        if asset_cache:
-            asset_data = asset_cache
-        else:
-            try:
-                asset_data = get_assets_payload()
-                cache.set('asset_list', asset_data, timeout=CACHE_TIMEOUT)
-            except Exception as err:
-                message = err.message
-                raise Exception(message)
+        asset_data = asset_list_cache.get()
 
         # Get 'bad' assets
         bad_asset_cache = cache.get('bad_asset_list')
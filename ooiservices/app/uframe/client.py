@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/client.py
+
+Shared HTTP client for uframe (and other backend) endpoints.
+
+One requests Session is kept per base url (scheme://host:port) and per process, with a connection
+pool of UFRAME_POOL_SIZE keep-alive connections, so TCP setup is paid once per worker rather than
+once per call. Requests default to the (UFRAME_TIMEOUT_CONNECT, UFRAME_TIMEOUT_READ) timeouts.
+Idempotent requests (GET, HEAD, PUT, DELETE, OPTIONS) failing to connect, or answered with 502, 503
+or 504, are retried up to UFRAME_RETRIES times, waiting UFRAME_RETRY_BACKOFF * 2**attempt seconds
+between attempts. Latency and error counts are recorded per endpoint (method, host and leading path).
+
+proxy_response streams a uframe response through to the client without reading it into memory.
+'''
+
+from flask import current_app, has_app_context, Response
+import requests
+import requests.adapters
+from requests.exceptions import ConnectionError, Timeout
+import os
+import threading
+import time
+import urlparse
+
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS']
+RETRY_STATUS_CODES = [502, 503, 504]
+CLIENT_DEFAULTS = {
+    'UFRAME_POOL_SIZE': 10,
+    'UFRAME_RETRIES': 2,
+    'UFRAME_RETRY_BACKOFF': 0.5,
+    'UFRAME_TIMEOUT_CONNECT': 5,
+    'UFRAME_TIMEOUT_READ': 30,
+    'UFRAME_METRICS_PATH_DEPTH': 2,
+    'UFRAME_PROXY_CHUNK_SIZE': 65536,
+}
+PROXY_HEADERS = ['Content-Type', 'Content-Length', 'Content-Disposition', 'Content-Encoding']
+
+
+def _config(name):
+    if has_app_context():
+        return current_app.config.get(name, CLIENT_DEFAULTS[name])
+    return CLIENT_DEFAULTS[name]
+
+
+def base_url(url):
+    """ Return scheme://netloc of url.
+    """
+    parts = urlparse.urlsplit(url)
+    return '%s://%s' % (parts.scheme, parts.netloc)
+
+
+def endpoint_name(method, url, depth=2):
+    """ Name of the endpoint for metrics: method, host and the first depth path segments
+    (numeric segments are replaced by {id}).
+    """
+    parts = urlparse.urlsplit(url)
+    segments = []
+    for segment in parts.path.split('/'):
+        if not segment:
+            continue
+        if len(segments) >= depth:
+            break
+        segments.append('{id}' if segment.isdigit() else segment)
+    return '%s %s/%s' % (method.upper(), parts.netloc, '/'.join(segments))
+
+
+class UFrameClient(object):
+    """ Pooled, keep-alive client with retries, default timeouts and per endpoint latency metrics.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pid = None
+        self._metrics = {}
+
+    def session(self, url):
+        """ Return the session for the base url of url (sessions are not shared across forked processes).
+        """
+        key = base_url(url)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._sessions = {}
+                self._metrics = {}
+                self._pid = os.getpid()
+            session = self._sessions.get(key, None)
+            if session is None:
+                pool_size = _config('UFRAME_POOL_SIZE')
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                                        max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """ Issue a request; accepts the keyword arguments of requests.request.
+        """
+        method = method.upper()
+        if kwargs.get('timeout', None) is None:
+            kwargs['timeout'] = (_config('UFRAME_TIMEOUT_CONNECT'), _config('UFRAME_TIMEOUT_READ'))
+        retries = _config('UFRAME_RETRIES') if method in IDEMPOTENT_METHODS else 0
+        backoff = _config('UFRAME_RETRY_BACKOFF')
+        endpoint = endpoint_name(method, url, _config('UFRAME_METRICS_PATH_DEPTH'))
+        session = self.session(url)
+
+        attempt = 0
+        while True:
+            start = time.time()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (ConnectionError, Timeout) as err:
+                self._record(endpoint, time.time() - start, None, err)
+                if attempt >= retries or (isinstance(err, Timeout) and not isinstance(err, ConnectionError)):
+                    raise
+            else:
+                self._record(endpoint, time.time() - start, response.status_code, None)
+                if attempt >= retries or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                response.close()
+            time.sleep(backoff * (2 ** attempt))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request('POST', url, data=data, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request('PUT', url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def _record(self, endpoint, elapsed, status_code, error):
+        with self._lock:
+            item = self._metrics.get(endpoint, None)
+            if item is None:
+                item = {'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'status_codes': {}}
+                self._metrics[endpoint] = item
+            item['count'] += 1
+            item['total_seconds'] += elapsed
+            item['max_seconds'] = max(item['max_seconds'], elapsed)
+            if error is not None:
+                item['errors'] += 1
+            else:
+                status = str(status_code)
+                item['status_codes'][status] = item['status_codes'].get(status, 0) + 1
+
+    def metrics(self):
+        """ Return {endpoint: {count, errors, total_seconds, max_seconds, mean_seconds, status_codes}}
+        for requests issued by this process.
+        """
+        with self._lock:
+            result = {}
+            for endpoint, item in self._metrics.iteritems():
+                entry = dict(item)
+                entry['status_codes'] = dict(item['status_codes'])
+                entry['mean_seconds'] = item['total_seconds'] / item['count'] if item['count'] else 0.0
+                result[endpoint] = entry
+            return result
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics = {}
+
+
+uframe_client = UFrameClient()
+
+
+def proxy_response(url, timeout=None):
+    """ Return a streaming Response relaying the body of a uframe GET of url, chunk by chunk and
+    undecoded (compressed bodies are passed through with their Content-Encoding), together with the
+    status code and the content type, length, disposition and encoding headers.
+    """
+    response = uframe_client.get(url, stream=True, timeout=timeout)
+    chunk_size = _config('UFRAME_PROXY_CHUNK_SIZE')
+
+    def generate():
+        try:
+            for chunk in response.raw.stream(chunk_size, decode_content=False):
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+
+    headers = [(name, response.headers[name]) for name in PROXY_HEADERS if name in response.headers]
+    return Response(generate(), status=response.status_code, headers=headers, direct_passthrough=True)
@@ -5,9 +5,12 @@ uframe endpoints
 # base
 from flask import jsonify, request, current_app, make_response, Response, send_file
 from ooiservices.app import cache, db
+from ooiservices.app.cache_tools import RefreshingValue
+from ooiservices.app.sharded_cache import ShardedValue
 from ooiservices.app.uframe import uframe as api
 from ooiservices.app.models import DisabledStreams
-from ooiservices.app.uframe.vocab import get_display_name_by_rd, get_long_display_name_by_rd
+from ooiservices.app.uframe.vocab import get_display_name_by_rd, get_long_display_name_by_rd, resolve_names
+from ooiservices.app.uframe.vocab import name_cycle, prefetch_names
 from ooiservices.app.uframe.vocab import get_parameter_name_by_parameter as get_param_names
 from ooiservices.app.uframe.vocab import get_stream_name_by_stream as get_stream_name
 from ooiservices.app.main.authentication import auth
@@ -15,8 +18,18 @@ from ooiservices.app.main.errors import internal_server_error, bad_request
 # data imports
 from ooiservices.app.uframe.data import get_data, get_simple_data, find_parameter_ids, get_multistream_data
 from ooiservices.app.uframe.plotting import generate_plot
-from ooiservices.app.uframe.assetController import get_events_by_ref_des
-from ooiservices.app.uframe.events import get_events
+from ooiservices.app.uframe.event_index import get_events_by_rd, get_current_deployment
+from ooiservices.app.uframe.particles import iter_particles, ParticleStreamError, NoParticlesError, ParticleFrame
+from ooiservices.app.uframe.profiles import ProfileSegmenter
+from ooiservices.app.uframe.stream_index import get_stream_index, sorted_ids, prefix_ids, concept_ids, search, \
+    end_time_ids, page, cache_stream_list, stream_list_cache, get_stream_list, get_stream_parameters, get_stream, \
+    stream_parameters_store, stream_key, page_after, encode_cursor, decode_cursor, project, stream_min, \
+    PARAMETER_FIELDS
+from ooiservices.app.uframe.plot_cache import plot_cache_key, get_cached_plot, set_cached_plot, plot_response, plot_entry
+from ooiservices.app.concurrency import run_concurrently
+from ooiservices.app.uframe.parameter_index import update_parameter_index
+from ooiservices.app.uframe.toc_tree import toc_tree, build_toc_tree, update_toc_tree, get_toc_branch, get_toc_level
+from ooiservices.app.uframe.toc_cache import refresh_compiled_toc, toc_delta_since, get_built_toc_version
 
 from urllib import urlencode
 from datetime import datetime
@@ -27,13 +40,13 @@ import pytz
 from contextlib import closing
 import time
 import urllib2
-from copy import deepcopy
 from operator import itemgetter
+from copy import deepcopy
 from bs4 import BeautifulSoup
 import urllib
 import os.path
 import requests
-import requests.adapters
+from ooiservices.app.uframe.client import uframe_client, proxy_response
 import requests.exceptions
 from requests.exceptions import ConnectionError, Timeout
 
@@ -44,66 +57,139 @@ from StringIO import StringIO
 
 __author__ = 'Andy Bird'
 
-requests.adapters.DEFAULT_RETRIES = 2
 CACHE_TIMEOUT = 172800
+# Seconds after which cached cam images are compiled again (in the background).
+CAM_IMAGES_SOFT_TIMEOUT = 43200
 COSMO_CONSTANT = 2208988800
 
+# Large cached values, stored in shards (large format files by reference designator).
+large_format_store = ShardedValue('large_format', timeout=CACHE_TIMEOUT)
+glider_tracks_store = ShardedValue('glider_tracks', timeout=CACHE_TIMEOUT)
+
+# Default number of streams of /stream pages requested with a cursor.
+CURSOR_PAGE_SIZE = 100
+
 
 def dfs_streams():
     """ Compile a list of streams from uframe data.
     """
     try:
-        retval = []
-        streams = []
         toc = process_uframe_toc()
         if toc is None:
             message = 'The uframe toc response is empty, unable to return stream information.'
             raise Exception(message)
 
-        # For each instrument, prepare parameters dictionary
-        for instrument in toc:
-            parameters_dict = parameters_in_instrument(instrument['instrument_parameters'])
-            streams = data_streams_in_instrument(instrument, parameters_dict, streams)
+        retval = streams_from_toc(toc)
+        if request.args.get('reference_designator'):
+            retval = [stream for stream in retval
+                      if stream['reference_designator'] == request.args.get('reference_designator')]
+        return retval
+    except Exception as err:
+        message = '[dfs_streams] Exception: %s' % str(err)
+        current_app.logger.info(message)
+        raise Exception(message)
 
-        # try to use the event list cache first, if not loaded...load the event cache.
-        cached = cache.get('event_list')
-        if cached:
-            event_list = cached
-        else:
-            get_events()
-            event_list = cache.get('event_list')
 
-        for stream in streams:
-            try:
-                data_dict = dict_from_stream(*stream)
-            except Exception as e:
-                message = 'Failed to process streams to dict; %s' % e.message
-                current_app.logger.exception(message)
-                continue
-            if request.args.get('reference_designator'):
-                if request.args.get('reference_designator') != data_dict['reference_designator']:
-                    continue
-            if data_dict:
-                retval.append(data_dict)
-
-        # Populate event information in response dictionaries
-        for stream in retval:
-            response = get_events_by_ref_des(event_list, stream['reference_designator'])
-            events = json.loads(response.data)
-            for event in events['events']:
-                if event['eventClass'] == '.DeploymentEvent' and event['tense'] == 'PRESENT':
-                    stream['depth'] = event['depth']
-                    stream['lat_lon'] = event['lat_lon']
-                    stream['cruise_number'] = event['cruise_number']
-                    stream['deployment_number'] = event['deployment_number']
+def compile_stream_list():
+    """ Compile the stream list and cache it (with its search index). If the cached stream list was compiled
+    from an earlier version of the toc, only the streams of instruments added or changed since are compiled.
+    """
+    try:
+        toc, toc_version = refresh_uframe_toc()
+        if toc is None:
+            message = 'The uframe toc response is empty, unable to return stream information.'
+            raise Exception(message)
 
-        return retval
+        streams = get_stream_list()
+        delta = None
+        if streams and toc_version is not None:
+            delta = toc_delta_since(get_built_toc_version('stream_list'))
+        if delta is None:
+            streams = streams_from_toc(toc)
+        else:
+            streams = streams_from_toc(toc, streams, set(delta['added'] + delta['removed'] + delta['changed']))
+        cache_stream_list(streams, toc_version)
+        stream_list_cache.mark_built()
+        return streams
     except Exception as err:
-        message = '[dfs_streams] Exception: %s' % str(err)
+        message = '[compile_stream_list] Exception: %s' % str(err)
         current_app.logger.info(message)
         raise Exception(message)
 
 
+def streams_from_toc(toc, streams=None, stale=None):
+    """ Compile the streams of the instruments in the processed toc, with current deployment information.
+    When a previous stream list is provided, (copies of) its streams are reused for instruments not in stale.
+    """
+    previous = {}
+    if streams is not None:
+        for stream in streams:
+            if stream['reference_designator'] not in stale:
+                previous.setdefault(stream['reference_designator'], []).append(dict(stream))
+
+    pending = [instrument for instrument in toc
+               if streams is None or instrument['reference_designator'] in stale]
+    retval = []
+    with name_cycle():
+        prefetch_instrument_names(pending)
+        for instrument in toc:
+            rd = instrument['reference_designator']
+            if streams is not None and rd not in stale:
+                retval.extend(previous.get(rd, []))
+            else:
+                retval.extend(instrument_streams(instrument))
+
+    # Populate current deployment information in response dictionaries
+    for stream in retval:
+        event = get_current_deployment(stream['reference_designator'])
+        if event is not None:
+            stream['depth'] = event['depth']
+            stream['lat_lon'] = event['lat_lon']
+            stream['cruise_number'] = event['cruise_number']
+            stream['deployment_number'] = event['deployment_number']
+    return retval
+
+
+def prefetch_instrument_names(instruments):
+    """ Load the display names used by instrument_streams for instruments of the processed toc in batches:
+    reference designators (and their array, mooring and platform), stream names and parameter names.
+    """
+    try:
+        rds = []
+        stream_names = []
+        parameter_names = []
+        for instrument in instruments:
+            rd = instrument['reference_designator']
+            rds.extend([rd, rd[:2], rd[:8], rd[:14]])
+            for data_stream in instrument.get('streams', None) or []:
+                stream_names.append('_'.join([data_stream['method'].replace('_', '-'),
+                                              data_stream['stream'].replace('_', '-')]))
+            for parameter in instrument.get('instrument_parameters', None) or []:
+                parameter_names.append(parameter['particleKey'])
+        resolve_names(rds)
+        prefetch_names(streams=stream_names, parameters=parameter_names)
+    except Exception as err:
+        message = 'Unable to prefetch display names: %s' % str(err)
+        current_app.logger.info(message)
+
+
+def instrument_streams(instrument):
+    """ Compile the list of stream dictionaries for an instrument of the processed toc.
+    """
+    result = []
+    parameters_dict = parameters_in_instrument(instrument['instrument_parameters'])
+    for stream in data_streams_in_instrument(instrument, parameters_dict, []):
+        try:
+            data_dict = dict_from_stream(*stream)
+        except Exception as e:
+            message = 'Failed to process streams to dict; %s' % e.message
+            current_app.logger.exception(message)
+            continue
+        if data_dict:
+            result.append(data_dict)
+    return result
+
+
 def parameters_in_instrument(parameters):
     """ Process an instrument's parameters when parameter shape is 'scalar' or 'function'.
     """
@@ -330,6 +416,18 @@ def _compile_cam_images():
     return image_dict
 
 
+def _build_cam_images():
+    data = _compile_cam_images()
+    if "error" in data:
+        message = 'Unable to compile cam images.'
+        raise Exception(message)
+    cam_images_cache.set(data)
+    return data
+
+
+cam_images_cache = RefreshingValue('cam_images', _build_cam_images, CAM_IMAGES_SOFT_TIMEOUT, CACHE_TIMEOUT)
+
+
 # @auth.login_required
 @api.route('/get_cam_image/<string:image_id>.png', methods=['GET'])
 def get_uframe_cam_image(image_id):
@@ -353,19 +451,17 @@ def get_uframe_cam_images():
     get cam images
     '''
     try:
-        cached = cache.get('cam_images')
         will_reset_cache = False
         if request.args.get('reset') == 'true':
             will_reset_cache = True
 
-        will_reset = request.args.get('reset')
-        if cached and not(will_reset_cache):
-            data = cached
+        if not will_reset_cache:
+            data = cam_images_cache.get()
         else:
             data = _compile_cam_images()
 
             if "error" not in data:
-                cache.set('cam_images', data, timeout=CACHE_TIMEOUT)
+                cam_images_cache.set(data)
 
         return jsonify({"cam_images":data})
     except requests.exceptions.ConnectionError as e:
@@ -442,10 +538,11 @@ def _compile_large_format_files(test_ref_des=None, test_date_str=None):
     filetypes_to_check = ['-HYD', '-OBS', '-CAMDS', '-CAMHD', '-ZPL']
     extensions_to_check = ['.mseed', '.png', '.mp4', '.mov', '.raw']
 
-    # Go fetch whatever data has already been cached
+    # Go fetch whatever data has already been cached (a copy; the cached files are shared with other requests)
     data_dict = {}
-    if cache.get('large_format') is not None:
-        data_dict = cache.get('large_format')
+    cached = large_format_store.get()
+    if cached is not None:
+        data_dict = deepcopy(cached)
 
     # Get the current date to use to check against the data on HYRAX server
     current_year = datetime.utcnow().strftime('%Y')
@@ -506,7 +603,7 @@ def _compile_large_format_files(test_ref_des=None, test_date_str=None):
                                     data_dict[ref_des][year][month][day].append(entry)
 
                 # Update the cache in case the connection gets reset you don't want to lose anything
-                cache.set('large_format', data_dict, timeout=CACHE_TIMEOUT)
+                large_format_store.set(data_dict)
 
     return data_dict
 
@@ -561,16 +658,22 @@ def get_uframe_large_format_files_by_ref(ref_des, date_str):
 
 @api.route('/get_large_format_files')
 def get_uframe_large_format_files():
-    """ Get all available large format files.
+    """ Get all available large format files; with 'ref_des', only those of the reference designator.
     """
     try:
-        cached = cache.get('large_format')
+        ref_des = request.args.get('ref_des')
+        if ref_des and large_format_store.count():
+            return jsonify({ref_des: large_format_store.get_group(ref_des) or {}})
+
+        cached = large_format_store.get()
         if cached:
             data = cached
         else:
             data = _compile_large_format_files()
             if "error" not in data:
-                cache.set('large_format', data, timeout=CACHE_TIMEOUT)
+                large_format_store.set(data)
+            if ref_des:
+                data = {ref_des: data.get(ref_des, {})}
 
         return jsonify(data)
     except requests.exceptions.ConnectionError as e:
@@ -582,7 +685,7 @@ def _check_for_gps_position_stream(glider_url,glider_stream,glider_method):
     """ Used to check if a desired stream is available.
     """
     url = glider_url+"/metadata"
-    req_gps_info_list = requests.get(url)
+    req_gps_info_list = uframe_client.get(url)
     metadata = req_gps_info_list.json()
     time_list = metadata['times']
     param_list = metadata['parameters']
@@ -668,7 +771,7 @@ def _get_glider_track_data(glider_outline,glider_cache=None):
 
                     if glider_track['location'] not in gliders_to_update:
                         #if the glider is not in the update list get as much as we can
-                        r = requests.get(glider_track['url']+data_request_str)
+                        r = uframe_client.get(glider_track['url']+data_request_str)
                         #loop through the returned data
                         track_data = _extract_glider_track_from_data(r.json(),glider_track['depth'])
                         glider_track['track'] = track_data
@@ -694,7 +797,7 @@ def _get_glider_track_data(glider_outline,glider_cache=None):
                             start_req = "&startdt=" + existing_data['times']['end_time']
                             end_req = "&enddt="   + glider_track['times']['end_time']
 
-                            r = requests.get(glider_track['url']+data_request_str+start_req+end_req)
+                            r = uframe_client.get(glider_track['url']+data_request_str+start_req+end_req)
                             track_data = _extract_glider_track_from_data(r.json(),glider_track['depth'])
 
                             #set, the track data to be the cache and add the new data in
@@ -822,7 +925,7 @@ def _get_additional_data(glider_track):
     if search_stream in glider_track['available_streams']:
         #get the additional metadata fields
         url = glider_track['glider_metadata_url']+"/metadata"
-        req_addit_info_list = requests.get(url)
+        req_addit_info_list = uframe_client.get(url)
         metadata = req_addit_info_list.json()
         param_list = metadata['parameters']
 
@@ -849,7 +952,7 @@ def _get_additional_data(glider_track):
             param_request += '&parameters='+",".join(parameters)
 
         additional_data_url = glider_track['glider_metadata_url'] + "/"+ search_method +"/"+ search_stream + param_request
-        req_addit_info_data = requests.get(additional_data_url)
+        req_addit_info_data = uframe_client.get(additional_data_url)
         if req_addit_info_data.status_code == 200:
             data = req_addit_info_data.json()
             #newest should be on the top
@@ -874,7 +977,7 @@ def _compile_glider_tracks(update_tracks):
     base_url, timeout, timeout_read = get_uframe_info()
     # Get the list of mobile assets
     try:
-        r = requests.get(base_url)
+        r = uframe_client.get(base_url)
     except Exception as err:
         message = 'Failed to retrieve glider data from uframe:\n\tUrl:\t%s\n\tError:\t%s' % (base_url, err.message)
         print 'Exception: ', message
@@ -887,7 +990,7 @@ def _compile_glider_tracks(update_tracks):
     # Glider discovery
     for p in all_platforms:
         if "MOAS" in p:
-            r_p = requests.get(base_url+"/"+p)
+            r_p = uframe_client.get(base_url+"/"+p)
             try:
                 p_p = r_p.json()
                 for gl in p_p:
@@ -895,7 +998,7 @@ def _compile_glider_tracks(update_tracks):
                     glider_url = base_url+glider_location
 
                     # Get the slider streams to see whats available
-                    req_instrument_list = requests.get(glider_url)
+                    req_instrument_list = uframe_client.get(glider_url)
                     available_instruments = req_instrument_list.json()
 
                     # Set some defaults, that will be overridden
@@ -925,7 +1028,7 @@ def _compile_glider_tracks(update_tracks):
                     # store the location to the metadata url
                     glider_metadata_url = glider_url
                     # get a list of the methods
-                    req_method_list = requests.get(glider_url)
+                    req_method_list = uframe_client.get(glider_url)
                     available_methods = req_method_list.json()
                     # if its not done get the best selected
                     if glider_method is None:
@@ -935,7 +1038,7 @@ def _compile_glider_tracks(update_tracks):
                     glider_location+="/"+glider_method
                     glider_url = base_url+glider_location
 
-                    req_stream_list = requests.get(glider_url)
+                    req_stream_list = uframe_client.get(glider_url)
                     available_streams = req_stream_list.json()
                     if glider_stream is None:
                         glider_stream = available_streams[0]
@@ -972,13 +1075,14 @@ def _compile_glider_tracks(update_tracks):
     print "number of gliders:",len(glider_info)," skipped due to non ENG:",skipped_glider
     if update_tracks:
         print '\n glider_tracks: update_tracks is True'
-        _get_glider_track_data(glider_info, cache.get('glider_tracks'))
+        # Cached tracks are extended in place; use a copy, the cached gliders are shared with other requests.
+        _get_glider_track_data(glider_info, deepcopy(glider_tracks_store.get()))
     else:
         print '\n glider_tracks: update_tracks is False'
         _get_glider_track_data(glider_info)
 
     #if weve come this far, update the cache with any changes
-    cache.set('glider_tracks',glider_info)
+    glider_tracks_store.set(glider_info)
 
     # return it so we can see it
     return glider_info
@@ -990,7 +1094,15 @@ def streams_list():
     """ Get streams (list of dictionaries); used in the data catalog.
 
     List of request.args used in this function:
-        'sort', 'order', 'min', 'concepts', 'search', 'startDate', 'endDate' and 'startAt'
+        'sort', 'order', 'min', 'fields', 'concepts', 'search', 'startDate', 'endDate', 'startAt', 'count'
+        and 'cursor'
+
+    'fields' is a comma separated list of the stream fields returned (e.g.
+    fields=reference_designator,stream_name,end); with 'min' the parameter arrays and download links are
+    left out. Parameter detail of a stream is available from /stream/<refdes>/<stream>/parameters.
+
+    Pages are requested either with 'startAt' and 'count', or with 'cursor' (empty for the first page) and
+    'count' (default CURSOR_PAGE_SIZE); cursor responses include 'next_cursor' (null on the last page).
 
     Sample response data (abbreviated):
     {
@@ -1075,214 +1187,151 @@ def streams_list():
           ]
         },
     """
-    # Get cached stream_list; if available continue, if not fetch.
-    cached = cache.get('stream_list')
-    if cached:
-        retval = cached
-    else:
-        try:
-            retval = dfs_streams()
-        except Exception as err:
-            message = err.message
-            return bad_request(message)
-
-        if 'error' not in retval:
-            cache.set('stream_list', retval, timeout=CACHE_TIMEOUT)
-
+    # Get stream list search index (built when the stream list is compiled).
     try:
-        is_reverse = True
-        if request.args.get('sort') and request.args.get('sort') != "":
-            sort_by = request.args.get('sort')
-            if request.args.get('order') and request.args.get('order') != "":
-                order = request.args.get('order')
-                if order == 'reverse':
-                    is_reverse = False
-        else:
-            sort_by = 'end'
-        retval = sorted(retval, key=itemgetter(sort_by), reverse=is_reverse)
-    except (TypeError, KeyError) as e:
-        return retval
-
-    # lets create a container to work with
-    temp_list = []
-
-    # instantiate a disabled streams model cursor
-    disabled_streams = DisabledStreams().query.all()
-
-    # grab the json from the instance of all it's data
-    disabled_streams = [disabled_stream.to_json() \
-                        for disabled_stream in disabled_streams]
-
-    # look over each of the items in the disabled streams
-    '''
-    @param search_terms:
-        the list of strings that will be searched against
-    @param data_set:
-        the main data being parsed
-    '''
-    def _parse_lists(search_terms, data_set):
-        included_streams = []
-
-        '''
-        @param term:
-            The search term that will be checking aginst
-        @param subset:
-            The data being searched
-        @param length:
-            A very specific argument for choosing what part of the reference
-            designator to use
-        '''
-        def _gen(term, subset, length):
-            result = []
-            for obj in subset:
-                if obj['reference_designator'][:length] not in term:
-                    result.append(obj)
-            return result
-
-        for stream in search_terms:
-
-            # establish a match criteria, so we know at what level to delete
-            match_on = len(stream['refDes'])
-
-            # TODO: Refactor this to use a method
-            if match_on == 2:
-                if len(included_streams) is 0:
-                    included_streams = _gen(stream['refDes'], data_set, match_on)
-                else:
-                    included_streams = _gen(stream['refDes'], included_streams, match_on)
-
-            elif match_on == 8:
-                if len(included_streams) is 0:
-                    included_streams = _gen(stream['refDes'], data_set, match_on)
-                else:
-                    included_streams = _gen(stream['refDes'], included_streams, match_on)
-
-            elif match_on == 11:
-                if len(included_streams) is 0:
-                    included_streams = _gen(stream['refDes'], data_set, match_on)
-                else:
-                    included_streams = _gen(stream['refDes'], included_streams, match_on)
-
-            elif match_on == 27:
-                if len(included_streams) is 0:
-                    included_streams = _gen(stream['refDes'], data_set, match_on)
-                else:
-                    included_streams = _gen(stream['refDes'], included_streams, match_on)
-
-        if len(included_streams) is 0:
-            return data_set
-
-        return included_streams
-
-    retval = _parse_lists(disabled_streams, retval)
-
-    # If 'min' is provided and enabled, the filter the data.
-    if request.args.get('min') == 'True':
-        for obj in retval:
-            try:
-                del obj['parameter_id']
-                del obj['units']
-                del obj['variable_type']
-                del obj['variable_types']
-                del obj['download']
-                del obj['variables']
-                del obj['variables_shape']
-            except KeyError as e:
-                print e
+        index = get_stream_index()
+    except Exception as err:
+        message = err.message
+        return bad_request(message)
+    streams = index['streams']
+
+    # Sort order, by default 'end' (most recent first); order 'reverse' for ascending order.
+    is_reverse = True
+    sort_by = 'end'
+    if request.args.get('sort') and request.args.get('sort') != "":
+        sort_by = request.args.get('sort')
+        if request.args.get('order') and request.args.get('order') != "":
+            if request.args.get('order') == 'reverse':
+                is_reverse = False
+    order = sorted_ids(index, sort_by)
+    if order is None:
+        return bad_request('Unable to sort streams by \'%s\'.' % sort_by)
+
+    # Exclude disabled streams.
+    ids = None
+    disabled = prefix_ids(index, get_disabled_stream_rds())
+    if disabled:
+        ids = set(range(len(streams))) - disabled
 
     # If 'concepts' provided, then filter the data
     if request.args.get('concepts') and request.args.get('concepts') != "":
-        return_list = []
-        search_term = str(request.args.get('concepts')).split()
-        search_set = set(search_term)
-        for subset in search_set:
-            for item in retval:
-                if subset.lower() in str(item['reference_designator']).lower():
-                    return_list.append(item)
-        retval = return_list
+        concepts = concept_ids(index, str(request.args.get('concepts')).split())
+        ids = concepts if ids is None else ids & concepts
 
     # If 'search' parameter(s) provided, then filter the data.
     if request.args.get('search') and request.args.get('search') != "":
-        return_list = []
-        search_term = str(request.args.get('search')).split()
-        search_set = set(search_term)
-        for subset in search_set:
-            if len(return_list) > 0:
-                ven_subset = []
-                ven_set = deepcopy(retval)
-                for item in ven_set:
-                    if subset.lower() in str(item['array_name']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['site_name']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['platform_name']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['assembly_name']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['reference_designator']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['stream_name']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['parameter_display_name']).lower():
-                        ven_subset.append(item)
-                    elif subset.lower() in str(item['long_display_name']).lower():
-                        ven_subset.append(item)
-                retval = ven_subset
-            else:
-                for item in retval:
-                    if subset.lower() in str(item['array_name']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['site_name']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['platform_name']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['assembly_name']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['reference_designator']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['parameter_display_name']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['stream_name']).lower():
-                        return_list.append(item)
-                    elif subset.lower() in str(item['long_display_name']).lower():
-                        return_list.append(item)
-                retval = return_list
-
-    # If 'startDate' and 'endDate' provided, then use to filter the data.
+        found = search(index, str(request.args.get('search')).split())
+        ids = found if ids is None else ids & found
+
+    # If 'startDate' and 'endDate' provided, then use to filter the data (by stream end date).
     if request.args.get('startDate') and request.args.get('endDate') != "":
-        # setup a temporary container for the result and convert the time
-        return_val = []
         search_start_date = float(request.args.get('startDate'))/1000.0
         search_end_date = float(request.args.get('endDate'))/1000.0
+        in_range = end_time_ids(index, search_start_date, search_end_date)
+        ids = in_range if ids is None else ids & in_range
 
-        # loop over the current return value and begin parsing
-        for obj in retval:
-            obj_end_date = iso_to_timestamp(obj['end'])
-            # add to the return_val if the obj has a end date
-            # greater than or equal to 'startDate' and an end date
-            # less than or equal to 'endDate'
-            # ** we are only filtering by END date **
-            if obj_end_date >= search_start_date and obj_end_date <= search_end_date:
-                return_val.append(obj)
-
-        # assign the new list to retval
-        retval = return_val
-
-    # If 'startAt' provided, then use to filter the data.
+    # If 'cursor' provided, page the data from the cursor; if 'startAt' provided, then use to page the data.
+    start_at = 0
+    count = None
+    next_cursor = None
+    try:
+        if 'cursor' in request.args:
+            count = int(request.args.get('count', CURSOR_PAGE_SIZE))
+            if count <= 0:
+                raise ValueError('Invalid count: %d' % count)
+            position = None
+            if request.args.get('cursor'):
+                position = decode_cursor(index, order, request.args.get('cursor'), sort_by, is_reverse)
+            page_ids, position = page_after(order, ids, position, count, reverse=is_reverse)
+            if position is not None:
+                next_cursor = encode_cursor(index, order, position, sort_by, is_reverse)
+        else:
+            if request.args.get('startAt'):
+                start_at = int(request.args.get('startAt'))
+                count = int(request.args.get('count'))
+            page_ids = page(order, ids, start_at, count, reverse=is_reverse)
+    except ValueError as err:
+        return bad_request(str(err))
+    retval = [streams[i] for i in page_ids]
+
+    # Select the fields returned: requested 'fields', summaries for 'min', else streams with parameter arrays.
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args.get('fields').split(',') if field.strip()]
+        if set(fields) & set(PARAMETER_FIELDS):
+            retval = with_parameters(retval)
+        retval = [project(item, fields) for item in retval]
+    elif request.args.get('min') == 'True':
+        retval = [stream_min(item) for item in retval]
+    else:
+        retval = with_parameters(retval)
+
+    total = len(streams) if ids is None else len(ids)
+    if 'cursor' in request.args:
+        return jsonify({"count": count,
+                        "total": total,
+                        "next_cursor": next_cursor,
+                        "streams": retval})
     if request.args.get('startAt'):
-        start_at = int(request.args.get('startAt'))
-        count = int(request.args.get('count'))
-        total = int(len(retval))
-        retval_slice = retval[start_at:(start_at + count)]
         result = jsonify({"count": count,
                             "total": total,
                             "startAt": start_at,
-                            "streams": retval_slice})
+                            "streams": retval})
         return result
 
     else:
         return jsonify(streams=retval)
 
+
+def with_parameters(streams):
+    """ Streams (summaries from the stream index) with their parameter arrays; a page of streams reads the
+    parameters of its streams only.
+    """
+    if len(streams) <= CURSOR_PAGE_SIZE:
+        return [dict(stream, **(get_stream_parameters(stream['reference_designator'], stream['stream_name']) or {}))
+                for stream in streams]
+    parameters = stream_parameters_store.get() or {}
+    return [dict(stream, **parameters.get(stream_key(stream), {})) for stream in streams]
+
+
+@api.route('/stream/<string:refdes>/<string:stream>/parameters')
+def stream_parameters_list(refdes, stream):
+    """ Get the parameters (name, display name, pdId, units, type and shape) of a stream of the stream list.
+    """
+    try:
+        parameters = get_stream(refdes, stream)
+        if parameters is None:
+            # Stream list not cached yet: build it.
+            get_stream_index()
+            parameters = get_stream(refdes, stream)
+        if parameters is None:
+            return bad_request('Stream %s of %s is not in the stream list.' % (stream, refdes))
+
+        variables = parameters.get('variables', None) or []
+        result = []
+        for i, variable in enumerate(variables):
+            item = {'name': variable}
+            for field, key in [('display_name', 'parameter_display_name'), ('pdId', 'parameter_id'),
+                               ('units', 'units'), ('type', 'variable_type'), ('shape', 'variables_shape')]:
+                values = parameters.get(key, None) or []
+                item[field] = values[i] if i < len(values) else None
+            result.append(item)
+        return jsonify({'reference_designator': refdes, 'stream_name': stream, 'parameters': result})
+    except Exception as err:
+        message = str(err.message) if err.message else str(err)
+        current_app.logger.info(message)
+        return internal_server_error(message)
+
+
+def get_disabled_stream_rds():
+    """ Get list of disabled stream reference designators (cached until disabled streams are changed).
+    """
+    rds = cache.get('disabled_stream_rds')
+    if rds is None:
+        rds = [disabled_stream.ref_des for disabled_stream in DisabledStreams.query.all()]
+        cache.set('disabled_stream_rds', rds, timeout=CACHE_TIMEOUT)
+    return rds
+
+
 @api.route('/disabled_streams', methods=['GET', 'POST'])
 @api.route('/disabled_streams/<int:id>', methods=['DELETE'])
 def disabled_streams(id=None):
@@ -1317,6 +1366,7 @@ def disabled_streams(id=None):
             # add to the databse
             db.session.add(disabled_stream)
             db.session.commit()
+            cache.delete('disabled_stream_rds')
             return jsonify({ 'disabled_streams': 'Stream Disabled!'}), 200
         except Exception as e:
             print type(e)
@@ -1333,6 +1383,7 @@ def disabled_streams(id=None):
             # obliterate it form the db
             db.session.delete(disabled_stream)
             db.session.commit()
+            cache.delete('disabled_stream_rds')
             return jsonify({'message': 'Stream Enabled!'}), 200
         except Exception as e:
             # roll it back if there is a problem.
@@ -1346,7 +1397,7 @@ def get_acoustic_datalist():
     """ Get all available acoustic data sets.
     """
     antelope_url = current_app.config['UFRAME_ANTELOPE_URL']
-    r = requests.get(antelope_url)
+    r = uframe_client.get(antelope_url)
     data = r.json()
 
     for ind, record in enumerate(data):
@@ -1389,7 +1440,7 @@ def get_uframe_glider_track():
     """ Get glider tracks.
     """
     try:
-        cached = cache.get('glider_tracks')
+        cached = glider_tracks_store.get()
         will_reset_cache = False
         will_update_using_cache = False
 
@@ -1406,7 +1457,7 @@ def get_uframe_glider_track():
             data = _compile_glider_tracks(will_update_using_cache)
 
             if "error" not in data:
-                cache.set('glider_tracks', data, timeout=CACHE_TIMEOUT)
+                glider_tracks_store.set(data)
 
         return jsonify({"gliders":data})
     except requests.exceptions.ConnectionError as e:
@@ -1422,7 +1473,7 @@ def get_uframe_streams(mooring, platform, instrument, stream_type):
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = '/'.join([uframe_url, mooring, platform, instrument, stream_type])
         current_app.logger.info("GET %s", url)
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         return response
     except Exception as e:
         return internal_server_error('uframe connection cannot be made.' + str(e.message))
@@ -1435,7 +1486,7 @@ def get_uframe_stream(mooring, platform, instrument, stream):
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, mooring, platform, instrument, stream])
         current_app.logger.info("GET %s", url)
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         return response
     except Exception as e:
         #return internal_server_error('uframe connection cannot be made.' + str(e.message))
@@ -1450,7 +1501,7 @@ def get_uframe_instrument_metadata(ref):
         mooring, platform, instrument = ref.split('-', 2)
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, mooring, platform, instrument, 'metadata'])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code == 200:
             data = response.json()
             return jsonify(metadata=data['parameters'])
@@ -1467,7 +1518,7 @@ def get_uframe_instrument_metadata_parameters(ref):
         mooring, platform, instrument = ref.split('-', 2)
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, mooring, platform, instrument, 'metadata', 'parameters'])
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         return response
     except:
         return _response_internal_server_error()
@@ -1494,7 +1545,7 @@ def get_uframe_stream_metadata_times(ref):
         uframe_url, timeout, timeout_read = get_uframe_info()
         url = "/".join([uframe_url, mooring, platform, instrument, 'metadata','times'])
         #current_app.logger.info("GET %s", url)
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code == 200:
             return response
         return jsonify(times={}), 200
@@ -1584,7 +1635,7 @@ def get_uframe_multi_stream_contents(stream1_dict, stream2_dict, start_time, end
         _, timeout, timeout_read = get_uframe_info()
         url = "/".join([current_app.config['UFRAME_URL'], query])
         current_app.logger.debug("***:" + url)
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             msg = map_common_error_message(response.text, response.text)
             return msg, 500
@@ -1594,66 +1645,60 @@ def get_uframe_multi_stream_contents(stream1_dict, stream2_dict, start_time, end
         return str(e), 500
 
 
-def get_uframe_plot_contents_chunked(mooring, platform, instrument, stream_type, stream,
-                                     start_time, end_time, dpa_flag, parameter_ids):
-    """ Gets the bounded stream contents, start_time and end_time need to be datetime objects
+def get_uframe_plot_particles(mooring, platform, instrument, stream_type, stream,
+                              start_time, end_time, dpa_flag, parameter_ids, limit=None):
+    """ Generator which yields the particles for a bounded plot request as they are received from uframe.
+    The response is decoded incrementally; the particle count, byte count and elapsed time are limited
+    by UFRAME_PLOT_MAX_PARTICLES, UFRAME_PLOT_MAX_BYTES and UFRAME_PLOT_TIMEOUT while streaming.
+    The uframe limit (number of particles uframe subsamples to) defaults to DATA_POINTS.
+    Raises NoParticlesError when uframe has no data for the window, otherwise an Exception with a message
+    suitable for the UI on failure.
     """
-    try:
-        if dpa_flag == '0' and len(parameter_ids) < 1:
-            query = '?beginDT=%s&endDT=%s&limit=%s' % (start_time, end_time, current_app.config['DATA_POINTS'])
-        elif dpa_flag == '1' and len(parameter_ids) < 1:
-            query = '?beginDT=%s&endDT=%s&limit=%s&execDPA=true' % \
-                    (start_time, end_time, current_app.config['DATA_POINTS'])
-        elif dpa_flag == '0' and len(parameter_ids) > 0:
-            query = '?beginDT=%s&endDT=%s&limit=%s&parameters=%s' % \
-                    (start_time, end_time, current_app.config['DATA_POINTS'], ','.join(parameter_ids))
-        elif dpa_flag == '1' and len(parameter_ids) > 0:
-            query = '?beginDT=%s&endDT=%s&limit=%s&execDPA=true&parameters=%s' % \
-                    (start_time, end_time, current_app.config['DATA_POINTS'], ','.join(map(str, parameter_ids)))
-
-        GA_URL = current_app.config['GOOGLE_ANALYTICS_URL']+'&ec=plot&ea=%s&el=%s' % \
-                 ('-'.join([mooring, platform, instrument, stream_type, stream]), '-'.join([start_time, end_time]))
-
-        UFRAME_DATA = current_app.config['UFRAME_URL'] + current_app.config['UFRAME_URL_BASE']
-        url = "/".join([UFRAME_DATA, mooring, platform, instrument, stream_type, stream + query])
-        current_app.logger.debug("***:" + url)
-
-        TOO_BIG = 1024 * 1024 * 15 # 15MB
-        CHUNK_SIZE = 1024 * 32   #...KB
-        TOTAL_SECONDS = current_app.config['UFRAME_PLOT_TIMEOUT']
-        dataBlock = ""
-        response = ""
-        idx = 0
-
-        # counter
-        t0 = time.time()
-
-        with closing(requests.get(url, stream=True)) as response:
-            content_length = 0
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                content_length = content_length + CHUNK_SIZE
-                t1 = time.time()
-                total = t1-t0
-                idx += 1
-
-                if content_length > TOO_BIG:
-                    return 'Data request too large, greater than 15MB', 500
-
-                if total > TOTAL_SECONDS:
-                    return 'Data request time out', 500
-
-                dataBlock += chunk
-
-            idx_c = dataBlock.rfind('}\n]')
-
-            if idx_c == -1:
-                dataBlock += "]"
-            urllib2.urlopen(GA_URL)
-            return json.loads(dataBlock), 200
+    if limit is None:
+        limit = current_app.config['DATA_POINTS']
+    query = '?beginDT=%s&endDT=%s&limit=%s' % (start_time, end_time, limit)
+    if dpa_flag == '1':
+        query += '&execDPA=true'
+    if len(parameter_ids) > 0:
+        query += '&parameters=%s' % ','.join(map(str, parameter_ids))
+
+    GA_URL = current_app.config['GOOGLE_ANALYTICS_URL']+'&ec=plot&ea=%s&el=%s' % \
+             ('-'.join([mooring, platform, instrument, stream_type, stream]), '-'.join([start_time, end_time]))
+
+    UFRAME_DATA = current_app.config['UFRAME_URL'] + current_app.config['UFRAME_URL_BASE']
+    url = "/".join([UFRAME_DATA, mooring, platform, instrument, stream_type, stream + query])
+    current_app.logger.debug("***:" + url)
+
+    CHUNK_SIZE = 1024 * 32   #...KB
+    MAX_PARTICLES = current_app.config.get('UFRAME_PLOT_MAX_PARTICLES', 100000)
+    MAX_BYTES = current_app.config.get('UFRAME_PLOT_MAX_BYTES', 1024 * 1024 * 15)
+    TOTAL_SECONDS = current_app.config['UFRAME_PLOT_TIMEOUT']
+    timeout = current_app.config['UFRAME_TIMEOUT_CONNECT']
 
-    except Exception as e:
-        msg = map_common_error_message(dataBlock, str(e))
-        return msg, 500
+    try:
+        with closing(uframe_client.get(url, stream=True, timeout=(timeout, TOTAL_SECONDS))) as response:
+            # Error responses are not particle arrays; check the status before decoding.
+            if response.status_code == 404:
+                raise NoParticlesError('No data available for the requested time window.', body=response.text)
+            if response.status_code != 200:
+                raise ParticleStreamError('uframe request failed (status %d).' % response.status_code,
+                                          body=response.text)
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+            for particle in iter_particles(chunks, max_particles=MAX_PARTICLES, max_bytes=MAX_BYTES,
+                                           timeout=TOTAL_SECONDS):
+                yield particle
+        urllib2.urlopen(GA_URL)
+    except NoParticlesError as err:
+        current_app.logger.info(str(err.message))
+        raise
+    except ParticleStreamError as err:
+        message = map_common_error_message(err.body or '', str(err.message))
+        current_app.logger.info(message)
+        raise Exception(message)
+    except (ConnectionError, Timeout) as err:
+        message = 'uframe connection cannot be made. %s' % str(err.message)
+        current_app.logger.info(message)
+        raise Exception(message)
 
 
 def map_common_error_message(response, default):
@@ -1692,7 +1737,7 @@ def get_uframe_stream_contents_chunked(mooring, platform, instrument, stream_typ
         #counter
         t0 = time.time()
 
-        with closing(requests.get(url,stream=True)) as response:
+        with closing(uframe_client.get(url,stream=True)) as response:
             content_length = 0
             for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
                 content_length = content_length + CHUNK_SIZE
@@ -1784,9 +1829,7 @@ def get_csv(stream, ref, start_time, end_time, dpa_flag):
 
     url = "/".join([uframe_url, mooring, platform, instrument, stream_type, stream + query])
     current_app.logger.debug('***** url: ' + url)
-    response = requests.get(url, timeout=(timeout, timeout_read))
-
-    return response.text, response.status_code
+    return proxy_response(url, timeout=(timeout, timeout_read))
 
 
 @auth.login_required
@@ -1821,9 +1864,7 @@ def get_json(stream, ref, start_time, end_time, dpa_flag, provenance, annotation
 
     url = "/".join([uframe_url, mooring, platform, instrument, stream_type, stream + query])
     current_app.logger.debug('***** url: ' + url)
-    response = requests.get(url, timeout=(timeout, timeout_read))
-
-    return response.text, response.status_code
+    return proxy_response(url, timeout=(timeout, timeout_read))
 
 
 @auth.login_required
@@ -1853,9 +1894,7 @@ def get_netcdf(stream, ref, start_time, end_time, dpa_flag, provenance, annotati
     query += '&format=application/netcdf'
     uframe_url, timeout, timeout_read = get_uframe_info()
     url = "/".join([uframe_url, mooring, platform, instrument, stream_type, stream + query])
-    response = requests.get(url, timeout=(timeout, timeout_read))
-
-    return response.text, response.status_code
+    return proxy_response(url, timeout=(timeout, timeout_read))
 
 
 # @auth.login_required
@@ -1876,6 +1915,12 @@ def get_data_api(stream, instrument, yvar, xvar):
 @auth.login_required
 @api.route('/plot/<string:instrument>/<string:stream>', methods=['GET'])
 def get_svg_plot(instrument, stream):
+    # Return the rendered plot from the plot cache when the same plot has been requested before.
+    plot_key = plot_cache_key(instrument, stream)
+    cached_plot = get_cached_plot(plot_key)
+    if cached_plot:
+        return plot_response(cached_plot)
+
     # from ooiservices.app.uframe.controller import split_stream_name
     # Ok first make a list out of stream and instrument
     instrument = instrument.split(',')
@@ -1912,8 +1957,7 @@ def get_svg_plot(instrument, stream):
     events = {}
     if use_event:
         try:
-            response = get_events_by_ref_des(instrument[0])
-            events = json.loads(response.data)
+            events = {'events': get_events_by_rd(instrument[0])}
         except Exception as err:
             current_app.logger.exception(str(err.message))
             return jsonify(error=str(err.message)), 400
@@ -1932,6 +1976,7 @@ def get_svg_plot(instrument, stream):
     width_in = width / 96.
 
     # get the data from uFrame
+    stream_errors = []
     try:
         if plot_layout == "depthprofile":
             data = get_process_profile_data(stream[0], instrument[0], yvar[0], xvar[0])
@@ -1939,10 +1984,7 @@ def get_svg_plot(instrument, stream):
             if len(instrument) == 1:
                 data = get_data(stream[0], instrument[0], yvar, xvar)
             elif len(instrument) > 1:  # Multiple datasets
-                data = []
-                for idx, instr in enumerate(instrument):
-                    stream_data = get_data(stream[idx], instr, [yvar[idx]], [xvar[idx]])
-                    data.append(stream_data)
+                data, instrument, stream_errors = get_multiple_stream_data(instrument, stream, yvar, xvar)
 
     except Exception as err:
         current_app.logger.exception(str(err.message))
@@ -1969,7 +2011,7 @@ def get_svg_plot(instrument, stream):
         data['height'] = height_in
         data['width'] = width_in
     else:
-        for idx, streamx in enumerate(stream):
+        for idx, dataset in enumerate(data):
             title = get_display_name_by_rd(instrument[idx])
             if len(title) > 50:
                 title = ''.join(title.split('-')[0:-1]) + '\n' + title.split('-')[-1]
@@ -1995,13 +2037,52 @@ def get_svg_plot(instrument, stream):
             'png' : 'image/png'
         }
 
-        return buf.read(), 200, {'Content-Type': content_header_map[plot_format]}
+        if stream_errors:
+            # Plot of the streams which were available; report the others and do not cache the partial plot.
+            entry = plot_entry(buf.read(), content_header_map[plot_format], 0)
+            response = plot_response(entry)
+            response.headers['X-Plot-Errors'] = json.dumps(stream_errors)
+            return response
+        entry = set_cached_plot(plot_key, buf.read(), content_header_map[plot_format], request.args['enddate'])
+        return plot_response(entry)
     except Exception as err:
         message = 'Error generating {0} plot: {1}'.format(plot_options['plot_layout'], str(err.message))
         current_app.logger.exception(str(err.message))
         return jsonify(error=message), 400
 
 
+def get_multiple_stream_data(instruments, streams, yvar, xvar):
+    """ Get the plot data for several instrument streams concurrently (the metadata and data requests
+    of all streams are in flight at once). Each stream is limited to UFRAME_PLOT_STREAM_TIMEOUT seconds.
+    Returns (datasets, instruments, errors): the data and instrument of each stream retrieved, in request
+    order, and a list of {'instrument', 'stream', 'error'} for each stream which failed. Raises an
+    exception if no stream could be retrieved.
+    """
+    def get_stream_data(idx):
+        return get_data(streams[idx], instruments[idx], [yvar[idx]], [xvar[idx]])
+
+    max_workers = current_app.config.get('UFRAME_PLOT_WORKERS', 4)
+    timeout = current_app.config.get('UFRAME_PLOT_STREAM_TIMEOUT', current_app.config['UFRAME_PLOT_TIMEOUT'])
+    results = run_concurrently(get_stream_data, range(len(instruments)), max_workers=max_workers, timeout=timeout)
+
+    datasets = []
+    plotted = []
+    errors = []
+    for idx, (stream_data, error) in enumerate(results):
+        if error is None and stream_data:
+            datasets.append(stream_data)
+            plotted.append(instruments[idx])
+        else:
+            errors.append({'instrument': instruments[idx], 'stream': streams[idx], 'error': error or 'No data'})
+
+    if not datasets:
+        message = '; '.join(['%s %s: %s' % (item['instrument'], item['stream'], item['error']) for item in errors])
+        raise Exception(message)
+    if errors:
+        current_app.logger.info('Multiple stream plot, streams not available: %s' % json.dumps(errors))
+    return datasets, plotted, errors
+
+
 def get_process_profile_data(stream, instrument, xvar, yvar):
     """ NOTE: i have to swap the inputs (xvar, yvar) around at this point to get the plot to work....
     """
@@ -2009,53 +2090,37 @@ def get_process_profile_data(stream, instrument, xvar, yvar):
         join_name ='_'.join([str(instrument), str(stream)])
 
         mooring, platform, instrument, stream_type, stream = split_stream_name(join_name)
-        parameter_ids, y_units, x_units = find_parameter_ids(mooring, platform, instrument, [yvar], [xvar])
+        parameter_ids, y_units, x_units, units_mapping = find_parameter_ids(mooring, platform, instrument, [yvar], [xvar])
 
-        data = get_profile_data(mooring, platform, instrument, stream_type, stream, parameter_ids)
-        if not data or data == None:
+        frame = get_profile_data(mooring, platform, instrument, stream_type, stream, parameter_ids, [xvar, yvar])
+        if frame is None or len(frame) == 0:
             raise Exception('profiles not present in data')
     except Exception as e:
         raise Exception('%s' % str(e.message))
 
-    '''
-    # check the data is in the first row
-    if yvar not in data[0] or xvar not in data[0]:
-        data = {'error':'requested fields not in data'}
-        return data
-    if 'profile_id' not in data[0]:
-        data = {'error':'profiles not present in data'}
-        return data
-    '''
+    # Group the rows which belong to a profile by profile id (stable, so time order is kept within a profile).
+    profile_ids = frame.column('profile_id')
+    rows = np.flatnonzero(profile_ids >= 0)
+    if len(rows) == 0:
+        raise Exception('profiles not present in data')
+    rows = rows[np.argsort(profile_ids[rows], kind='mergesort')]
+    bounds = np.flatnonzero(np.diff(profile_ids[rows])) + 1
+    starts = np.concatenate(([0], bounds))
 
-    y_data = []
-    x_data = []
-    time = []
-    profile_id_list = []
-    profile_count = -1
-
-    for i, row in enumerate(data):
-        if (row['profile_id']) >= 0:
-            profile_id = int(row['profile_id'])
-            if profile_id not in profile_id_list:
-                y_data.append([])
-                x_data.append([])
-                time.append(float(row['pk']['time']))
-                profile_id_list.append(profile_id)
-                profile_count += 1
-            try:
-                y_data[profile_count].append(row[yvar])
-                x_data[profile_count].append(row[xvar])
-            except Exception as e:
-                raise Exception('profiles not present in data')
+    x_data = np.split(frame.column(xvar)[rows], bounds)
+    y_data = np.split(frame.column(yvar)[rows], bounds)
+    time = frame.time[rows][starts].tolist()
+    qaqc = {xvar: np.split(frame.qc(xvar)[rows], bounds),
+            yvar: np.split(frame.qc(yvar)[rows], bounds)}
 
-    return {'x': x_data, 'y': y_data, 'x_field': xvar, "y_field": yvar, 'time': time}
+    return {'x': x_data, 'y': y_data, 'x_field': xvar, "y_field": yvar, 'time': time, 'qaqc': qaqc}
 
 
-def get_profile_data(mooring, platform, instrument, stream_type, stream, parameter_ids):
-    """ Process uframe data into profiles.
+def get_profile_data(mooring, platform, instrument, stream_type, stream, parameter_ids, fields=None):
+    """ Process uframe data into profiles. Returns a ParticleFrame of the requested fields (default the
+    request xvar) with an additional 'profile_id' column (-1 where a row is not part of a profile).
     """
     try:
-        data = []
         if 'startdate' in request.args and 'enddate' in request.args:
             st_date = request.args['startdate']
             ed_date = request.args['enddate']
@@ -2064,22 +2129,11 @@ def get_profile_data(mooring, platform, instrument, stream_type, stream, paramet
             else:
                 dpa_flag = "0"
             ed_date = validate_date_time(st_date, ed_date)
-            data, status_code = get_uframe_plot_contents_chunked(mooring, platform, instrument, stream_type, stream, st_date, ed_date, dpa_flag, parameter_ids)
         else:
             message = 'Failed to make plot - start end dates not applied'
             current_app.logger.exception(message)
             raise Exception(message)
 
-        if status_code != 200:
-            raise IOError("uFrame unable to get data for this request.")
-
-        current_app.logger.debug('\n --- retrieved data from uframe for profile processing...')
-
-        # Note: assumes data has depth and time is ordinal
-        # Need to add assertions and try and exceptions to check data
-        time = []
-        depth = []
-
         request_xvar = None
         if request.args['xvar']:
             junk = request.args['xvar']
@@ -2100,89 +2154,19 @@ def get_profile_data(mooring, platform, instrument, stream_type, stream, paramet
             current_app.logger.exception(message)
             raise Exception(message)
 
-        for row in data:
-            depth.append(int(row[request_xvar]))
-            time.append(float(row['pk']['time']))
-
-        matrix = np.column_stack((time, depth))
-        tz = matrix
-        origTz = tz
-        INT = 10
-        # tz length must equal profile_list length
-
-        # maxi = np.amax(tz[:, 0])
-        # mini = np.amin(tz[:, 0])
-        # getting a range from min to max time with 10 seconds or milliseconds. I have no idea.
-        ts = (np.arange(np.amin(tz[:, 0]), np.amax(tz[:, 0]), INT)).T
-
-        # interpolation adds additional points on the line within f(t), f(t+1)  time is a function of depth
-        itz = np.interp(ts, tz[:, 0], tz[:, 1])
-
-        newtz = np.column_stack((ts, itz))
-        # 5 unit moving average
-        WINDOW = 5
-        weights = np.repeat(1.0, WINDOW) / WINDOW
-        ma = np.convolve(newtz[:, 1], weights)[WINDOW-1:-(WINDOW-1)]
-        # take the diff and change negatives to -1 and postives to 1
-        dZ = np.sign(np.diff(ma))
-
-        # repeat for second derivative
-        dZ = np.convolve(dZ, weights)[WINDOW-1:-(WINDOW-1)]
-        dZ = np.sign(dZ)
-
-        r0 = 1
-        r1 = len(dZ) + 1
-        dZero = np.diff(dZ)
-
-        start = []
-        stop = []
-        # find where the slope changes
-        dr = [start.append(i) for (i, val) in enumerate(dZero) if val != 0]
-        if len(start) == 0:
-            raise Exception('Unable to determine where slope changes.')
-
-        for i in range(len(start)-1):
-            stop.append(start[i+1])
-
-        stop.append(start[0])
-        start_stop = np.column_stack((start, stop))
-        start_times = np.take(newtz[:, 0], start)
-        stop_times = np.take(newtz[:, 0], stop)
-        start_times = start_times - INT*2
-        stop_times = stop_times + INT*2
-
-        depth_profiles = []
-
-        for i in range(len(start_times)):
-            profile_id = i
-            proInds = origTz[(origTz[:, 0] >= start_times[i]) & (origTz[:, 0] <= stop_times[i])]
-            value = proInds.shape[0]
-            z = np.full((value, 1), profile_id)
-            pro = np.append(proInds, z, axis=1)
-            depth_profiles.append(pro)
-
-        depth_profiles = np.concatenate(depth_profiles)
-        # I NEED to CHECK FOR DUPLICATE TIMES !!!!! NOT YET DONE!!!!
-        # Start stop times may result in over laps on original data set. (see function above)
-        # May be an issue, requires further enquiry
-        profile_list = []
-        for row in data:
-            try:
-                # Need to add epsilon. Floating point error may occur
-                where = np.argwhere(depth_profiles == float(row['pk']['time']))
-                index = where[0]
-                rowloc = index[0]
-                if len(where) and int(row[request_xvar]) == depth_profiles[rowloc][1]:
-                    row['profile_id'] = depth_profiles[rowloc][2]
-                    profile_list.append(row)
-            except IndexError:
-                row['profile_id'] = None
-                profile_list.append(row)
-            except Exception as err:
-                raise Exception('%s' % str(err.message))
-
-        # profile length should equal tz  length
-        return profile_list
+        if not fields:
+            fields = [request_xvar]
+        particles = get_uframe_plot_particles(mooring, platform, instrument, stream_type, stream,
+                                              st_date, ed_date, dpa_flag, parameter_ids)
+        frame = ParticleFrame.from_particles(particles, [request_xvar] + list(fields))
+        current_app.logger.debug('\n --- retrieved data from uframe for profile processing...')
+
+        # Note: assumes data has depth and time is ordinal
+        segmenter = ProfileSegmenter(interval=10, window=5)
+        profile_ids = segmenter.segment(frame.time, frame.column(request_xvar))
+
+        frame.add_column('profile_id', profile_ids)
+        return frame
 
     except Exception as err:
         current_app.logger.exception('\n* (pass) exception: ' + str(err.message))
@@ -2199,7 +2183,7 @@ def get_profiles(stream, instrument):
         return jsonify(error=e.message), 400, content_headers
     if profiles is None:
         return jsonify(), 204, content_headers
-    return jsonify(profiles=profiles), 200, content_headers
+    return jsonify(profiles=profiles.to_records()), 200, content_headers
 
 
 def make_cache_key():
@@ -2234,76 +2218,63 @@ def to_bool_str(value):
 #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 # TOC routes and supporting functions
 #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-"""
-# Development only.
 @api.route('/get_structured_toc')
-#@cache.memoize(timeout=1600)
 def get_structured_toc():
+    """ Get the moorings, platforms and instruments of the structured toc.
+    """
     try:
-        mooring_list = []
-        mooring_key = []
-
-        platform_list = []
-        platform_key = []
-
-        instrument_list = []
-        instrument_key = []
+        tree = get_toc_tree()
+        if tree is None:
+            return jsonify(toc={'moorings': [], 'platforms': [], 'instruments': []})
+        return jsonify(toc={'moorings': get_toc_level(tree, 'mooring'),
+                            'platforms': get_toc_level(tree, 'platform'),
+                            'instruments': get_toc_level(tree, 'instrument')})
+    except Exception as err:
+        message = str(err.message)
+        current_app.logger.info(message)
+        return internal_server_error(message)
 
-        # Get toc data from uframe and process, returns data; if exception raise
-        data = process_uframe_toc()
 
-        # If no data return empty content immediately
-        if data is None:
-            return jsonify(toc={'moorings': mooring_list,
-                            'platforms': platform_list,
-                            'instruments': instrument_list
-                            })
-
-        # If data, Process uframe toc data for output
-        for d in data:
-            if d['reference_designator'] not in instrument_key:
-                instrument_list.append({'array_code':d['reference_designator'][0:2],
-                                        'display_name': d['instrument_display_name'],
-                                        'mooring_code': d['mooring_code'],
-                                        'platform_code': d['platform_code'],
-                                        'instrument_code': d['platform_code'],
-                                        'streams':d['streams'],
-                                        'instrument_parameters':d['instrument_parameters'],
-                                        'reference_designator':d['reference_designator']
-                                     })
-
-                instrument_key.append(d['reference_designator'])
-
-            if d['mooring_code'] not in mooring_key:
-                mooring_list.append({'array_code':d['reference_designator'][0:2],
-                                     'mooring_code':d['mooring_code'],
-                                     'platform_code':d['platform_code'],
-                                     'display_name':d['mooring_display_name'],
-                                     'geo_location':[],
-                                     'reference_designator':d['mooring_code']
-                                     })
-
-                mooring_key.append(d['mooring_code'])
-
-            if d['mooring_code']+d['platform_code'] not in platform_key:
-                platform_list.append({'array_code':d['reference_designator'][0:2],
-                                      'platform_code':d['platform_code'],
-                                      'mooring_code':d['mooring_code'],
-                                      'reference_designator':d['reference_designator'],
-                                      'display_name': d['platform_display_name']
-                                        })
-
-                platform_key.append(d['mooring_code']+d['platform_code'])
-
-        return jsonify(toc={'moorings': mooring_list,
-                            'platforms': platform_list,
-                            'instruments': instrument_list
-                            })
-    except Exception as e:
-        message = str(e.message)
+@api.route('/toc')
+@api.route('/toc/<string:prefix>')
+def get_toc_branches(prefix=''):
+    """ Get the branches of the structured toc whose reference designators start with prefix (the arrays
+    when no prefix is provided), e.g. /toc/CE01ISSM or /toc/CE01ISSM-MFD35. Optional 'depth' limits the
+    number of child levels returned; with details=false instrument streams and parameters are left out.
+    """
+    try:
+        depth = request.args.get('depth', None)
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                return bad_request('Invalid depth value: %s' % depth)
+            if depth < 0:
+                return bad_request('Invalid depth value: %d' % depth)
+        details = request.args.get('details', 'true').lower() != 'false'
+        tree = get_toc_tree()
+        if tree is None:
+            return jsonify(toc=[])
+        if not prefix and depth is None:
+            depth = 0
+        return jsonify(toc=get_toc_branch(tree, prefix, depth, details))
+    except Exception as err:
+        message = str(err.message)
         current_app.logger.info(message)
         return internal_server_error(message)
-"""
+
+
+def get_toc_tree():
+    """ Get the structured toc; if not available, process the uframe toc (which builds it).
+    """
+    tree = toc_tree.get()
+    if tree is None:
+        toc = process_uframe_toc()
+        tree = toc_tree.get()
+        if tree is None and toc:
+            tree = build_toc_tree(toc)
+    return tree
+
 
 @api.route('/get_toc')
 @cache.memoize(timeout=1600)
@@ -2327,7 +2298,7 @@ def get_uframe_toc_data():
     d = None
     try:
         uframe_url = current_app.config['UFRAME_URL'] + current_app.config['UFRAME_TOC']
-        r = requests.get(uframe_url)
+        r = uframe_client.get(uframe_url)
         if r.status_code == 200:
             d = r.json()
         return d
@@ -2347,21 +2318,48 @@ def get_uframe_toc_data():
 def process_uframe_toc():
     """ Get toc content from uframe; if error raise. Continue processing based on toc content.
     """
+    toc, _ = refresh_uframe_toc()
+    return toc
+
+
+def refresh_uframe_toc():
+    """ Get toc content from uframe and update the compiled toc; if error raise. Only instruments added or
+    changed since the compiled toc are processed. Returns (toc, toc_version); the toc_version is None for
+    the old toc format.
+    """
     result = None
+    toc_version = None
     try:
         d = get_uframe_toc_data()
         if d is not None:
             if isinstance(d, dict):
-                result = get_uframe_toc(d)
+                result, toc_version = refresh_compiled_toc(d, get_uframe_toc)
+                if result:
+                    update_parameter_index(result, toc_version)
             # TODO Deprecate once transition to new toc format has been completed.
             # TODO A log message here once previous toc is deprecated.
             else:
                 result = old_get_uframe_toc(d)
-        return result
+            if result:
+                update_toc_tree(result, toc_version, get_array_names(result))
+        return result, toc_version
     except Exception:
         raise
 
 
+def get_array_names(toc):
+    """ Get {array code: display name} for the arrays of the processed toc.
+    """
+    try:
+        codes = list(set([item['reference_designator'][:2] for item in toc if item.get('reference_designator')]))
+        names = resolve_names(codes)
+        return dict((code, names[code]['name']) for code in codes)
+    except Exception as err:
+        message = 'Unable to get array display names: %s' % str(err)
+        current_app.logger.info(message)
+        return {}
+
+
 # [OLD FORMAT]
 # TODO Deprecate once transition to new toc format has been completed.
 @cache.memoize(timeout=1600)
@@ -2458,6 +2456,16 @@ def get_uframe_toc(data):
             # Process all instruments to compile result
             instruments = data['instruments']
             parameters_by_streams = data['parameters_by_stream']
+
+            # Resolve display names for all instruments, moorings and platforms at once.
+            rds = []
+            for instrument in instruments:
+                rd = instrument['reference_designator']
+                rds.append(rd)
+                if rd.count('-') >= 2:
+                    rds.extend([rd[:8], rd[:14]])
+            names = resolve_names(rds)
+
             for instrument in instruments:
 
                 # Get reference designator and swap mooring and platform code
@@ -2471,7 +2479,7 @@ def get_uframe_toc(data):
                 # Get instrument_display_name, mooring_display_name, platform_display_name; add to result
                 result['instrument_display_name'], \
                 result['platform_display_name'], \
-                result['mooring_display_name'] = get_names_for_toc(rd, mooring, platform)
+                result['mooring_display_name'] = get_names_for_toc(rd, mooring, platform, names)
 
                 # Get "instrument_parameters" for instrument; if error return empty list and log errors.
                 param_results, error_messages = get_instrument_parameters(instrument,
@@ -2503,8 +2511,8 @@ def get_uframe_toc(data):
         raise
 
 
-def get_names_for_toc(rd, mooring, platform):
-    """ Process display names for toc processing.
+def get_names_for_toc(rd, mooring, platform, names=None):
+    """ Process display names for toc processing. Optional names is the result of resolve_names.
 
     Reference designator: 'GP03FLMB-RIS01-03-DOSTAD000' produces instrument_display_name:
     Global Station Papa Flanking Subsurface Mooring B - Mooring Riser - Dissolved Oxygen Stable Response
@@ -2512,8 +2520,18 @@ def get_names_for_toc(rd, mooring, platform):
     _instrument_display_name = ""
     _mooring_display_name = ""
     _platform_display_name = ""
+    if names is None:
+        names = {}
+
+    def display_name(item, field='name'):
+        if item in names:
+            return names[item][field]
+        if field == 'long_name':
+            return get_long_display_name_by_rd(item)
+        return get_display_name_by_rd(item)
+
     try:
-        instrument_display_name = get_long_display_name_by_rd(rd)
+        instrument_display_name = display_name(rd, 'long_name')
         if ' - ' in instrument_display_name:
             split_name = instrument_display_name.split(' - ')
             _instrument_display_name = split_name[-1]
@@ -2521,10 +2539,10 @@ def get_names_for_toc(rd, mooring, platform):
             _platform_display_name = split_name[1]
         elif '-' in rd:
             mooring, platform, instr = rd.split('-', 2)
-            _mooring_display_name = get_display_name_by_rd(mooring)
+            _mooring_display_name = display_name(mooring)
             tmp_platform = '-'.join([mooring, platform])
-            _platform_display_name = get_display_name_by_rd(tmp_platform)
-            _instrument_display_name = get_display_name_by_rd(rd)
+            _platform_display_name = display_name(tmp_platform)
+            _instrument_display_name = display_name(rd)
 
         return _instrument_display_name, _mooring_display_name, _platform_display_name
     except:
@@ -8,7 +8,11 @@ Support for generating sample data
 from flask import request, current_app
 import numpy as np
 from collections import OrderedDict
-import requests
+from ooiservices.app.uframe.client import uframe_client
+from ooiservices.app.uframe.decimate import decimate_frame, DECIMATION_METHODS
+from ooiservices.app.uframe.tile_cache import get_particle_frame
+from ooiservices.app.uframe.particles import ParticleFrame
+from ooiservices.app.uframe.parameter_index import get_instrument_parameter_index
 
 __author__ = 'Andy Bird'
 
@@ -27,30 +31,30 @@ def find_parameter_ids(mooring, platform, instrument, y_parameters, x_parameters
         else:
             return unit
 
-    UFRAME_DATA = current_app.config['UFRAME_URL'] + current_app.config['UFRAME_URL_BASE']
-    url = "/".join([UFRAME_DATA, mooring, platform, instrument, "metadata/parameters"])
-    parameter_list = requests.get(url).json()
+    # Use the parameter index built from the toc; request the instrument metadata only if not indexed.
+    parameters = get_instrument_parameter_index('-'.join([mooring, platform, instrument]))
+    if not parameters or [key for key in list(x_parameters) + list(y_parameters) if key not in parameters]:
+        UFRAME_DATA = current_app.config['UFRAME_URL'] + current_app.config['UFRAME_URL_BASE']
+        url = "/".join([UFRAME_DATA, mooring, platform, instrument, "metadata/parameters"])
+        parameter_list = uframe_client.get(url).json()
+        parameters = {}
+        for each in parameter_list:
+            parameters[each['particleKey']] = each
 
-    parameter_dict = {}
     parameter_ids = []
-    all_units = {}
     y_units = []
     x_units = []
 
     units_mapping = {}
-    for each in parameter_list:
-        parameter_dict[each['particleKey']] = each['pdId']
-        all_units[each['particleKey']] = each['units']
-
     for each in x_parameters:
-        parameter_ids.append(str(parameter_dict[each]).strip())
-        x_units.append(shorten_time_units(all_units[each]))
-        units_mapping[each] = shorten_time_units(all_units[each])
+        parameter_ids.append(str(parameters[each]['pdId']).strip())
+        x_units.append(shorten_time_units(parameters[each]['units']))
+        units_mapping[each] = shorten_time_units(parameters[each]['units'])
 
     for each in y_parameters:
-        parameter_ids.append(str(parameter_dict[each]).strip())
-        y_units.append(shorten_time_units(all_units[each]))
-        units_mapping[each] = shorten_time_units(all_units[each])
+        parameter_ids.append(str(parameters[each]['pdId']).strip())
+        y_units.append(shorten_time_units(parameters[each]['units']))
+        units_mapping[each] = shorten_time_units(parameters[each]['units'])
 
     return parameter_ids, y_units, x_units, units_mapping
 
@@ -110,9 +114,10 @@ def get_multistream_data(stream1, stream2, instrument1, instrument2, var1, var2)
 
 
 def get_simple_data(stream, instrument, yfields, xfields, include_time=True):
-    from ooiservices.app.uframe.controller import split_stream_name, get_uframe_plot_contents_chunked, validate_date_time, to_bool_str
+    from ooiservices.app.uframe.controller import split_stream_name, validate_date_time, to_bool_str, \
+        get_uframe_plot_particles
     '''
-    get data from uframe
+    get data from uframe; returns the particles as received from uframe (all their fields)
     '''
     mooring, platform, instrument, stream_type, stream = split_stream_name('_'.join([instrument, stream]))
     parameter_ids, y_units, x_units,units_mapping = find_parameter_ids(mooring, platform, instrument, yfields, xfields)
@@ -128,13 +133,16 @@ def get_simple_data(stream, instrument, yfields, xfields, include_time=True):
             else:
                 dpa_flag = "0"
 
-            # data, status_code = get_uframe_stream_contents_chunked(mooring, platform, instrument, stream_type, stream, st_date, ed_date, dpa_flag)
-            data, status_code = get_uframe_plot_contents_chunked(mooring, platform, instrument, stream_type, stream, st_date, ed_date, dpa_flag, parameter_ids)
-
-            if status_code != 200:
-                raise Exception(data)
-            else:
-                return data, units_mapping
+            method, points, limit = get_decimation()
+            particles = list(get_uframe_plot_particles(mooring, platform, instrument, stream_type, stream,
+                                                       st_date, ed_date, dpa_flag, parameter_ids, limit=limit))
+            if method:
+                # Decimate on the decoded columns, then keep the selected particles unchanged.
+                frame = ParticleFrame.from_particles(particles, yfields)
+                frame.add_column('row', np.arange(len(frame)))
+                frame = decimate_frame(frame, method, points, yfields)
+                particles = [particles[row] for row in frame.column('row')]
+            return particles, units_mapping
 
     except Exception as e:
         message = str(e.message)
@@ -143,7 +151,7 @@ def get_simple_data(stream, instrument, yfields, xfields, include_time=True):
 
 
 def get_data(stream, instrument, yfields, xfields, include_time=True):
-    from ooiservices.app.uframe.controller import split_stream_name, get_uframe_plot_contents_chunked, validate_date_time, to_bool_str
+    from ooiservices.app.uframe.controller import split_stream_name, validate_date_time, to_bool_str
     '''get data from uframe
     # -------------------
     # m@c: 02/01/2015
@@ -167,99 +175,43 @@ def get_data(stream, instrument, yfields, xfields, include_time=True):
             else:
                 dpa_flag = "0"
 
-            # data, status_code = get_uframe_stream_contents_chunked(mooring, platform, instrument, stream_type, stream, st_date, ed_date, dpa_flag)
-            data, status_code = get_uframe_plot_contents_chunked(mooring, platform, instrument, stream_type, stream, st_date, ed_date, dpa_flag, parameter_ids)
-            if status_code != 200:
-                current_app.logger.exception(data)
-                raise Exception(data)
+            method, points, limit = get_decimation()
         else:
             message = 'Please Define Start and End Dates'
             current_app.logger.exception(message)
             raise Exception(message)
 
+        frame = get_particle_frame(mooring, platform, instrument, stream_type, stream, st_date, ed_date,
+                                   dpa_flag, parameter_ids, list(xfields) + list(yfields), limit=limit,
+                                   check=lambda particle: validate_particle(particle, xfields, yfields))
+        received = frame.received
+        # used to handle multiple streams
+        frame = frame.take(np.flatnonzero(frame.stream == stream))
+        frame.received = received
+        if method:
+            frame = decimate_frame(frame, method, points, yfields)
+
     except Exception as e:
         message = str(e.message)
         current_app.logger.exception(message)
         raise Exception(message)
 
-    if len(data) == 0:
+    if frame.received == 0:
         raise Exception('No Data Available')
 
-    if "pk" not in data[0]:
-        message = 'Primary Information Not Available'
-        current_app.logger.exception(message)
-        raise Exception(message)
-
-    for xfield in xfields:
-        if xfield == 'time':
-            if "time" not in data[0]['pk']:
-                message = 'Time Variable Not Available'
-                current_app.logger.exception(message)
-                raise Exception(message)
-        else:
-            if xfield not in data[0]:
-                message = 'Requested Data (%s) Not Available' % xfield
-                current_app.logger.exception(message)
-                raise Exception(message)
-
-    for yfield in yfields:
-        if yfield == 'time':
-            if "time" not in data[0]['pk']:
-                message = 'Time Variable Not Available'
-                current_app.logger.exception(message)
-                raise Exception(message)
-        else:
-            if yfield not in data[0]:
-                message = 'Requested Data (%s) Not Available' % yfield
-                current_app.logger.exception(message)
-                raise Exception(message)
-
-    # Initialize the data dicts
-    vals = [[] for field in xfields]
-    x = OrderedDict(zip(xfields, vals))
-    vals = [[] for field in yfields]
-    y = OrderedDict(zip(yfields, vals))
-
     if len(yfields) >= len(xfields):
         qaqc_fields = yfields
     else:
         qaqc_fields = xfields
 
-    # vals = [np.zeros(len(data)) for field in qaqc_fields]
-    vals = [[] for field in qaqc_fields]
-    qaqc = OrderedDict(zip(qaqc_fields, vals))
-
-    # Loop through rows of data and fill the response data
-    for ind, row in enumerate(data):
-        # used to handle multiple streams
-        if row['pk']['stream'] == stream:
-            # x
-            for xfield in xfields:
-                if xfield == 'time':
-                    x[xfield].append(float(row['pk']['time']))
-                else:
-                    x[xfield].append(row[xfield])
-                    key = xfield + '_qc_results'
-                    if key in row:
-                        qaqc[yfield].append(int(row[key]))
-                    # else:
-                    #     current_app.logger.exception('QAQC not found for {0}'.format(xfield))
-            # y
-            for yfield in yfields:
-                if yfield == 'time':
-                    y[yfield].append(float(row['pk']['time']))
-                else:
-                    y[yfield].append(row[yfield])
-                    key = yfield + '_qc_results'
-                    if key in row:
-                        qaqc[yfield].append(int(row[key]))
-                    # else:
-                    #     current_app.logger.exception('QAQC not found for {0}'.format(yfield))
+    x = OrderedDict((field, frame.column(field)) for field in xfields)
+    y = OrderedDict((field, frame.column(field)) for field in yfields)
+    qaqc = OrderedDict((field, frame.qc(field)) for field in qaqc_fields)
 
     # generate dict for the data thing
     resp_data = {'x': x,
                  'y': y,
-                 'data_length': len(data),
+                 'data_length': frame.received,
                  'x_field': xfields,
                  'x_units': x_units,
                  'y_field': yfields,
@@ -269,3 +221,54 @@ def get_data(stream, instrument, yfields, xfields, include_time=True):
                  }
 
     return resp_data
+
+
+def validate_particle(particle, xfields, yfields):
+    """ Verify a particle has primary information and contains each of the requested fields.
+    """
+    if "pk" not in particle:
+        message = 'Primary Information Not Available'
+        current_app.logger.exception(message)
+        raise Exception(message)
+
+    for field in list(xfields) + list(yfields):
+        if field == 'time':
+            if "time" not in particle['pk']:
+                message = 'Time Variable Not Available'
+                current_app.logger.exception(message)
+                raise Exception(message)
+        else:
+            if field not in particle:
+                message = 'Requested Data (%s) Not Available' % field
+                current_app.logger.exception(message)
+                raise Exception(message)
+
+
+def get_decimation():
+    """ Get the decimation requested (request args 'decimate' and 'points').
+    Returns (method, points, limit) where limit is the number of particles to request from uframe;
+    when no decimation is requested returns (None, None, None) and uframe subsamples to DATA_POINTS.
+    """
+    method = request.args.get('decimate', None)
+    if not method:
+        return None, None, None
+    method = method.lower()
+    if method not in DECIMATION_METHODS:
+        message = 'Invalid decimation method (%s), expected one of: %s' % (method, ', '.join(DECIMATION_METHODS))
+        current_app.logger.info(message)
+        raise Exception(message)
+    try:
+        points = int(request.args.get('points', current_app.config['DATA_POINTS']))
+    except ValueError:
+        message = 'Invalid number of decimation points (%s)' % request.args.get('points')
+        current_app.logger.info(message)
+        raise Exception(message)
+    if points < 3:
+        message = 'Number of decimation points must be at least 3.'
+        current_app.logger.info(message)
+        raise Exception(message)
+
+    # Fetch at a finer resolution than displayed, bounded by the particle limit of the plot request.
+    limit = current_app.config.get('UFRAME_DECIMATE_LIMIT', 20000)
+    limit = min(max(limit, points), current_app.config.get('UFRAME_PLOT_MAX_PARTICLES', 100000))
+    return method, points, limit
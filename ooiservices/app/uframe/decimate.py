@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/decimate.py
+
+Server side decimation of timeseries data for plotting.
+
+minmax - splits the time range into equal width buckets and keeps the minimum and maximum of
+         each bucket, so spikes are always preserved.
+lttb   - Largest-Triangle-Three-Buckets; keeps the point of each bucket forming the largest
+         triangle with its neighbours, which preserves the visual shape of the series.
+'''
+
+import numpy as np
+
+DECIMATION_METHODS = ['minmax', 'lttb']
+
+
+def minmax_indices(x, y, points):
+    """ Return sorted indices of at most points samples: the minimum and maximum of y in each of
+    points/2 equal width buckets of x. Samples where y is not finite are ignored.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(y) & np.isfinite(x))
+    if len(valid) <= points:
+        return valid
+
+    buckets = max(points // 2, 1)
+    xv = x[valid]
+    span = xv.max() - xv.min()
+    if span <= 0:
+        bucket = np.zeros(len(valid), dtype=np.int64)
+    else:
+        bucket = ((xv - xv.min()) / span * buckets).astype(np.int64)
+        np.clip(bucket, 0, buckets - 1, out=bucket)
+
+    # Order by bucket then by value; the first and last entry of each bucket are its min and max.
+    order = np.lexsort((y[valid], bucket))
+    sorted_bucket = bucket[order]
+    edges = np.flatnonzero(np.diff(sorted_bucket)) + 1
+    firsts = np.concatenate(([0], edges))
+    lasts = np.concatenate((edges - 1, [len(order) - 1]))
+    selected = valid[order[np.concatenate((firsts, lasts))]]
+    return np.unique(selected)
+
+
+def lttb_indices(x, y, points):
+    """ Return sorted indices of points samples selected by Largest-Triangle-Three-Buckets.
+    x must be sorted. Samples where y is not finite are ignored. The first and last samples
+    are always kept.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(y) & np.isfinite(x))
+    n = len(valid)
+    if n <= points or points < 3:
+        return valid
+
+    xv = x[valid]
+    yv = y[valid]
+    # Bucket boundaries for the n - 2 interior samples.
+    edges = (np.arange(points - 1) * (float(n - 2) / (points - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    # Each selection depends on the previous one, so this loops over buckets (not samples).
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        avg_x = xv[next_start:next_stop].mean()
+        avg_y = yv[next_start:next_stop].mean()
+        px, py = xv[previous], yv[previous]
+        area = np.abs((px - avg_x) * (yv[start:stop] - py) - (px - xv[start:stop]) * (avg_y - py))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return valid[selected]
+
+
+def decimate_frame(frame, method, points, fields):
+    """ Return a ParticleFrame reduced to roughly points samples per field using method
+    ('minmax' or 'lttb'), using time as the x axis. The union of the samples selected for
+    each field is kept so every field retains its extremes/shape.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError('Invalid decimation method (%s), expected one of: %s' %
+                         (method, ', '.join(DECIMATION_METHODS)))
+    if len(frame) <= points:
+        return frame
+
+    order = np.argsort(frame.time, kind='mergesort')
+    time = frame.time[order]
+    selected = []
+    for field in fields:
+        if field == 'time':
+            continue
+        values = frame.column(field)[order]
+        if values.ndim != 1 or values.dtype.kind not in 'biuf':
+            continue
+        if method == 'minmax':
+            selected.append(minmax_indices(time, values, points))
+        else:
+            selected.append(lttb_indices(time, values, points))
+
+    if not selected:
+        # Nothing numeric to decimate on; keep evenly spaced samples.
+        selected.append(np.linspace(0, len(order) - 1, points).astype(np.int64))
+    keep = order[np.unique(np.concatenate(selected))]
+    return frame.take(keep)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/event_index.py
+
+Index of uframe events by reference designator.
+
+The index is built when the event list is compiled ('event_list', by get_events or
+tasks.compile_events) and published next to it ('event_index'); each worker holds an in-process copy,
+reloaded when the published version changes. Events are formatted (as get_events_by_ref_des) once,
+when the index is built. The index holds, by reference designator, the list of events and the
+current (tense 'PRESENT') deployment event.
+
+The event list is served stale while it is rebuilt (event_list_cache): after SOFT_TIMEOUT seconds one
+worker fetches it again from uframe in the background.
+'''
+
+from flask import current_app
+from ooiservices.app.cache_tools import VersionedValue, RefreshingValue
+from ooiservices.app.sharded_cache import ShardedValue
+from ooiservices.app.uframe.assetController import _compile_events, _event_ref_des, _format_event
+from ooiservices.app.uframe.client import uframe_client
+
+CACHE_TIMEOUT = 86400
+SOFT_TIMEOUT = 3600
+
+event_index = VersionedValue('event_index', timeout=CACHE_TIMEOUT, check_interval=10)
+event_list_store = ShardedValue('event_list', timeout=CACHE_TIMEOUT)
+
+
+def build_event_index(data):
+    """ Build event index from (compiled) event list.
+    """
+    events = {}
+    deployments = {}
+    for row in data:
+        try:
+            ref_des = _event_ref_des(row)
+            if not ref_des:
+                continue
+            event = _format_event(row, ref_des)
+        except (KeyError, TypeError, ValueError) as err:
+            message = 'Unable to index event %s: %s' % (row.get('id', None), str(err))
+            current_app.logger.info(message)
+            continue
+        events.setdefault(ref_des, []).append(event)
+        if event['eventClass'] == '.DeploymentEvent' and event['tense'] == 'PRESENT':
+            deployments[ref_des] = event
+    return {'events': events, 'deployments': deployments}
+
+
+def cache_event_list(data):
+    """ Cache the compiled event list and publish the event index.
+    """
+    event_list_store.set(data)
+    event_list_cache.mark_built()
+    return publish_event_index(data)
+
+
+def publish_event_index(data):
+    """ Build and publish the event index for the (compiled) event list.
+    """
+    index = build_event_index(data)
+    event_index.publish(index)
+    return index
+
+
+def clear_event_list():
+    """ Remove the cached event list and event index (after events are created, updated or deleted).
+    """
+    event_list_store.delete()
+    event_index.clear()
+
+
+def fetch_event_list():
+    """ Get event list from uframe and compile; on error raise exception.
+    """
+    url = current_app.config['UFRAME_ASSETS_URL'] + '/events'
+    payload = uframe_client.get(url)
+    if payload.status_code != 200:
+        message = '(%d) Failed to get events from uframe.' % payload.status_code
+        current_app.logger.info(message)
+        raise Exception(message)
+    return _compile_events(payload.json())
+
+
+def _build_event_list():
+    data = fetch_event_list()
+    cache_event_list(data)
+    return data
+
+
+event_list_cache = RefreshingValue('event_list', _build_event_list, SOFT_TIMEOUT, CACHE_TIMEOUT,
+                                   store=event_list_store)
+
+
+def get_event_list():
+    """ Get the compiled event list (from cache; rebuilt from uframe when stale or missing).
+    """
+    return event_list_cache.get()
+
+
+def get_event_index():
+    """ Get the event index; if not available build it from the cached (or uframe) event list.
+    """
+    index = event_index.get()
+    if index is None:
+        data = get_event_list()
+        index = event_index.get()
+        if index is None:
+            index = publish_event_index(data)
+    return index
+
+
+def get_events_by_rd(ref_des):
+    """ Get list of (formatted) events for reference designator.
+    """
+    return get_event_index()['events'].get(ref_des, [])
+
+
+def get_current_deployment(ref_des):
+    """ Get current deployment event for reference designator, or None.
+    """
+    return get_event_index()['deployments'].get(ref_des, None)
@@ -2,16 +2,14 @@ from flask import request, jsonify, make_response, current_app
 from ooiservices.app.uframe import uframe as api
 from ooiservices.app.main.authentication import auth
 from ooiservices.app.decorators import scope_required
-from ooiservices.app.uframe.assetController import get_events_by_ref_des
-from ooiservices.app.uframe.assetController import _uframe_headers,\
-    _compile_events
-from ooiservices.app import cache
+from ooiservices.app.uframe.assetController import _uframe_headers
+from ooiservices.app.uframe.event_index import get_event_list, clear_event_list, get_events_by_rd
 from copy import deepcopy
 
 import json
 import requests
+from ooiservices.app.uframe.client import uframe_client
 
-requests.adapters.DEFAULT_RETRIES = 2
 CACHE_TIMEOUT = 86400
 
 
@@ -30,31 +28,11 @@ def get_events():
         '''
         Listing GET request of all events.  This method is cached for 1 hour.
         '''
-        data = {}
-
-        cached = cache.get('event_list')
-        if cached:
-            data = cached
-
-        else:
-            url = current_app.config['UFRAME_ASSETS_URL']\
-                + '/%s' % 'events'
-
-            payload = requests.get(url)
-
-            data = payload.json()
-            if payload.status_code != 200:
-                return jsonify({"events": payload.json()}), payload.status_code
-
-            data = _compile_events(data)
-
-            if "error" not in data:
-                cache.set('event_list', data, timeout=CACHE_TIMEOUT)
+        data = get_event_list()
 
         if request.args.get('ref_des') and request.args.get('ref_des') != "":
             ref_des = request.args.get('ref_des')
-            resp = get_events_by_ref_des(data, ref_des)
-            return resp
+            return jsonify({'events': get_events_by_rd(ref_des)})
 
         if request.args.get('search') and request.args.get('search') != "":
             return_list = []
@@ -94,6 +72,10 @@ def get_events():
         error = "Error: Cannot connect to uframe.  %s" % e
         print error
         return make_response(error, 500)
+    except Exception as err:
+        message = str(err)
+        current_app.logger.info(message)
+        return make_response(message, 500)
 
 
 @api.route('/events/<int:id>', methods=['GET'])
@@ -105,7 +87,7 @@ def get_event(id):
         data = {}
         url = current_app.config['UFRAME_ASSETS_URL']\
             + '/%s/%s' % ('events', id)
-        payload = requests.get(url)
+        payload = uframe_client.get(url)
         data = payload.json()
         if payload.status_code != 200:
             return jsonify({"events": payload.json()}), payload.status_code
@@ -135,10 +117,10 @@ def create_event():
         url = current_app.config['UFRAME_ASSETS_URL']\
             + '/%s/%s' % ('events', id)
         data['@class'] = data.pop('eventClass')
-        response = requests.post(url,
+        response = uframe_client.post(url,
                                  data=json.dumps(data),
                                  headers=_uframe_headers())
-        cache.delete('event_list')
+        clear_event_list()
         return response.text, response.status_code
 
     except requests.exceptions.ConnectionError as e:
@@ -154,10 +136,10 @@ def update_event(id):
         url = current_app.config['UFRAME_ASSETS_URL']\
             + '/%s/%s' % ('events', id)
         data['@class'] = data.pop('eventClass')
-        response = requests.put(url,
+        response = uframe_client.put(url,
                                 data=json.dumps(data),
                                 headers=_uframe_headers())
-        cache.delete('event_list')
+        clear_event_list()
         return response.text, response.status_code
 
     except requests.exceptions.ConnectionError as e:
@@ -174,9 +156,9 @@ def delete_event(id):
     try:
         url = current_app.config['UFRAME_ASSETS_URL']\
             + '/%s/%s' % ('events', id)
-        response = requests.delete(url,
+        response = uframe_client.delete(url,
                                    headers=_uframe_headers())
-        cache.delete('event_list')
+        clear_event_list()
         return response.text, response.status_code
 
     except requests.exceptions.ConnectionError as e:
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/parameter_index.py
+
+Parameter metadata index built from the uframe toc.
+
+The index maps reference designator -> particleKey -> parameter metadata (pdId, units, fillValue,
+type, shape, stream) and replaces the per request GET of <refdes>/metadata/parameters. It is updated
+whenever the toc is processed (only the instruments changed since the toc version it was built from),
+published to redis, and each worker holds an in-process copy which is reloaded only when the published
+version changes.
+'''
+
+from flask import current_app
+from ooiservices.app.cache_tools import VersionedValue
+from ooiservices.app.uframe.toc_cache import toc_delta_since, get_built_toc_version, set_built_toc_version
+
+CACHE_TIMEOUT = 172800
+PARAMETER_FIELDS = ['pdId', 'units', 'fillValue', 'type', 'shape', 'stream']
+
+parameter_index = VersionedValue('parameter_index', timeout=CACHE_TIMEOUT)
+
+
+def build_parameter_index(toc):
+    """ Build the parameter index from the processed toc (list of instruments with 'instrument_parameters').
+    """
+    index = {}
+    for instrument in toc:
+        rd = instrument.get('reference_designator', None)
+        if not rd:
+            continue
+        parameters = index.setdefault(rd, {})
+        for parameter in instrument.get('instrument_parameters', None) or []:
+            particle_key = parameter.get('particleKey', None)
+            if particle_key and particle_key not in parameters:
+                parameters[particle_key] = dict((field, parameter.get(field, None)) for field in PARAMETER_FIELDS)
+    return index
+
+
+def update_parameter_index(toc, toc_version=None):
+    """ Update the parameter index from the processed toc (of version toc_version); publish it when it has changed.
+    """
+    try:
+        current = parameter_index.get()
+        delta = None
+        if current and toc_version is not None:
+            delta = toc_delta_since(get_built_toc_version('parameter_index'))
+        if delta is None:
+            index = build_parameter_index(toc)
+        else:
+            index = dict(current)
+            for rd in delta['removed'] + delta['changed']:
+                index.pop(rd, None)
+            stale = set(delta['added'] + delta['changed'])
+            index.update(build_parameter_index([item for item in toc if item.get('reference_designator') in stale]))
+        if index and index != current:
+            parameter_index.publish(index)
+            current_app.logger.info('Parameter index updated (%d instruments).' % len(index))
+        set_built_toc_version('parameter_index', toc_version)
+    except Exception as err:
+        message = 'Unable to update parameter index: %s' % str(err)
+        current_app.logger.info(message)
+
+
+def get_instrument_parameter_index(rd):
+    """ Return {particleKey: parameter metadata} for the instrument, or None if not in the index.
+    """
+    index = parameter_index.get()
+    if not index:
+        return None
+    return index.get(rd, None)
+
+
+def get_parameter(rd, particle_key):
+    """ Return parameter metadata (pdId, units, fillValue, type, shape, stream) for a particle key
+    of an instrument, or None.
+    """
+    parameters = get_instrument_parameter_index(rd)
+    if not parameters:
+        return None
+    return parameters.get(particle_key, None)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/particles.py
+
+Incremental decoding of uframe particle responses.
+
+uframe returns stream data as a single JSON array of particle dictionaries. Rather than
+accumulating the complete response body before decoding, iter_particles decodes the array
+one element at a time as chunks arrive from the connection, so memory use is bounded by the
+size of a single particle plus one chunk, and limits are enforced while the data is streaming.
+
+ParticleFrame holds decoded particles in columnar form: one typed NumPy array per requested
+parameter, plus time, stream and QC columns, so that plotting and data processing operate on
+whole columns rather than on individual particle dictionaries.
+'''
+
+import codecs
+import json
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Characters which may appear between array elements.
+WHITESPACE = ' \t\n\r'
+
+
+class ParticleStreamError(Exception):
+    """ Raised when a particle response exceeds a limit or cannot be decoded as a particle array.
+    The 'body' attribute holds the (leading portion of the) response text when uframe did not
+    return a JSON array (for instance an error message containing a requestUUID).
+    """
+    def __init__(self, message, body=None):
+        Exception.__init__(self, message)
+        self.body = body
+
+
+class NoParticlesError(ParticleStreamError):
+    """ Raised when uframe reports that the requested time window holds no data.
+    """
+
+
+def _skip_whitespace(buf, pos):
+    """ Return the index of the first non-whitespace character in buf at or after pos.
+    """
+    end = len(buf)
+    while pos < end and buf[pos] in WHITESPACE:
+        pos += 1
+    return pos
+
+
+def iter_particles(chunks, max_particles=None, max_bytes=None, timeout=None):
+    """ Generator which decodes a JSON array of particles from an iterable of byte chunks,
+    yielding each particle dictionary as soon as it has been completely received.
+
+    Limits (each optional, None or 0 disables):
+        max_particles - maximum number of particles which may be decoded.
+        max_bytes     - maximum number of bytes which may be read from chunks.
+        timeout       - maximum number of seconds spent reading and decoding.
+
+    A ParticleStreamError is raised when a limit is exceeded, when the response is not a
+    JSON array or when the array contains malformed content. A response which ends without
+    the closing bracket is accepted; all complete particles received are yielded.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    t0 = time.time()
+    buf = u''
+    pos = 0
+    count = 0
+    total_bytes = 0
+    started = False
+    finished = False
+    not_array = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        total_bytes += len(chunk)
+        if max_bytes and total_bytes > max_bytes:
+            raise ParticleStreamError('Data request too large, greater than %d bytes' % max_bytes)
+        if timeout and (time.time() - t0) > timeout:
+            raise ParticleStreamError('Data request time out')
+
+        # Drop everything already decoded, then append the new text.
+        buf = buf[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        if not_array:
+            continue
+
+        while True:
+            pos = _skip_whitespace(buf, pos)
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != u'[':
+                    # Not a particle array (uframe error message); collect the rest of the body.
+                    not_array = True
+                    break
+                started = True
+                pos += 1
+                continue
+            char = buf[pos]
+            if char == u',':
+                pos += 1
+                continue
+            if char == u']':
+                finished = True
+                break
+            try:
+                particle, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # Element is incomplete; wait for the next chunk.
+                break
+            pos = end
+            count += 1
+            if max_particles and count > max_particles:
+                raise ParticleStreamError('Data request too large, greater than %d particles' % max_particles)
+            yield particle
+
+        if finished:
+            break
+
+    buf = buf[pos:] + text_decoder.decode(b'', final=True)
+    if not_array:
+        raise ParticleStreamError('uframe response is not a particle array.', body=buf)
+    if not finished:
+        remainder = buf.strip()
+        if remainder:
+            raise ParticleStreamError('Malformed particle data received from uframe.', body=remainder)
+
+
+class ParticleFrame(object):
+    """ Columnar particle data decoded from uframe.
+
+    Attributes:
+        time     - float64 array of particle times (seconds since 1900-01-01).
+        stream   - object array of the stream name of each particle.
+        columns  - OrderedDict of parameter name to NumPy array.
+        qaqc     - OrderedDict of parameter name to int array of '<parameter>_qc_results' values
+                   (0 where a particle carries no QC result).
+        received - total number of particles decoded, including particles of other streams.
+    """
+    def __init__(self, time, stream, columns, qaqc=None, received=None):
+        self.time = time
+        self.stream = stream
+        self.columns = columns
+        self.qaqc = qaqc if qaqc is not None else OrderedDict()
+        self.received = received if received is not None else len(time)
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def from_particles(cls, particles, fields, stream=None, check=None):
+        """ Decode an iterable of particle dictionaries straight into columns.
+
+        fields - parameter names to extract; 'time' is always extracted from the primary key.
+        stream - when provided, particles of other streams (multi-stream responses) are skipped.
+        check  - optional callable invoked with the first particle received, used to validate it.
+
+        This is the only place particles are visited individually; everything downstream
+        operates on the resulting arrays.
+        """
+        fields = [field for i, field in enumerate(fields) if field != 'time' and field not in fields[:i]]
+        times = []
+        streams = []
+        values = [[] for field in fields]
+        qc_values = [[] for field in fields]
+        extract = list(zip(fields, [field + '_qc_results' for field in fields], values, qc_values))
+        received = 0
+        for particle in particles:
+            if received == 0 and check is not None:
+                check(particle)
+            received += 1
+            pk = particle['pk']
+            if stream is not None and pk['stream'] != stream:
+                continue
+            times.append(pk['time'])
+            streams.append(pk.get('stream'))
+            for field, qc_key, column, qc_column in extract:
+                column.append(particle[field])
+                qc_column.append(particle.get(qc_key, 0))
+
+        columns = OrderedDict()
+        qaqc = OrderedDict()
+        for field, column, qc_column in zip(fields, values, qc_values):
+            columns[field] = to_array(column)
+            qaqc[field] = np.asarray(qc_column, dtype=np.int64)
+        return cls(np.asarray(times, dtype=np.float64), np.asarray(streams, dtype=object),
+                   columns, qaqc, received)
+
+    @classmethod
+    def concatenate(cls, frames):
+        """ Join frames having the same columns into one frame, in the order given.
+        """
+        frames = list(frames)
+        received = sum(frame.received for frame in frames)
+        non_empty = [frame for frame in frames if len(frame)]
+        if len(non_empty) <= 1:
+            only = non_empty[0] if non_empty else frames[0]
+            return cls(only.time, only.stream, only.columns, only.qaqc, received)
+        first = non_empty[0]
+        columns = OrderedDict((field, np.concatenate([part.columns[field] for part in non_empty]))
+                              for field in first.columns)
+        qaqc = OrderedDict((field, np.concatenate([part.qaqc[field] for part in non_empty]))
+                           for field in first.qaqc)
+        return cls(np.concatenate([part.time for part in non_empty]),
+                   np.concatenate([part.stream for part in non_empty]), columns, qaqc, received)
+
+    def column(self, field):
+        """ Return the array for field ('time' returns the time column).
+        """
+        if field == 'time':
+            return self.time
+        return self.columns[field]
+
+    def qc(self, field):
+        """ Return the QC results array for field; all zeros when none are available.
+        """
+        if field in self.qaqc:
+            return self.qaqc[field]
+        return np.zeros(len(self), dtype=np.int64)
+
+    def take(self, indices):
+        """ Return a new frame holding the rows selected by an index array or boolean mask.
+        """
+        columns = OrderedDict((field, values[indices]) for field, values in self.columns.items())
+        qaqc = OrderedDict((field, values[indices]) for field, values in self.qaqc.items())
+        return ParticleFrame(self.time[indices], self.stream[indices], columns, qaqc, self.received)
+
+    def add_column(self, field, values):
+        """ Add (or replace) a column, which must have one value per row.
+        """
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError('Column %s has %d values, frame has %d rows.' % (field, len(values), len(self)))
+        self.columns[field] = values
+
+    def to_records(self):
+        """ Return the frame as a list of particle style dictionaries (for JSON responses),
+        each with a 'pk' containing time and stream plus one entry per column.
+        """
+        names = list(self.columns.keys())
+        pks = [{'time': t, 'stream': s} for t, s in zip(self.time.tolist(), self.stream.tolist())]
+        rows = zip(pks, *[self.columns[name].tolist() for name in names])
+        names = ['pk'] + names
+        return [dict(zip(names, row)) for row in rows]
+
+
+def to_array(values):
+    """ Convert a list of particle values to a typed NumPy array. Numeric values containing
+    missing (None) entries become float64 with NaN; values which cannot be represented as a
+    regular numeric array (strings, ragged arrays) are kept in an object or string array.
+    """
+    array = np.asarray(values)
+    if array.dtype == object:
+        try:
+            array = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    return array
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/plot_cache.py
+
+Cache of rendered plots for /uframe/plot.
+
+Rendered plots are stored in redis (and optionally on local disk, PLOT_CACHE_DIR) under a key
+which is the hash of the normalized plot request: instruments, streams, variables, layout,
+rendering options, data window and, for plots showing events, the version of the event index.
+Plots whose data window has closed (ends in the past) are kept for PLOT_CACHE_TIMEOUT_HISTORICAL
+seconds; plots whose window includes now are kept for PLOT_CACHE_TIMEOUT_RECENT seconds, since new
+data may still arrive. Responses carry an ETag (hash of the plot content) and Last-Modified, so
+browsers can revalidate with a 304.
+'''
+
+from flask import current_app, request, make_response
+from ooiservices.app import cache
+from ooiservices.app.uframe.event_index import event_index
+from dateutil.parser import parse as parse_date
+from datetime import datetime
+import hashlib
+import json
+import os
+import pickle
+import pytz
+import time
+
+# Request arguments which change the rendered plot, and the normalization applied to each.
+PLOT_ARGUMENTS = {
+    'format': 'str',
+    'plotLayout': 'str',
+    'xvar': 'list',
+    'yvar': 'list',
+    'scatter': 'bool',
+    'event': 'bool',
+    'qaqc': 'int',
+    'profileId': 'str',
+    'height': 'float',
+    'width': 'float',
+    'dpa_flag': 'bool',
+    'decimate': 'str',
+    'points': 'int',
+    'x_units': 'str',
+    'y_units': 'str',
+    'startdate': 'date',
+    'enddate': 'date',
+}
+PLOT_ARGUMENT_DEFAULTS = {
+    'format': 'svg',
+    'plotLayout': 'timeseries',
+    'xvar': 'time',
+    'scatter': 'true',
+    'event': 'true',
+    'qaqc': '0',
+    'height': '100',
+    'width': '100',
+    'dpa_flag': '0',
+}
+
+
+def _normalize_value(value, kind):
+    """ Normalize a request argument value so equivalent requests produce the same key.
+    """
+    if kind == 'list':
+        return [item.strip() for item in value.split(',')]
+    if kind == 'bool':
+        return value.strip().lower() in ['true', '1', 'yes', 'on']
+    if kind == 'int':
+        return int(float(value))
+    if kind == 'float':
+        return round(float(value), 1)
+    if kind == 'date':
+        dt = parse_date(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=pytz.utc)
+        return dt.astimezone(pytz.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return value.strip()
+
+
+def plot_cache_key(instrument, stream):
+    """ Return the cache key for the plot of instrument(s) and stream(s) described by the current request.
+    """
+    options = {'instrument': [item.strip() for item in instrument.split(',')],
+               'stream': [item.strip() for item in stream.split(',')]}
+    for name, kind in PLOT_ARGUMENTS.items():
+        value = request.args.get(name, PLOT_ARGUMENT_DEFAULTS.get(name, None))
+        if value is None or value == '':
+            continue
+        try:
+            options[name] = _normalize_value(value, kind)
+        except (ValueError, OverflowError):
+            options[name] = value
+    if options.get('event'):
+        # Plots showing events are rendered again once the events change.
+        options['event_version'] = cache.get(event_index.version_key)
+    digest = hashlib.sha1(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+    return 'plot_' + digest
+
+
+def plot_cache_timeout(end_date):
+    """ Timeout (seconds) for a plot whose data window ends at end_date (iso8601 string).
+    """
+    historical = current_app.config.get('PLOT_CACHE_TIMEOUT_HISTORICAL', 604800)
+    recent = current_app.config.get('PLOT_CACHE_TIMEOUT_RECENT', 300)
+    try:
+        dt = parse_date(end_date)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=pytz.utc)
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return recent
+    if dt < datetime.now(pytz.utc):
+        return historical
+    return recent
+
+
+def _disk_path(key):
+    directory = current_app.config.get('PLOT_CACHE_DIR', None)
+    if not directory:
+        return None
+    return os.path.join(directory, key + '.pickle')
+
+
+def get_cached_plot(key):
+    """ Return the cached plot entry for key (redis first, then disk), or None.
+    """
+    try:
+        entry = cache.get(key)
+        if entry:
+            return entry
+        path = _disk_path(key)
+        if path and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            remaining = int(entry['expires'] - time.time())
+            if remaining <= 0:
+                os.remove(path)
+                return None
+            cache.set(key, entry, timeout=remaining)
+            return entry
+    except Exception as err:
+        current_app.logger.info('Unable to read cached plot %s: %s' % (key, str(err)))
+    return None
+
+
+def plot_entry(content, content_type, timeout):
+    """ Create a plot cache entry for rendered plot content, valid for timeout seconds.
+    """
+    now = time.time()
+    return {'content': content,
+            'content_type': content_type,
+            'etag': hashlib.sha1(content).hexdigest(),
+            'last_modified': now,
+            'expires': now + timeout,
+            'timeout': timeout}
+
+
+def set_cached_plot(key, content, content_type, end_date):
+    """ Store a rendered plot; returns the cache entry.
+    """
+    timeout = plot_cache_timeout(end_date)
+    entry = plot_entry(content, content_type, timeout)
+    try:
+        cache.set(key, entry, timeout=timeout)
+        path = _disk_path(key)
+        if path:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmp_path = '%s.%d' % (path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, path)
+    except Exception as err:
+        current_app.logger.info('Unable to cache plot %s: %s' % (key, str(err)))
+    return entry
+
+
+def plot_response(entry):
+    """ Build the response for a plot cache entry, answering 304 when the client's copy is current.
+    """
+    last_modified = datetime.utcfromtimestamp(int(entry['last_modified']))
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(entry['etag'])
+    elif request.if_modified_since:
+        if_modified_since = request.if_modified_since.replace(tzinfo=None)
+        not_modified = last_modified <= if_modified_since
+
+    if not_modified:
+        response = make_response('', 304)
+    else:
+        response = make_response(entry['content'], 200)
+        response.headers['Content-Type'] = entry['content_type']
+    response.set_etag(entry['etag'])
+    response.last_modified = last_modified
+    remaining = max(int(entry['expires'] - time.time()), 0)
+    response.headers['Cache-Control'] = 'private, max-age=%d' % remaining
+    return response
@@ -91,7 +91,7 @@ class OOIPlots(object):
             for event in events['events']:
                 time = datestr2num(event['start_date'])
                 x = np.array([time, time])
-                h = ax.plot(x, ylim, '--', label=event['class'])
+                h = ax.plot(x, ylim, '--', label=event['eventClass'])
 
             legend = ax.legend()
             if legend:
@@ -583,8 +583,9 @@ class OOIPlots(object):
                 pass
             elif plot_qaqc >= 1:
                 # This is a case where the user wants to plot just one of the 9 QAQC tests
-                ind = np.where(qaqc != plot_qaqc)
-                qaqc[ind] = 0
+                # (on a copy, the QC column may be shared with the cached data).
+                qaqc = np.array(qaqc)
+                qaqc[qaqc != plot_qaqc] = 0
 
             else:
                 qaqc = []
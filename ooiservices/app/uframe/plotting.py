@@ -179,7 +179,7 @@ def generate_plot(data, plot_options):
 
         if plot_profile_id is None:
 
-            for profile_id in range(0, np.shape(data['x'])[0]):
+            for profile_id in range(0, len(data['x'])):
                 # Remove the bad data
                 qaqc_data = data['qaqc'][data['x_field']]
 
@@ -194,7 +194,7 @@ def generate_plot(data, plot_options):
                                        scatter=use_scatter,
                                        **kwargs)
         else:
-            if int(plot_profile_id) < int(np.shape(data['x'])[0]):
+            if int(plot_profile_id) < int(len(data['x'])):
                 # get the profile selected
                 ooi_plots.plot_profile(fig,
                                        ax,
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/profiles.py
+
+Segmentation of profiler and glider data into individual profiles.
+'''
+
+import numpy as np
+
+
+class ProfileSegmenter(object):
+    """ Assigns a profile id to each particle of a profiling instrument from its time and depth.
+
+    Depth is resampled onto a regular time grid (interval seconds), smoothed with a moving average
+    (window samples) and the changes of direction of the smoothed depth are taken as profile
+    boundaries. Each profile spans consecutive turning points, widened by margin seconds on each side.
+
+    Every step is vectorized: particles are ordered by a sorted time index, particles sharing a time
+    are treated as one sample for the depth signal and receive the same profile id, and particles are
+    assigned to profiles with a single searchsorted over the profile stop times, so the cost is
+    O(N log N) in the number of particles.
+    """
+    def __init__(self, interval=10, window=5, margin=None):
+        self.interval = interval
+        self.window = window
+        self.margin = margin if margin is not None else 2 * interval
+
+    def boundaries(self, time, depth):
+        """ Return (start_times, stop_times) arrays of the profiles found in the data.
+        time and depth must already be sorted by time and free of duplicate times.
+        """
+        grid = np.arange(time[0], time[-1], self.interval)
+        depth_grid = np.interp(grid, time, depth)
+
+        # Moving average, direction of travel, and a second smoothing pass of the direction.
+        weights = np.repeat(1.0, self.window) / self.window
+        direction = np.sign(np.diff(np.convolve(depth_grid, weights, mode='valid')))
+        if len(direction) < self.window:
+            raise ValueError('Unable to determine where slope changes.')
+        direction = np.sign(np.convolve(direction, weights, mode='valid'))
+
+        # Indices where the direction changes are the profile turning points.
+        turns = np.flatnonzero(np.diff(direction))
+        if len(turns) < 2:
+            raise ValueError('Unable to determine where slope changes.')
+
+        turn_times = grid[turns]
+        start_times = turn_times[:-1] - self.margin
+        stop_times = turn_times[1:] + self.margin
+        return start_times, stop_times
+
+    def segment(self, time, depth):
+        """ Return an int64 array of profile ids aligned with time and depth; -1 where a particle
+        does not belong to any profile. Where widened profiles overlap, a particle is assigned to
+        the earlier profile.
+        """
+        time = np.asarray(time, dtype=np.float64)
+        depth = np.asarray(depth, dtype=np.float64)
+        if time.shape != depth.shape:
+            raise ValueError('time and depth must be the same length.')
+
+        profile_ids = np.full(len(time), -1, dtype=np.int64)
+        if len(time) == 0:
+            return profile_ids
+
+        # Sorted time index; duplicate times are collapsed to their mean depth.
+        order = np.argsort(time, kind='mergesort')
+        sorted_time = time[order]
+        unique_time, inverse, counts = np.unique(sorted_time, return_inverse=True, return_counts=True)
+        unique_depth = np.bincount(inverse, weights=depth[order]) / counts
+
+        start_times, stop_times = self.boundaries(unique_time, unique_depth)
+
+        # The first profile whose stop time is at or after the particle time, if it has started.
+        candidate = np.searchsorted(stop_times, unique_time, side='left')
+        in_range = candidate < len(stop_times)
+        inside = np.zeros(len(unique_time), dtype=bool)
+        inside[in_range] = start_times[candidate[in_range]] <= unique_time[in_range]
+        unique_ids = np.where(inside, candidate, -1)
+
+        profile_ids[order] = unique_ids[inverse]
+        return profile_ids
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/stream_index.py
+
+Search index for the data catalog stream list (/uframe/stream).
+
+The index is built whenever 'stream_list' is compiled and published next to it ('stream_index'); each
+worker holds an in-process copy, reloaded when the published version changes. It contains:
+    - an n-gram index (1 to 3 characters) over the searchable text of each stream (array, site,
+      platform, assembly, reference designator, stream, parameter and long display names); a search
+      term is answered by intersecting the postings of its n-grams and verifying the candidates,
+    - the reference designator prefixes (array, site, platform, instrument) of each stream, used for
+      excluding disabled streams,
+    - stream end times ordered by time, so date range filtering is a bisection,
+    - sorted permutations of the stream list per sort key, so a page is read directly in sort order.
+Streams are identified by their position in the stream list. The index (and 'stream_list') holds stream
+summaries; the per stream parameter arrays (PARAMETER_FIELDS) are cached apart ('stream_parameters',
+by stream key '<reference designator>/<stream name>') and read only when requested. The parameter display
+names are searched and returned with 'min', so they stay in the summaries.
+
+Pages can be requested with a cursor (encode_cursor, decode_cursor): the position in the sort order of
+the last stream returned, valid across rebuilds of the index (the stream is then looked up by its key).
+
+The stream list is served stale while it is rebuilt (stream_list_cache): after SOFT_TIMEOUT seconds one
+worker compiles it again in the background.
+'''
+
+from flask import current_app
+from ooiservices.app.cache_tools import VersionedValue, RefreshingValue, new_version
+from ooiservices.app.sharded_cache import ShardedValue
+from ooiservices.app.uframe.tile_cache import cache_stream_end_times
+from ooiservices.app.uframe.toc_cache import set_built_toc_version
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+import base64
+import json
+
+CACHE_TIMEOUT = 172800
+SOFT_TIMEOUT = 3600
+SEARCH_FIELDS = ['array_name', 'site_name', 'platform_name', 'assembly_name', 'reference_designator',
+                 'stream_name', 'parameter_display_name', 'long_display_name']
+SORT_KEYS = ['end', 'start', 'reference_designator', 'stream_name', 'display_name', 'long_display_name',
+             'array_name', 'site_name', 'platform_name', 'assembly_name']
+PREFIX_LENGTHS = [2, 8, 11, 14, 27]
+PARAMETER_FIELDS = ['variables', 'parameter_id', 'units', 'variable_type', 'variables_shape', 'variable_types']
+# Stream fields omitted from /stream responses when 'min' is requested.
+STREAM_DETAIL_FIELDS = ['parameter_id', 'units', 'variable_type', 'variable_types', 'download', 'variables',
+                        'variables_shape']
+MAX_GRAM = 3
+
+stream_index = VersionedValue('stream_index', timeout=CACHE_TIMEOUT, check_interval=10)
+stream_list_store = ShardedValue('stream_list', timeout=CACHE_TIMEOUT, group=itemgetter('reference_designator'))
+stream_parameters_store = ShardedValue('stream_parameters', timeout=CACHE_TIMEOUT)
+
+
+def stream_key(stream):
+    return '%s/%s' % (stream.get('reference_designator', None), stream.get('stream_name', None))
+
+
+def stream_summary(stream):
+    """ Stream without its parameter arrays.
+    """
+    return dict((key, value) for key, value in stream.iteritems() if key not in PARAMETER_FIELDS)
+
+
+def stream_min(stream):
+    """ Stream (or stream summary) without its parameter arrays and download links, as returned with 'min'.
+    """
+    return dict((key, value) for key, value in stream.iteritems() if key not in STREAM_DETAIL_FIELDS)
+
+
+def stream_parameters(stream):
+    """ Parameter arrays of a stream.
+    """
+    return dict((key, stream[key]) for key in PARAMETER_FIELDS if key in stream)
+
+
+def search_text(stream):
+    """ Lower case searchable text of a stream; fields are separated by new lines so terms match within a field.
+    """
+    values = []
+    for field in SEARCH_FIELDS:
+        value = stream.get(field, None)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join([unicode(item) for item in value])
+        values.append(unicode(value).lower())
+    return u'\n'.join(values)
+
+
+def ngrams(text, size):
+    return set([text[i:i + size] for i in range(len(text) - size + 1)])
+
+
+def sort_permutation(streams, key):
+    """ Indices of streams in ascending order of key (None when the key is not present in the streams).
+    """
+    try:
+        return sorted(range(len(streams)), key=lambda i: streams[i][key])
+    except (KeyError, TypeError):
+        return None
+
+
+def build_stream_index(streams):
+    """ Build the search index for the stream list.
+    """
+    from ooiservices.app.uframe.controller import iso_to_timestamp
+    texts = []
+    grams = {}
+    prefixes = {}
+    end_times = []
+    for i, stream in enumerate(streams):
+        text = search_text(stream)
+        texts.append(text)
+        for size in range(1, MAX_GRAM + 1):
+            for gram in ngrams(text, size):
+                grams.setdefault(gram, set()).add(i)
+
+        rd = stream.get('reference_designator', None) or ''
+        for length in PREFIX_LENGTHS:
+            if len(rd) >= length:
+                prefixes.setdefault(rd[:length].lower(), set()).add(i)
+        try:
+            end_times.append((iso_to_timestamp(stream['end']), i))
+        except Exception:
+            continue
+    end_times.sort()
+
+    sorted_by = {}
+    for key in SORT_KEYS:
+        sorted_by[key] = sort_permutation(streams, key)
+
+    return {'version': new_version(),
+            'streams': [stream_summary(stream) for stream in streams],
+            'keys': dict((stream_key(stream), i) for i, stream in enumerate(streams)),
+            'texts': texts,
+            'grams': grams,
+            'prefixes': prefixes,
+            'end_times': [item[0] for item in end_times],
+            'end_ids': [item[1] for item in end_times],
+            'sorted_by': sorted_by}
+
+
+def cache_stream_list(streams, toc_version=None):
+    """ Cache the compiled stream list (summaries and parameter arrays apart), the stream end times and the
+    stream list search index; toc_version is the version of the compiled toc the stream list was compiled from.
+    """
+    stream_list_store.set([stream_summary(stream) for stream in streams])
+    stream_parameters_store.set(dict((stream_key(stream), stream_parameters(stream)) for stream in streams))
+    if toc_version is not None:
+        set_built_toc_version('stream_list', toc_version)
+    cache_stream_end_times(streams)
+    try:
+        stream_index.publish(build_stream_index(streams))
+    except Exception as err:
+        message = 'Unable to build stream index: %s' % str(err)
+        current_app.logger.info(message)
+
+
+def get_stream_list():
+    """ Get the cached stream list (with parameter arrays), or None.
+    """
+    streams = stream_list_store.get()
+    if not streams:
+        return streams
+    parameters = stream_parameters_store.get() or {}
+    return [dict(stream, **parameters.get(stream_key(stream), {})) for stream in streams]
+
+
+def get_stream_parameters(rd, stream_name):
+    """ Get the parameter arrays of a stream, or None if the stream is not in the cached stream list.
+    """
+    return stream_parameters_store.get_group('%s/%s' % (rd, stream_name))
+
+
+def get_stream(rd, stream_name):
+    """ Get a stream (with parameter arrays) of the cached stream list, or None if it is not in the list.
+    """
+    parameters = get_stream_parameters(rd, stream_name)
+    if parameters is None:
+        return None
+    for stream in stream_list_store.get_group(rd) or []:
+        if stream.get('stream_name', None) == stream_name:
+            return dict(stream, **parameters)
+    return None
+
+
+def _read_stream_index():
+    index = stream_index.get()
+    if index is None:
+        streams = get_stream_list()
+        if streams:
+            cache_stream_list(streams)
+            index = stream_index.get()
+            if index is None:
+                index = build_stream_index(streams)
+    return index
+
+
+def _build_stream_index():
+    from ooiservices.app.uframe.controller import compile_stream_list
+    streams = compile_stream_list()
+    index = stream_index.get()
+    if index is None:
+        index = build_stream_index(streams)
+    return index
+
+
+stream_list_cache = RefreshingValue('stream_list', _build_stream_index, SOFT_TIMEOUT, CACHE_TIMEOUT,
+                                    read=_read_stream_index)
+
+
+def get_stream_index():
+    """ Get the stream list search index; if not available build it from the cached (or compiled) stream list.
+    """
+    return stream_list_cache.get()
+
+
+def search_term(index, term):
+    """ Set of stream ids whose searchable text contains term (case insensitive).
+    """
+    term = term.lower()
+    if not term:
+        return set(range(len(index['streams'])))
+    if len(term) <= MAX_GRAM:
+        return set(index['grams'].get(term, ()))
+    postings = []
+    for gram in ngrams(term, MAX_GRAM):
+        posting = index['grams'].get(gram, None)
+        if not posting:
+            return set()
+        postings.append(posting)
+    postings.sort(key=len)
+    candidates = set(postings[0]).intersection(*postings[1:])
+    texts = index['texts']
+    return set([i for i in candidates if term in texts[i]])
+
+
+def search(index, terms):
+    """ Set of stream ids matching all terms.
+    """
+    result = None
+    for term in set(terms):
+        ids = search_term(index, term)
+        result = ids if result is None else result & ids
+        if not result:
+            break
+    return result
+
+
+def concept_ids(index, terms):
+    """ Set of stream ids whose reference designator contains any of the terms (case insensitive).
+    """
+    result = set()
+    streams = index['streams']
+    for term in set(terms):
+        term = term.lower()
+        for i in search_term(index, term):
+            if term in (streams[i].get('reference_designator', None) or '').lower():
+                result.add(i)
+    return result
+
+
+def prefix_ids(index, rds):
+    """ Set of stream ids whose reference designator starts with one of the reference designators.
+    """
+    result = set()
+    for rd in rds:
+        result |= index['prefixes'].get(rd.lower(), set())
+    return result
+
+
+def end_time_ids(index, start, end):
+    """ Set of stream ids with an end time (unix seconds) between start and end.
+    """
+    first = bisect_left(index['end_times'], start)
+    last = bisect_right(index['end_times'], end)
+    return set(index['end_ids'][first:last])
+
+
+def sorted_ids(index, key):
+    """ Stream ids in ascending order of key, or None if streams can not be sorted by key.
+    """
+    sorted_by = index['sorted_by']
+    if key not in sorted_by:
+        # Keep permutations for other keys with the in-process index.
+        sorted_by[key] = sort_permutation(index['streams'], key)
+    return sorted_by[key]
+
+
+def page(order, ids, start_at=0, count=None, reverse=False):
+    """ Return the stream ids of a page, in order (reversed if reverse), from ids (None for all streams).
+    """
+    if ids is None:
+        if reverse:
+            stop = len(order) - start_at
+            begin = 0 if count is None else max(stop - count, 0)
+            return order[begin:max(stop, 0)][::-1]
+        if count is None:
+            return order[start_at:]
+        return order[start_at:start_at + count]
+
+    if reverse:
+        order = reversed(order)
+    result = []
+    skipped = 0
+    for i in order:
+        if i not in ids:
+            continue
+        if skipped < start_at:
+            skipped += 1
+            continue
+        result.append(i)
+        if count is not None and len(result) >= count:
+            break
+    return result
+
+
+def page_after(order, ids, position=None, count=None, reverse=False):
+    """ Return (stream ids, position) for the page of streams following position (a position in order; None
+    for the first page), in order (reversed if reverse), from ids (None for all streams). The position
+    returned is that of the last stream of the page, or None when no streams follow.
+    """
+    if reverse:
+        positions = xrange(len(order) - 1 if position is None else position - 1, -1, -1)
+    else:
+        positions = xrange(0 if position is None else position + 1, len(order))
+    result = []
+    last = None
+    for p in positions:
+        i = order[p]
+        if ids is not None and i not in ids:
+            continue
+        if count is not None and len(result) >= count:
+            return result, last
+        result.append(i)
+        last = p
+    return result, None
+
+
+def encode_cursor(index, order, position, sort_by, reverse):
+    """ Opaque cursor for the page following position in order.
+    """
+    cursor = {'v': index['version'], 'p': position, 'k': stream_key(index['streams'][order[position]]),
+              's': sort_by, 'r': reverse}
+    return base64.urlsafe_b64encode(json.dumps(cursor))
+
+
+def decode_cursor(index, order, cursor, sort_by, reverse):
+    """ Position in order of the cursor; raises ValueError for invalid cursors, cursors of another sort order,
+    or (after the index was rebuilt) of a stream no longer in the stream list.
+    """
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        position, key = int(cursor['p']), cursor['k']
+        if cursor['s'] != sort_by or cursor['r'] != reverse:
+            raise ValueError('Cursor of another sort order.')
+    except (TypeError, KeyError, ValueError) as err:
+        raise ValueError('Invalid cursor: %s' % str(err))
+    if cursor['v'] == index['version'] and 0 <= position < len(order):
+        return position
+    i = index['keys'].get(key, None)
+    if i is None:
+        raise ValueError('Invalid cursor: stream %s is no longer available.' % key)
+    return order.index(i)
+
+
+def project(stream, fields):
+    """ Stream with only the fields requested.
+    """
+    return dict((field, stream[field]) for field in fields if field in stream)
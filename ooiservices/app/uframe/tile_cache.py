@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/tile_cache.py
+
+Time-window tile cache for uframe particle data.
+
+Each stream's timeline is split into fixed tiles aligned on UFRAME_TILE_SECONDS (default one day).
+A tile holds the decoded ParticleFrame for one stream, parameter set and resolution level. Plot
+requests are answered by joining the tiles covering the requested window, so overlapping windows
+share work and only the missing tiles are requested from uframe (contiguous missing tiles are
+fetched with a single request and split).
+
+Resolution levels: the particles requested per tile are derived from the plot limit and the window
+length, rounded up to a power of two, so windows of similar length share tiles.
+
+Tiles which end before the stream's endTime (from the TOC) are historical and immutable; they are kept
+for UFRAME_TILE_TIMEOUT_HISTORICAL seconds. Tiles touching the stream's endTime (or now) may still
+receive data and are kept for UFRAME_TILE_TIMEOUT_RECENT seconds, after which they are refetched.
+'''
+
+from flask import current_app
+from ooiservices.app import cache
+from ooiservices.app.uframe.particles import ParticleFrame, NoParticlesError
+from datetime import datetime
+import hashlib
+import math
+import numpy as np
+import os
+import pickle
+import time
+
+COSMO_CONSTANT = 2208988800
+STREAM_END_TIMES_TIMEOUT = 172800
+
+
+def cache_stream_end_times(streams):
+    """ Store the endTime (unix seconds) of each stream in the stream list, keyed by
+    'reference_designator|stream_name', used to decide which tiles are still receiving data.
+    """
+    from ooiservices.app.uframe.controller import iso_to_timestamp
+    end_times = {}
+    for item in streams:
+        try:
+            key = '|'.join([item['reference_designator'], item['stream_name']])
+            end_times[key] = iso_to_timestamp(item['end'])
+        except Exception:
+            continue
+    cache.set('stream_end_times', end_times, timeout=STREAM_END_TIMES_TIMEOUT)
+    return end_times
+
+
+def get_stream_end_time(reference_designator, stream_name):
+    """ Get the endTime (unix seconds) of a stream from the TOC, or None if not known.
+    """
+    end_times = cache.get('stream_end_times')
+    if not end_times:
+        return None
+    return end_times.get('|'.join([reference_designator, stream_name]), None)
+
+
+def tile_level(limit, tile_seconds, window_seconds):
+    """ Particles to request per tile so the window holds about limit particles, rounded up to a
+    power of two and bounded by UFRAME_TILE_MIN_LIMIT and UFRAME_TILE_LIMIT.
+    """
+    minimum = current_app.config.get('UFRAME_TILE_MIN_LIMIT', 64)
+    maximum = current_app.config.get('UFRAME_TILE_LIMIT', 20000)
+    per_tile = float(limit) * tile_seconds / max(window_seconds, 1)
+    level = 2 ** int(math.ceil(math.log(max(per_tile, 1), 2)))
+    return int(min(max(level, minimum), maximum))
+
+
+def _timestamp_to_iso(timestamp):
+    return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class TileCache(object):
+    """ Tiles of one stream, parameter set and resolution level.
+    """
+    def __init__(self, mooring, platform, instrument, stream_type, stream, dpa_flag, parameter_ids, fields,
+                 level, tile_seconds):
+        self.mooring = mooring
+        self.platform = platform
+        self.instrument = instrument
+        self.stream_type = stream_type
+        self.stream = stream
+        self.dpa_flag = dpa_flag
+        self.parameter_ids = [str(pd_id) for pd_id in parameter_ids]
+        self.fields = list(fields)
+        self.level = level
+        self.tile_seconds = tile_seconds
+        self.reference_designator = '-'.join([mooring, platform, instrument])
+        identity = '|'.join([self.reference_designator, stream_type, stream, str(dpa_flag),
+                             ','.join(sorted(self.parameter_ids)), ','.join(sorted(set(self.fields))),
+                             str(level), str(tile_seconds)])
+        self.prefix = 'tile_' + hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def key(self, index):
+        return '%s_%d' % (self.prefix, index)
+
+    def get(self, index):
+        """ Return the cached frame for tile index, or None.
+        """
+        key = self.key(index)
+        try:
+            frame = cache.get(key)
+            if frame is not None:
+                return frame
+            path = self._disk_path(key)
+            if path and os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    expires, frame = pickle.load(f)
+                remaining = int(expires - time.time())
+                if remaining <= 0:
+                    os.remove(path)
+                    return None
+                cache.set(key, frame, timeout=remaining)
+                return frame
+        except Exception as err:
+            current_app.logger.info('Unable to read tile %s: %s' % (key, str(err)))
+        return None
+
+    def set(self, index, frame):
+        """ Store the frame for tile index, with a timeout depending on whether the tile is historical.
+        """
+        key = self.key(index)
+        timeout = self.timeout(index)
+        try:
+            cache.set(key, frame, timeout=timeout)
+            path = self._disk_path(key)
+            if path:
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                tmp_path = '%s.%d' % (path, os.getpid())
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump((time.time() + timeout, frame), f, pickle.HIGHEST_PROTOCOL)
+                os.rename(tmp_path, path)
+        except Exception as err:
+            current_app.logger.info('Unable to cache tile %s: %s' % (key, str(err)))
+
+    def timeout(self, index):
+        """ Historical tiles (ending before the stream endTime and before now) are immutable.
+        """
+        tile_end = (index + 1) * self.tile_seconds
+        end_time = get_stream_end_time(self.reference_designator, '_'.join([self.stream_type, self.stream]))
+        now = time.time()
+        if end_time is None:
+            # Without the TOC endTime, only tiles at least one tile width in the past are historical.
+            end_time = now - self.tile_seconds
+        if tile_end < min(end_time, now):
+            return current_app.config.get('UFRAME_TILE_TIMEOUT_HISTORICAL', 2592000)
+        return current_app.config.get('UFRAME_TILE_TIMEOUT_RECENT', 600)
+
+    def _disk_path(self, key):
+        directory = current_app.config.get('UFRAME_TILE_CACHE_DIR', None)
+        if not directory:
+            return None
+        return os.path.join(directory, key + '.pickle')
+
+    def fetch(self, first, last, check=None):
+        """ Fetch tiles first..last-1 from uframe with a single request; returns {index: frame}.
+        Tiles of a window for which uframe has no data are returned (and cached) empty.
+        """
+        begin = first * self.tile_seconds
+        end = last * self.tile_seconds
+        try:
+            frame = ParticleFrame.from_particles(self.request(begin, end, self.level * (last - first)),
+                                                 self.fields, check=check)
+        except NoParticlesError:
+            frame = ParticleFrame.from_particles([], self.fields)
+
+        # Split the frame at tile boundaries (particle times are seconds since 1900).
+        order = np.argsort(frame.time, kind='mergesort')
+        frame = frame.take(order)
+        edges = np.arange(first, last + 1) * float(self.tile_seconds) + COSMO_CONSTANT
+        bounds = np.searchsorted(frame.time, edges, side='left')
+        tiles = {}
+        for i, index in enumerate(range(first, last)):
+            tile = frame.take(np.arange(bounds[i], bounds[i + 1]))
+            tile.received = len(tile)
+            tiles[index] = tile
+        return tiles
+
+    def request(self, begin, end, limit):
+        """ Request the particles of the unix time window [begin, end] from uframe.
+        """
+        from ooiservices.app.uframe.controller import get_uframe_plot_particles
+        return get_uframe_plot_particles(self.mooring, self.platform, self.instrument, self.stream_type,
+                                         self.stream, _timestamp_to_iso(begin), _timestamp_to_iso(end),
+                                         self.dpa_flag, self.parameter_ids, limit=limit)
+
+    def get_window(self, begin, end, check=None):
+        """ Return a frame for the unix time window [begin, end], fetching only the missing tiles.
+        """
+        first = int(begin // self.tile_seconds)
+        last = int(math.ceil(end / float(self.tile_seconds)))
+        tiles = {}
+        for index in range(first, last):
+            tiles[index] = self.get(index)
+
+        # Fetch each run of contiguous missing tiles with one request, keeping requests within the particle limit.
+        max_run = max(current_app.config.get('UFRAME_PLOT_MAX_PARTICLES', 100000) // self.level, 1)
+        index = first
+        while index < last:
+            if tiles[index] is not None:
+                index += 1
+                continue
+            run_end = index
+            while run_end < last and tiles[run_end] is None and run_end - index < max_run:
+                run_end += 1
+            fetched = self.fetch(index, run_end, check=check)
+            for tile_index, tile in fetched.items():
+                self.set(tile_index, tile)
+                tiles[tile_index] = tile
+            index = run_end
+
+        frame = ParticleFrame.concatenate([tiles[tile_index] for tile_index in range(first, last)])
+        in_window = (frame.time >= begin + COSMO_CONSTANT) & (frame.time <= end + COSMO_CONSTANT)
+        return frame.take(np.flatnonzero(in_window))
+
+
+def get_particle_frame(mooring, platform, instrument, stream_type, stream, start_time, end_time,
+                       dpa_flag, parameter_ids, fields, limit=None, check=None):
+    """ Return a ParticleFrame of fields for the window start_time..end_time (iso8601 strings).
+    Windows spanning between one and UFRAME_TILE_MAX_TILES tiles are served from the tile cache;
+    other windows (or when UFRAME_TILE_CACHE is disabled) are requested from uframe directly.
+    """
+    from ooiservices.app.uframe.controller import get_uframe_plot_particles, iso_to_timestamp
+    if limit is None:
+        limit = current_app.config['DATA_POINTS']
+
+    tile_seconds = current_app.config.get('UFRAME_TILE_SECONDS', 86400)
+    max_tiles = current_app.config.get('UFRAME_TILE_MAX_TILES', 62)
+    use_tiles = current_app.config.get('UFRAME_TILE_CACHE', True)
+    if use_tiles:
+        begin = iso_to_timestamp(start_time)
+        end = iso_to_timestamp(end_time)
+        window = end - begin
+        tiles = math.ceil(end / float(tile_seconds)) - (begin // tile_seconds)
+        use_tiles = window >= tile_seconds and tiles <= max_tiles
+
+    if not use_tiles:
+        particles = get_uframe_plot_particles(mooring, platform, instrument, stream_type, stream,
+                                              start_time, end_time, dpa_flag, parameter_ids, limit=limit)
+        return ParticleFrame.from_particles(particles, fields, check=check)
+
+    level = tile_level(limit, tile_seconds, window)
+    tile_cache = TileCache(mooring, platform, instrument, stream_type, stream, dpa_flag, parameter_ids, fields,
+                           level, tile_seconds)
+    return tile_cache.get_window(begin, end, check=check)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/toc_cache.py
+
+Compiled uframe toc, refreshed incrementally.
+
+The compiled toc ('compiled_toc') holds the processed instruments of the last uframe /sensor/inv/toc
+response together with a content hash per instrument (the raw instrument, the parameter definitions
+of its streams and the version of the vocabulary its display names are resolved from). On refresh the
+new toc response is hashed and compared with the compiled toc; only the instruments added or changed are
+processed again, the others are reused as they are. Publishing a new vocabulary changes every hash, so
+all instruments are processed again with the new display names.
+
+Each refresh which changes the toc publishes a new version of the compiled toc and a delta (instruments
+added, removed and changed, by reference designator) from the previous version. Caches built from the
+toc (stream list, parameter index, asset reference designators) record the toc version they were built
+from ('<key>_toc_version') and use toc_delta_since to patch themselves instead of being recomputed; when
+no delta is available (None), they are rebuilt in full.
+'''
+
+from ooiservices.app import cache
+from ooiservices.app.cache_tools import VersionedValue, new_version
+import hashlib
+import json
+
+CACHE_TIMEOUT = 172800
+DELTA_HISTORY = 48
+
+compiled_toc = VersionedValue('compiled_toc', timeout=CACHE_TIMEOUT)
+
+
+def instrument_hash(instrument, parameters_by_stream, definitions, vocab_version=None):
+    """ Content hash of a raw toc instrument, the parameter definitions (by pdId) of its streams and the
+    vocab table version.
+    """
+    parameters = {}
+    for stream in instrument.get('streams', None) or []:
+        name = stream.get('stream', None)
+        pdids = parameters_by_stream.get(name, None) or []
+        parameters[name] = [definitions.get(pdid, None) for pdid in pdids]
+    content = json.dumps([instrument, parameters, vocab_version], sort_keys=True)
+    return hashlib.sha1(content).hexdigest()
+
+
+def toc_hashes(data, vocab_version=None):
+    """ Return the reference designators of the instruments in uframe toc data (in toc order) and their content hashes.
+    """
+    definitions = {}
+    for definition in data.get('parameter_definitions', None) or []:
+        definitions[definition.get('pdId', None)] = definition
+    parameters_by_stream = data.get('parameters_by_stream', None) or {}
+    order = []
+    hashes = {}
+    for instrument in data.get('instruments', None) or []:
+        rd = instrument['reference_designator']
+        if rd not in hashes:
+            order.append(rd)
+        hashes[rd] = instrument_hash(instrument, parameters_by_stream, definitions, vocab_version)
+    return order, hashes
+
+
+def diff_hashes(old, new):
+    """ Compare instrument hashes; return delta dictionary with lists of rds 'added', 'removed' and 'changed'.
+    """
+    return {'added': sorted([rd for rd in new if rd not in old]),
+            'removed': sorted([rd for rd in old if rd not in new]),
+            'changed': sorted([rd for rd in new if rd in old and old[rd] != new[rd]])}
+
+
+def merge_deltas(deltas):
+    """ Combine consecutive deltas into a single delta.
+    """
+    added, removed, changed = set(), set(), set()
+    for delta in deltas:
+        for rd in delta['added']:
+            if rd in removed:
+                removed.discard(rd)
+                changed.add(rd)
+            else:
+                added.add(rd)
+        for rd in delta['removed']:
+            if rd in added:
+                added.discard(rd)
+            else:
+                changed.discard(rd)
+                removed.add(rd)
+        for rd in delta['changed']:
+            if rd not in added:
+                changed.add(rd)
+    return {'added': sorted(added), 'removed': sorted(removed), 'changed': sorted(changed)}
+
+
+def refresh_compiled_toc(data, process):
+    """ Update the compiled toc from uframe toc data (dict format); process(data) is called with the added
+    and changed instruments only and returns their processed form. Returns (toc, version) where toc is
+    the processed list of instruments.
+    """
+    from ooiservices.app.uframe.vocab import vocab_table
+    order, hashes = toc_hashes(data, cache.get(vocab_table.version_key))
+    previous = compiled_toc.get()
+    if previous is None:
+        delta = None
+        stale = set(order)
+    else:
+        delta = diff_hashes(previous['hashes'], hashes)
+        if not (delta['added'] or delta['removed'] or delta['changed']) and order == previous['order']:
+            return [previous['instruments'][rd] for rd in order if rd in previous['instruments']], \
+                previous['version']
+        stale = set(delta['added'] + delta['changed'])
+
+    processed = {}
+    instruments = [instrument for instrument in data['instruments'] if instrument['reference_designator'] in stale]
+    if instruments:
+        subset = dict(data)
+        subset['instruments'] = instruments
+        for instrument in process(subset) or []:
+            processed[instrument['reference_designator']] = instrument
+
+    compiled = {}
+    toc = []
+    for rd in order:
+        instrument = processed.get(rd, None) if rd in stale else previous['instruments'].get(rd, None)
+        if instrument is not None:
+            compiled[rd] = instrument
+            toc.append(instrument)
+
+    version = new_version()
+    compiled_toc.publish({'version': version, 'order': order, 'hashes': hashes, 'instruments': compiled})
+    if delta is not None:
+        delta['from_version'] = previous['version']
+        delta['version'] = version
+        deltas = (cache.get('toc_deltas') or [])[-(DELTA_HISTORY - 1):]
+        deltas.append(delta)
+        cache.set('toc_deltas', deltas, timeout=CACHE_TIMEOUT)
+    else:
+        cache.delete('toc_deltas')
+    return toc, version
+
+
+def get_toc_version():
+    """ Version of the compiled toc, or None.
+    """
+    compiled = compiled_toc.get()
+    if compiled is None:
+        return None
+    return compiled['version']
+
+
+def get_toc_reference_designators():
+    """ Reference designators of all instruments in the compiled toc (including those which could not be processed).
+    """
+    compiled = compiled_toc.get()
+    if compiled is None:
+        return []
+    return compiled['order']
+
+
+def toc_delta_since(version):
+    """ Delta of the compiled toc from version to the current version, or None when it can not be determined.
+    """
+    current = get_toc_version()
+    if version is None or current is None:
+        return None
+    if version == current:
+        return {'added': [], 'removed': [], 'changed': []}
+    steps = {}
+    for delta in cache.get('toc_deltas') or []:
+        steps[delta['from_version']] = delta
+    chain = []
+    while version != current:
+        delta = steps.pop(version, None)
+        if delta is None:
+            return None
+        chain.append(delta)
+        version = delta['version']
+    return merge_deltas(chain)
+
+
+def get_built_toc_version(key):
+    """ Toc version the cached value key was built from, or None.
+    """
+    return cache.get(key + '_toc_version')
+
+
+def set_built_toc_version(key, version):
+    """ Record the toc version the cached value key was built from.
+    """
+    if version is None:
+        cache.delete(key + '_toc_version')
+    else:
+        cache.set(key + '_toc_version', version, timeout=CACHE_TIMEOUT)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+'''
+ooiservices/app/uframe/toc_tree.py
+
+Hierarchical (array -> mooring -> platform -> instrument) model of the processed uframe toc.
+
+The model is built once per toc version, when the toc is processed, and published like the parameter
+index; each worker holds an in-process copy. Nodes are indexed by reference designator ('CE',
+'CE01ISSM', 'CE01ISSM-MFD35', 'CE01ISSM-MFD35-04-ADCPTM000') with the reference designators of their
+parent and children and by level, and the sorted list of all reference designators answers prefix queries
+(get_toc_branch) without a scan of the toc.
+'''
+
+from flask import current_app
+from ooiservices.app.cache_tools import VersionedValue
+from ooiservices.app.uframe.toc_cache import get_built_toc_version, set_built_toc_version
+from bisect import bisect_left
+
+CACHE_TIMEOUT = 172800
+LEVELS = ['array', 'mooring', 'platform', 'instrument']
+INSTRUMENT_FIELDS = ['instrument_code', 'streams', 'instrument_parameters']
+
+toc_tree = VersionedValue('toc_tree', timeout=CACHE_TIMEOUT)
+
+
+def _add_node(tree, rd, level, parent, display_name, codes):
+    node = tree['nodes'].get(rd, None)
+    if node is None:
+        node = {'reference_designator': rd, 'level': level, 'parent': parent, 'display_name': display_name}
+        node.update(codes)
+        tree['nodes'][rd] = node
+        tree['children'][rd] = []
+        tree['levels'][level].append(rd)
+        if parent is not None:
+            tree['children'][parent].append(rd)
+    elif not node['display_name'] and display_name:
+        node['display_name'] = display_name
+    return node
+
+
+def build_toc_tree(toc, array_names=None):
+    """ Build the hierarchical model of the processed toc (list of instruments with display names, streams
+    and 'instrument_parameters'); array_names is an optional {array code: display name}.
+    """
+    array_names = array_names or {}
+    tree = {'nodes': {}, 'children': {}, 'levels': dict((level, []) for level in LEVELS)}
+    for instrument in toc:
+        rd = instrument.get('reference_designator', None)
+        if not rd:
+            continue
+        array = rd[:2]
+        _add_node(tree, array, 'array', None, array_names.get(array, None), {'array_code': array})
+        parent = array
+        if rd.count('-') >= 2:
+            mooring, platform = rd[:8], rd[:14]
+            codes = {'array_code': array, 'mooring_code': mooring}
+            _add_node(tree, mooring, 'mooring', array, instrument.get('mooring_display_name', None), codes)
+            codes = {'array_code': array, 'mooring_code': mooring, 'platform_code': rd[9:14]}
+            _add_node(tree, platform, 'platform', mooring, instrument.get('platform_display_name', None), codes)
+            parent = platform
+        if rd in tree['nodes']:
+            continue
+        node = _add_node(tree, rd, 'instrument', parent, instrument.get('instrument_display_name', None),
+                         {'array_code': array,
+                          'mooring_code': instrument.get('mooring_code', None),
+                          'platform_code': instrument.get('platform_code', None)})
+        for field in INSTRUMENT_FIELDS:
+            node[field] = instrument.get(field, None)
+    tree['sorted'] = sorted(tree['nodes'])
+    return tree
+
+
+def update_toc_tree(toc, toc_version=None, array_names=None):
+    """ Build and publish the toc model from the processed toc (of version toc_version), unless it was
+    already built from that version.
+    """
+    try:
+        if toc_version is not None and toc_tree.get() is not None and \
+                get_built_toc_version('toc_tree') == toc_version:
+            return
+        tree = build_toc_tree(toc, array_names)
+        toc_tree.publish(tree)
+        set_built_toc_version('toc_tree', toc_version)
+    except Exception as err:
+        message = 'Unable to update toc tree: %s' % str(err)
+        current_app.logger.info(message)
+
+
+def _branch(tree, rd, depth, details):
+    node = dict(tree['nodes'][rd])
+    if not details:
+        for field in INSTRUMENT_FIELDS[1:]:
+            node.pop(field, None)
+    if depth is None or depth > 0:
+        child_depth = None if depth is None else depth - 1
+        node['children'] = [_branch(tree, child, child_depth, details) for child in tree['children'][rd]]
+    return node
+
+
+def get_toc_branch(tree, prefix, depth=None, details=True):
+    """ Return the branches of the toc model whose reference designators start with prefix: the topmost
+    matching nodes, each with its children (nested) down to depth levels (all levels when None). Without
+    details, instrument streams and parameters are left out.
+    """
+    names = tree['sorted']
+    matches = []
+    for i in xrange(bisect_left(names, prefix), len(names)):
+        if not names[i].startswith(prefix):
+            break
+        matches.append(names[i])
+    found = set(matches)
+    return [_branch(tree, rd, depth, details) for rd in matches if tree['nodes'][rd]['parent'] not in found]
+
+
+def get_toc_level(tree, level, details=True):
+    """ Return the nodes (without children) of a level ('array', 'mooring', 'platform' or 'instrument'),
+    in toc order.
+    """
+    return [_branch(tree, rd, 0, details) for rd in tree['levels'][level]]
@@ -2,23 +2,34 @@
 
 """
 Support for uframe vocabulary interface, utilized for display names.
+
+The compiled vocabulary is published to the cache as a versioned table ('vocab_table'), with the
+vocabulary entries split by reference designator level (arrays, moorings, platforms, instruments).
+Each process holds the table in memory and reloads it only when the published version changes, so
+display name lookups do not require a cache round trip. Use resolve_names for many lookups.
+Names not in the vocabulary are looked up in the database; resolve_names and prefetch_names load them
+with one query per table (and DB_BATCH_SIZE names), and within a name_cycle (e.g. compiling the stream
+list) database lookups are memoized.
+After VOCAB_SOFT_TIMEOUT seconds the vocabulary is compiled again in the background while the current
+table is still served.
 """
 __author__ = 'Edna Donoughe'
 
 from flask import jsonify, current_app
 from ooiservices.app.uframe import uframe as api
 from ooiservices.app import cache
+from ooiservices.app.cache_tools import VersionedValue, RefreshingValue
+from ooiservices.app.sharded_cache import ShardedValue
 from requests.exceptions import ConnectionError, Timeout
 from ooiservices.app.models import Platformname
 from ooiservices.app.models import VocabNames
 from ooiservices.app.models import Stream, StreamParameter
 from ooiservices.app.main.errors import bad_request
 
-import requests
-import requests.exceptions
-import requests.adapters
+import threading
+from contextlib import contextmanager
+from ooiservices.app.uframe.client import uframe_client
 
-requests.adapters.DEFAULT_RETRIES = 2
 CACHE_TIMEOUT = 172800
 
 # Remove when specific corrections areapplied to uframe data.
@@ -27,6 +38,22 @@ APPLY_VOCAB_CORRECTIONS = True
 # Utilizes uframe vocab data to create additional vocab items from same uframe data.
 VOCAB_PLUS = True
 
+# Seconds between checks of the published vocab table version.
+VOCAB_CHECK_INTERVAL = 10
+
+# Seconds after which the vocabulary is compiled again (in the background).
+VOCAB_SOFT_TIMEOUT = 28800
+
+# Vocab table level by reference designator length.
+VOCAB_LEVELS = {2: 'arrays', 8: 'moorings', 14: 'platforms', 27: 'instruments'}
+
+# Maximum number of names looked up in the database with one query.
+DB_BATCH_SIZE = 500
+
+vocab_table = VersionedValue('vocab_table', timeout=CACHE_TIMEOUT, check_interval=VOCAB_CHECK_INTERVAL)
+vocab_dict_store = ShardedValue('vocab_dict', timeout=CACHE_TIMEOUT)
+_cycle = threading.local()
+
 
 @api.route('/vocab', methods=['GET'])
 def get_vocabulary():
@@ -45,26 +72,58 @@ def get_vocabulary():
 def get_vocab():
     """ Get 'vocab_dict' from cache or compiled, return vocab_dict.
     """
-    vocab_dict = {}
-    vocab_codes = {}
-    try:
-        # Get 'vocab_dict' if cached
-        dict_cached = cache.get('vocab_dict')
-        if dict_cached:
-            vocab_dict = dict_cached
+    return get_vocab_table()['vocab_dict']
+
+
+def get_vocab_codes():
+    """ Get 'vocab_codes' from cache or compiled, return vocab_codes.
+    """
+    return get_vocab_table()['vocab_codes']
+
+
+def build_vocab_table(vocab_dict, vocab_codes):
+    """ Build vocab table from vocab_dict and vocab_codes; vocab_dict entries are split by level.
+    """
+    table = {'vocab_dict': vocab_dict, 'vocab_codes': vocab_codes, 'other': {}, 'resolved': {}}
+    for level in VOCAB_LEVELS.values():
+        table[level] = {}
+    for rd, item in vocab_dict.iteritems():
+        table[VOCAB_LEVELS.get(len(rd), 'other')][rd] = item
+    return table
+
+
+def publish_vocab(vocab_dict, vocab_codes):
+    """ Place vocab_dict and vocab_codes in cache and publish the vocab table; return vocab table.
+    """
+    vocab_dict_store.set(vocab_dict)
+    cache.set('vocab_codes', vocab_codes, timeout=CACHE_TIMEOUT)
+    table = build_vocab_table(vocab_dict, vocab_codes)
+    vocab_table.publish(table)
+    vocab_cache.mark_built()
+    return table
+
+
+def _read_vocab_table():
+    table = vocab_table.get()
+    if table is None or not table['vocab_dict'] or not table['vocab_codes']:
+        return None
+    return table
+
+
+def _build_vocab_table():
+    vocab_dict, vocab_codes = _compile_vocab()
+    return publish_vocab(vocab_dict, vocab_codes)
+
 
-        # Get 'vocab_codes' if cached
-        codes_cached = cache.get('vocab_codes')
-        if codes_cached:
-            vocab_codes = codes_cached
+vocab_cache = RefreshingValue('vocab_table', _build_vocab_table, VOCAB_SOFT_TIMEOUT, CACHE_TIMEOUT,
+                              read=_read_vocab_table, check_interval=VOCAB_CHECK_INTERVAL)
 
-        # If either 'vocab_dict' or 'vocab_codes' is not cached, get and place in cache.
-        if not vocab_dict or not vocab_codes:
-            vocab_dict, codes = _compile_vocab()
-            cache.set('vocab_dict', vocab_dict, timeout=CACHE_TIMEOUT)
-            cache.set('vocab_codes', codes, timeout=CACHE_TIMEOUT)
 
-        return vocab_dict
+def get_vocab_table():
+    """ Get vocab table (in-process copy of published table); if not published, compile and publish.
+    """
+    try:
+        return vocab_cache.get()
 
     except Exception as err:
         message = str(err)
@@ -72,45 +131,66 @@ def get_vocab():
         raise Exception(message)
 
 
+def _resolve_name(table, rd, field):
+    """ Get display name ('name') or long display name ('long_name') for reference designator using vocab
+    table; if not in vocabulary use database, then build from vocab codes. Results are kept with the table.
+    """
+    item = table[VOCAB_LEVELS.get(len(rd), 'other')].get(rd, None)
+    if item is not None:
+        return item[field]
+
+    key = (field, rd)
+    resolved = table['resolved']
+    if key in resolved:
+        return resolved[key]
+
+    if field == 'long_name':
+        result = _get_long_display_name_by_rd(rd)
+        if result is None:
+            result = build_long_display_name(rd)
+    else:
+        result = _get_display_name_by_rd(rd)
+        if result is None:
+            result = build_display_name(rd)
+    resolved[key] = result
+    return result
+
+
+def resolve_names(rds):
+    """ Get display names for list of reference designators. Returns dict keyed by reference designator,
+    each value a dict with 'name' and 'long_name' (None when not available).
+    """
+    table = get_vocab_table()
+    if table['vocab_dict']:
+        _prefetch_vocab_names(table, rds)
+    results = {}
+    for rd in rds:
+        if rd in results:
+            continue
+        if table['vocab_dict']:
+            results[rd] = {'name': _resolve_name(table, rd, 'name'),
+                           'long_name': _resolve_name(table, rd, 'long_name')}
+        else:
+            results[rd] = {'name': None, 'long_name': None}
+    return results
+
+
 def get_long_display_name_by_rd(rd):
     """ Get long display name for reference designator.
     """
-    try:
-        result = None
-        vocab_dict = get_vocab()
-        if vocab_dict:
-            if rd in vocab_dict:
-                result = vocab_dict[rd]['long_name']
-            else:
-                result = _get_long_display_name_by_rd(rd)
-                if result is None:
-                    # build display name
-                    result = build_long_display_name(rd)
-
-        return result
-    except Exception:
-        raise
+    table = get_vocab_table()
+    if not table['vocab_dict']:
+        return None
+    return _resolve_name(table, rd, 'long_name')
 
 
 def get_display_name_by_rd(rd):
     """ Get display name for a reference designator.
     """
-    try:
-        result = None
-        vocab_dict = get_vocab()
-        if vocab_dict:
-            if rd in vocab_dict:
-                result = vocab_dict[rd]['name']
-            else:
-                # database to get display name
-                result = _get_display_name_by_rd(rd)
-                if result is None:
-                    # build display name
-                    result = build_display_name(rd)
-
-        return result
-    except Exception:
-        raise
+    table = get_vocab_table()
+    if not table['vocab_dict']:
+        return None
+    return _resolve_name(table, rd, 'name')
 
 
 def _compile_vocab():
@@ -833,14 +913,8 @@ def build_long_display_name(rd):
     }
     """
     try:
-        # Get 'vocab_dict' if cached, if not cached build cache, set and continue
-        dict_cached = cache.get('vocab_codes')
-        if dict_cached:
-            vocab_codes = dict_cached
-        else:
-            vocab_dict, vocab_codes = _compile_vocab()
-            cache.set('vocab_dict', vocab_dict, timeout=CACHE_TIMEOUT)
-            cache.set('vocab_codes', vocab_codes, timeout=CACHE_TIMEOUT)
+        # Get 'vocab_codes' from vocab table (compiled and published if not available)
+        vocab_codes = get_vocab_codes()
 
         # Verify 'vocab_codes' has content, otherwise error
         if not vocab_codes:
@@ -993,14 +1067,8 @@ def build_display_name(rd):
 
     """
     try:
-        # Get 'vocab_dict' if cached, if not cached build cache, set and continue
-        dict_cached = cache.get('vocab_codes')
-        if dict_cached:
-            vocab_codes = dict_cached
-        else:
-            vocab_dict, vocab_codes = _compile_vocab()
-            cache.set('vocab_dict', vocab_dict, timeout=CACHE_TIMEOUT)
-            cache.set('vocab_codes', vocab_codes, timeout=CACHE_TIMEOUT)
+        # Get 'vocab_codes' from vocab table (compiled and published if not available)
+        vocab_codes = get_vocab_codes()
 
         # Verify 'vocab_codes' has content, otherwise error
         if not vocab_codes:
@@ -1100,35 +1168,53 @@ def _array_name(ref_des):
 """
 
 
+def _vocab_rows(rds):
+    """ Get {reference designator: (level_one, level_two, level_three, level_four)} from the database, with
+    one query per DB_BATCH_SIZE reference designators. Within a name cycle rows (and missing rows, as None)
+    are memoized.
+    """
+    def load(keys):
+        rows = VocabNames.query.with_entities(VocabNames.reference_designator, VocabNames.level_one,
+                                              VocabNames.level_two, VocabNames.level_three,
+                                              VocabNames.level_four).\
+            filter(VocabNames.reference_designator.in_(keys)).all()
+        return dict((row[0], tuple(row[1:])) for row in rows)
+    return _load_names('vocab', rds, load)
+
+
+def _vocab_name(rd, levels):
+    # Display name of a mooring (level two), platform (level three) or instrument (level four).
+    if levels is None:
+        return None
+    return {8: levels[1], 14: levels[2], 27: levels[3]}.get(len(rd), None)
+
+
+def _vocab_long_name(levels):
+    if levels is None:
+        return None
+    try:
+        return ' - '.join([' '.join([levels[0], levels[1]]), levels[2], levels[3]])
+    except TypeError:
+        return None
+
+
 def _platform_name(ref_des):
-    platform_des = ref_des[:8]
     try:
-        platform = VocabNames.query.with_entities(VocabNames.level_two).\
-            filter_by(reference_designator=platform_des).first()
-        if platform is not None:
-            return platform.level_two
+        return _vocab_name(ref_des[:8], _vocab_rows([ref_des[:8]]).get(ref_des[:8], None))
     except Exception:
         return None
 
 
 def _assembly_name(ref_des):
-    assembly_des = ref_des[:14]
     try:
-        assembly = VocabNames.query.with_entities(VocabNames.level_three).\
-            filter_by(reference_designator=assembly_des).first()
-        if assembly is not None:
-            return assembly.level_three
+        return _vocab_name(ref_des[:14], _vocab_rows([ref_des[:14]]).get(ref_des[:14], None))
     except Exception:
         return None
 
 
 def _instrument_name(ref_des):
-    instrument_des = ref_des[:27]
     try:
-        instrument = VocabNames.query.with_entities(VocabNames.level_four).\
-            filter_by(reference_designator=instrument_des).first()
-        if instrument is not None:
-            return instrument.level_four
+        return _vocab_name(ref_des[:27], _vocab_rows([ref_des[:27]]).get(ref_des[:27], None))
     except Exception:
         return None
 
@@ -1159,11 +1245,7 @@ def _get_long_display_name_by_rd(reference_designator):
     """ Get long display name using database.
     """
     try:
-        display_name = VocabNames.query.filter_by(reference_designator=reference_designator).first()
-        if display_name is not None:
-            tmp = ' '.join([display_name.level_one, display_name.level_two])
-            display_name = ' - '.join([tmp, display_name.level_three, display_name.level_four])
-        return display_name
+        return _vocab_long_name(_vocab_rows([reference_designator]).get(reference_designator, None))
     except Exception:
         return None
 
@@ -1172,34 +1254,129 @@ def get_platform_display_name_by_rd(reference_designator):
     """ Get platform display name using datanase.
     """
     #print '\n -- get_platform_display_name_by_rd: ', reference_designator
-    platform = Platformname.query.filter_by(reference_designator=reference_designator[:14]).first()
-    if platform is None:
-        return None
-
-    platform_display_name = platform.platform
-    return platform_display_name
+    return get_platform_names([reference_designator])[reference_designator]
 
 
 def get_parameter_name_by_parameter(stream_parameter_name):
     """ Get parameter name using database.
     """
-    streamParameter = StreamParameter.query.filter_by(stream_parameter_name = stream_parameter_name).first()
-    if streamParameter is None or streamParameter is []:
-        return None
-
-    stream_display_name = streamParameter.standard_name
-    return stream_display_name
+    return _parameter_names([stream_parameter_name]).get(stream_parameter_name, None)
 
 
 def get_stream_name_by_stream(stream):
     """ Get stream name using database.
     """
-    stream = Stream.query.filter_by(stream=stream).first()
-    if stream is None or stream is []:
-        return None
+    return _stream_names([stream]).get(stream, None)
+
+
+def _parameter_names(names):
+    def load(keys):
+        rows = StreamParameter.query.with_entities(StreamParameter.stream_parameter_name,
+                                                   StreamParameter.standard_name).\
+            filter(StreamParameter.stream_parameter_name.in_(keys)).order_by(StreamParameter.id.desc()).all()
+        return dict(rows)
+    return _load_names('parameter', names, load)
+
+
+def _stream_names(streams):
+    def load(keys):
+        rows = Stream.query.with_entities(Stream.stream, Stream.concatenated_name).\
+            filter(Stream.stream.in_(keys)).order_by(Stream.id.desc()).all()
+        return dict(rows)
+    return _load_names('stream', streams, load)
+
+
+# ========================================================================
+# Batched database lookups
+# ========================================================================
+@contextmanager
+def name_cycle():
+    """ Memoize database name lookups for the duration of a compile cycle (in this thread); nested cycles
+    share the memo of the outermost one.
+    """
+    if getattr(_cycle, 'names', None) is not None:
+        yield
+        return
+    _cycle.names = {}
+    try:
+        yield
+    finally:
+        _cycle.names = None
+
+
+def _load_names(kind, keys, load):
+    """ Return {key: value} for keys using load(keys) (one query per DB_BATCH_SIZE keys; keys not found are
+    left out). Within a name cycle, results are memoized (keys not found as None) and only keys not looked up
+    before in the cycle are loaded.
+    """
+    memo = getattr(_cycle, 'names', None)
+    known = memo.setdefault(kind, {}) if memo is not None else {}
+    pending = [key for key in set(keys) if key and key not in known]
+    found = {}
+    for start in range(0, len(pending), DB_BATCH_SIZE):
+        found.update(load(pending[start:start + DB_BATCH_SIZE]))
+    if memo is not None:
+        for key in pending:
+            known[key] = found.get(key, None)
+        return dict((key, known[key]) for key in keys if known.get(key, None) is not None)
+    return found
+
+
+def prefetch_names(streams=None, parameters=None):
+    """ Load the display names of streams and parameters in batches, for the lookups of the current name
+    cycle. Reference designators are resolved in batches by resolve_names.
+    """
+    if getattr(_cycle, 'names', None) is None:
+        return
+    try:
+        if streams:
+            _stream_names(streams)
+        if parameters:
+            _parameter_names(parameters)
+    except Exception as err:
+        message = 'Unable to prefetch names: %s' % str(err)
+        current_app.logger.info(message)
+
+
+def get_platform_names(rds):
+    """ Get {reference designator: platform display name} (using database) for a list of reference designators.
+    """
+    def load(keys):
+        rows = Platformname.query.with_entities(Platformname.reference_designator, Platformname.platform).\
+            filter(Platformname.reference_designator.in_(keys)).order_by(Platformname.id.desc()).all()
+        return dict(rows)
+    names = _load_names('platform', [rd[:14] for rd in rds], load)
+    return dict((rd, names.get(rd[:14], None)) for rd in rds)
+
+
+def _prefetch_vocab_names(table, rds):
+    """ Resolve display names and long display names of the reference designators (moorings, platforms and
+    instruments) not in the vocabulary with one database query per DB_BATCH_SIZE reference designators.
+    """
+    resolved = table['resolved']
+    pending = []
+    for rd in set(rds):
+        if len(rd) not in (8, 14, 27) or rd in table[VOCAB_LEVELS[len(rd)]]:
+            continue
+        if ('name', rd) not in resolved or ('long_name', rd) not in resolved:
+            pending.append(rd)
+    if not pending:
+        return
+    try:
+        rows = _vocab_rows(pending)
+    except Exception as err:
+        message = 'Unable to load display names: %s' % str(err)
+        current_app.logger.info(message)
+        return
+    for rd in pending:
+        levels = rows.get(rd, None)
+        if ('name', rd) not in resolved:
+            name = _vocab_name(rd, levels)
+            resolved[('name', rd)] = name if name is not None else build_display_name(rd)
+        if ('long_name', rd) not in resolved:
+            long_name = _vocab_long_name(levels)
+            resolved[('long_name', rd)] = long_name if long_name is not None else build_long_display_name(rd)
 
-    stream_display_name = stream.concatenated_name
-    return stream_display_name
 
 # ========================================================================
 # utility functions
@@ -1238,7 +1415,7 @@ def get_vocab_from_uframe():
     try:
         uframe_url, timeout, timeout_read = get_uframe_vocab_info()
         url = uframe_url + '/vocab'
-        response = requests.get(url, timeout=(timeout, timeout_read))
+        response = uframe_client.get(url, timeout=(timeout, timeout_read))
         if response.status_code != 200:
             message = '(%d) Failed to successfully get vocabulary from uframe.' % response.status_code
             raise Exception(message)
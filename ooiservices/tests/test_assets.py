@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+'''
+Tests the asset list responses served from the cached asset list.
+
+'''
+
+import unittest
+from copy import deepcopy
+from ooiservices.app import create_app
+
+ASSETS = [
+    {'id': 1, 'ref_des': 'CE01ISSM', 'coordinates': [44.65833, -124.09583], 'depth': '25', 'tense': 'present',
+     'assetInfo': {'name': 'CE01ISSM', 'longName': 'Endurance OR Inshore Surface Mooring', 'type': 'Mooring'}},
+    {'id': 2, 'ref_des': 'CE01ISSM-MFD35', 'coordinates': [44.65833, -124.09583], 'tense': 'present',
+     'assetInfo': {'name': 'MFD35', 'longName': 'Seafloor Multi-Function Node', 'type': 'Node', 'depth': '25'}},
+    {'id': 3, 'ref_des': 'CE01ISSM-MFD35-04-ADCPTM000', 'coordinates': [44.65833, -124.09583], 'tense': 'past',
+     'assetInfo': {'name': 'ADCPT', 'longName': 'Velocity Profiler (short range)', 'type': 'Sensor'}},
+]
+
+
+class AssetsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import assets
+        self.assets = assets
+        assets.asset_list_cache.set(deepcopy(ASSETS))
+
+    def tearDown(self):
+        self.assets.asset_list_store.delete()
+        self.app_context.pop()
+
+    def get_assets(self, query_string):
+        with self.app.test_request_context('/uframe/assets', query_string=query_string):
+            return self.assets.get_assets(normal_data=True)
+
+    def test_geojson(self):
+        expected = [{'array_id': 'CE', 'display_name': 'Endurance OR Inshore Surface Mooring',
+                     'geo_location': {'coordinates': [44.6583, -124.0958], 'depth': '25'},
+                     'reference_designator': 'CE01ISSM'},
+                    {'array_id': 'CE', 'display_name': 'Seafloor Multi-Function Node',
+                     'geo_location': {'coordinates': [44.6583, -124.0958], 'depth': '25'},
+                     'reference_designator': 'CE01ISSM-MFD35'}]
+        # The cached assets are shared by the requests of a worker; responses do not modify them.
+        self.assertEqual(self.get_assets('geoJSON=true'), expected)
+        self.assertEqual(self.get_assets('geoJSON=true'), expected)
+        self.assertEqual(self.assets.asset_list_store.get(), ASSETS)
+
+    def test_min(self):
+        data = self.get_assets('min=True')
+        self.assertEqual([item['ref_des'] for item in data], [item['ref_des'] for item in ASSETS])
+        self.assertTrue('assetInfo' in data[0])
+        self.assertEqual(self.assets.asset_list_store.get(), ASSETS)
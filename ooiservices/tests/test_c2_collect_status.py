@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+'''
+Tests the concurrent collection of C2 instrument statuses.
+
+'''
+
+import unittest
+import time
+from ooiservices.app import create_app
+
+
+class C2CollectStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app.config.update(C2_STATUS_WORKERS=4, C2_STATUS_TIMEOUT=0.5, UFRAME_TIMEOUT_CONNECT=0,
+                               UFRAME_TIMEOUT_READ=30)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.main import c2
+        self.c2 = c2
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def get_status(self, rd):
+        if rd.startswith('raising'):
+            raise Exception('instrument/api request failed')
+        if rd.startswith('slow'):
+            time.sleep(3)
+        # The read timeout used for instrument/api requests made while collecting.
+        return self.c2.get_uframe_info()[2]
+
+    def test_collect(self):
+        statuses = self.c2.collect_instrument_statuses(['online', 'raising', 'other'], get_status=self.get_status)
+        self.assertEqual(statuses, {'online': 0.5, 'raising': 'Unknown', 'other': 0.5})
+        # The per-instrument deadline does not apply outside the collection.
+        self.assertEqual(self.c2.get_uframe_info()[2], 30)
+        self.assertEqual(self.c2.collect_instrument_statuses([], get_status=self.get_status), {})
+
+    def test_timeout(self):
+        started = time.time()
+        statuses = self.c2.collect_instrument_statuses(['slow', 'online'], get_status=self.get_status,
+                                                       default='Offline')
+        self.assertEqual(statuses, {'slow': 'Offline', 'online': 0.5})
+        # Instruments not answering are abandoned: one round of two requests, each limited to the deadline.
+        self.assertTrue(time.time() - started < 2.5)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''
+Tests the cached, processed instrument driver parameter metadata.
+
+'''
+
+import unittest
+from copy import deepcopy
+from ooiservices.app import create_app, cache
+
+RD = 'RS10ENGC-XX00X-00-FLORDD001'
+
+
+def make_status(state='DRIVER_STATE_COMMAND'):
+    parameters = {
+        'ave': {'description': 'Number of measurements for each reported value.', 'display_name': 'Average',
+                'range': [1, 255], 'value': {'type': 'int'}, 'visibility': 'READ_WRITE'},
+        'opermode': {'description': 'Operation mode.', 'display_name': 'Mode',
+                     'range': {'Continuous': 'Continuous', 'Polled': 'Polled'}, 'value': {'type': 'string'},
+                     'visibility': 'READ_WRITE'},
+        'rat': {'description': 'Baud rate.', 'display_name': 'Baud Rate', 'range': {'9600': 9600, '19200': 19200},
+                'value': {'type': 'int'}, 'visibility': 'READ_ONLY'},
+    }
+    return {'value': {'state': state, 'metadata': {'parameters': parameters, 'commands': {}}}}
+
+
+class C2DriverMetadataTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.main import c2
+        self.c2 = c2
+        cache.delete(c2._driver_metadata_key(RD))
+
+    def tearDown(self):
+        cache.delete(self.c2._driver_metadata_key(RD))
+        self.app_context.pop()
+
+    def test_processed_metadata(self):
+        status = make_status()
+        metadata = self.c2.get_driver_metadata(RD, status)
+        self.assertEqual(metadata['parameter_types'], {'ave': 'int', 'opermode': 'string'})
+        self.assertEqual(metadata['ranges']['ave']['min'], 1)
+        self.assertEqual(metadata['ranges']['opermode']['set'], ['Continuous', 'Polled'])
+        self.assertEqual(metadata['parameter_display_values'], {'opermode': {'Continuous': 'Continuous',
+                                                                             'Polled': 'Polled'}})
+        self.assertEqual(metadata['ro_parameter_display_values'], {'rat': {'9600': 9600, '19200': 19200}})
+        self.assertTrue('state' not in metadata)
+
+        parameter_dict, ranges = self.c2.get_range_dictionary({'ave': 10}, status, RD)
+        self.assertEqual(parameter_dict, metadata['parameter_types'])
+        self.assertEqual(ranges.keys(), ['ave'])
+        self.assertEqual(self.c2.get_driver_metadata(RD, None), None)
+
+    def test_cache(self):
+        status = make_status()
+        key = self.c2._driver_metadata_key(RD)
+        self.c2.get_driver_metadata(RD, status)
+
+        # Unchanged driver metadata is not processed again, whatever the driver state.
+        marked = cache.get(key)
+        marked['parameter_types'] = {'marked': 'int'}
+        cache.set(key, marked)
+        self.assertEqual(self.c2.get_driver_metadata(RD, status)['parameter_types'], {'marked': 'int'})
+        autosample = make_status('DRIVER_STATE_AUTOSAMPLE')
+        self.assertEqual(self.c2.get_driver_metadata(RD, autosample)['parameter_types'], {'marked': 'int'})
+
+        # Changed driver metadata is processed again.
+        changed = deepcopy(status)
+        del changed['value']['metadata']['parameters']['opermode']
+        self.assertEqual(self.c2.get_driver_metadata(RD, changed)['parameter_types'], {'ave': 'int'})
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+'''
+Tests the C2 instrument status store.
+
+'''
+
+import unittest
+import time
+from ooiservices.app import create_app, redis_store
+
+
+def make_entry(rd, status, updated=None):
+    return {'reference_designator': rd, 'operational_status': status, 'ping': status == 'Online',
+            'driver_state': None, 'error': None, 'updated': updated or time.time()}
+
+
+class C2StatusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.main import c2_status
+        self.status = c2_status
+        redis_store.delete(c2_status.STATUS_KEY, c2_status.POLLED_KEY, c2_status.POLL_LOCK_KEY)
+
+    def tearDown(self):
+        redis_store.delete(self.status.STATUS_KEY, self.status.POLLED_KEY, self.status.POLL_LOCK_KEY)
+        self.app_context.pop()
+
+    def test_store(self):
+        online = 'CP02PMCO-WFP01-05-PARADK000'
+        offline = 'CP02PMCO-WFP01-03-CTDPFK000'
+        self.status.store_statuses([make_entry(online, 'Online'), make_entry(offline, 'Offline', time.time() - 600)])
+        self.assertEqual(self.status.get_stored_status(online)['operational_status'], 'Online')
+        self.assertEqual(sorted(self.status.get_stored_reference_designators()), sorted([online, offline]))
+
+        # Entries older than max_age are not returned, nor are instruments without a stored status.
+        statuses = self.status.get_stored_statuses([online, offline, 'unknown'], max_age=300)
+        self.assertEqual(statuses[online]['ping'], True)
+        self.assertEqual(statuses[offline], None)
+        self.assertEqual(statuses['unknown'], None)
+
+        self.status.store_statuses([make_entry(offline, 'Unknown')], remove=[online])
+        self.assertEqual(self.status.get_stored_status(online), None)
+        self.assertEqual(self.status.get_stored_status(offline, max_age=300)['operational_status'], 'Unknown')
+
+    def test_poll(self):
+        token = self.status.start_poll(60)
+        self.assertNotEqual(token, None)
+        # A poll is in progress.
+        self.assertEqual(self.status.start_poll(60, force=True), None)
+        self.status.finish_poll(token)
+        # A poll completed within the interval.
+        self.assertEqual(self.status.start_poll(60), None)
+        token = self.status.start_poll(60, force=True)
+        self.assertNotEqual(token, None)
+        self.status.finish_poll(token, completed=False)
+        token = self.status.start_poll(0)
+        self.assertNotEqual(token, None)
+        self.status.finish_poll(token)
+
+    def test_abandoned_poll(self):
+        token = self.status.start_poll(60)
+        # The lock of an abandoned poll expired and was taken by another poll.
+        redis_store.delete(self.status.POLL_LOCK_KEY)
+        other = self.status.start_poll(60, force=True)
+        self.status.finish_poll(token, completed=False)
+        self.assertEqual(redis_store.get(self.status.POLL_LOCK_KEY), other)
+        self.status.finish_poll(other)
+        self.assertEqual(redis_store.get(self.status.POLL_LOCK_KEY), None)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+'''
+Tests the index of the C2 toc and the platform and instrument lookups using it.
+
+'''
+
+import unittest
+from ooiservices.app import create_app
+
+
+def make_toc():
+    platforms = []
+    instruments = []
+    for platform in ['CE02SHBP-LJ01D', 'RS01SBPS-PC01A', 'RS01SBPS-SF01A']:
+        mooring, platform_code = platform.split('-')
+        platforms.append({'reference_designator': platform, 'mooring_code': mooring,
+                          'platform_code': platform_code, 'display_name': platform})
+        for n in range(3):
+            rd = '%s-%02d-CTDBPC%03d' % (platform, n, n)
+            instruments.append({'reference_designator': rd, 'mooring_code': mooring, 'platform_code': platform_code,
+                                'instrument_code': rd[15:], 'display_name': rd})
+    return {'arrays': [], 'moorings': [], 'platforms': platforms, 'instruments': instruments}
+
+
+class C2TocTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.main import c2
+        self.c2 = c2
+        self.toc = make_toc()
+        self.toc['index'] = self.c2.index_c2_toc(self.toc)
+        self.c2.c2_toc_cache.set(self.toc)
+
+    def tearDown(self):
+        self.c2.c2_toc_store.delete()
+        self.app_context.pop()
+
+    def test_index(self):
+        index = self.toc['index']
+        self.assertEqual(index['platforms']['RS01SBPS-SF01A'], 2)
+        self.assertEqual(index['instruments']['RS01SBPS-PC01A-01-CTDBPC001'], 4)
+        self.assertEqual(index['array_platforms'], {'CE': [0], 'RS': [1, 2]})
+        self.assertEqual(index['platform_instruments']['RS01SBPS-SF01A'], [6, 7, 8])
+
+    def test_lookups(self):
+        self.assertEqual([item['reference_designator'] for item in self.c2._get_platforms('RS')],
+                         ['RS01SBPS-PC01A', 'RS01SBPS-SF01A'])
+        self.assertEqual(self.c2._get_platforms('CP'), [])
+        self.assertEqual(self.c2._get_platform('CE02SHBP-LJ01D'), self.toc['platforms'][0])
+        self.assertEqual(self.c2._get_platform('CE02SHBP-LJ01X'), None)
+        self.assertEqual(self.c2._get_instrument('RS01SBPS-SF01A-02-CTDBPC002'), self.toc['instruments'][8])
+        self.assertEqual(self.c2._get_instrument('RS01SBPS-SF01A-02-CTDBPC009'), None)
+
+        instruments, oinstruments = self.c2._get_instruments('RS01SBPS-PC01A')
+        self.assertEqual(instruments, self.toc['instruments'][3:6])
+        self.assertEqual(oinstruments, [item['reference_designator'] for item in self.toc['instruments'][3:6]])
+        # Reference designators other than platforms are matched against the instruments.
+        self.assertEqual(len(self.c2._get_instruments('RS01SBPS')[1]), 6)
+
+        # Tocs cached without an index are indexed when read.
+        del self.toc['index']
+        self.c2.c2_toc_cache.set(self.toc)
+        self.assertEqual(self.c2._get_platform('RS01SBPS-PC01A'), self.toc['platforms'][1])
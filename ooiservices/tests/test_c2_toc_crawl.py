@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''
+Tests the crawl of the uframe data hierarchy compiling the C2 toc.
+
+'''
+
+import unittest
+from ooiservices.app import create_app
+
+# uframe data hierarchy: moorings, platforms of each mooring, instruments of each platform.
+HIERARCHY = {
+    '': ['CE01ISSM', 'CE02SHBP', 'RS01SBPS'],
+    'CE01ISSM': ['MFD35', 'SBD17'],
+    'RS01SBPS': ['PC01A'],
+    'CE01ISSM/MFD35': ['04-ADCPTM000', 'malformed'],
+    'CE01ISSM/SBD17': ['06-CTDBPC000', '01-FLORTD000'],
+    'RS01SBPS/PC01A': ['4A-CTDPFA103'],
+}
+
+
+class StubResponse(object):
+    def __init__(self, data, status_code):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class StubClient(object):
+    """ Answers uframe requests from HIERARCHY; CE02SHBP (not in HIERARCHY) fails.
+    """
+    def __init__(self, base):
+        self.base = base
+
+    def get(self, url, timeout=None):
+        path = url[len(self.base):].strip('/')
+        if path not in HIERARCHY:
+            return StubResponse({'message': 'Not found'}, 404)
+        return StubResponse(HIERARCHY[path], 200)
+
+
+class StubArray(object):
+    class query(object):
+        @staticmethod
+        def all():
+            return []
+
+
+class C2TocCrawlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.main import c2
+        self.c2 = c2
+        base = self.app.config['UFRAME_INST_URL'].replace('12572', '12576') + self.app.config['UFRAME_URL_BASE']
+        stubs = {'uframe_client': StubClient(base), 'Array': StubArray,
+                 '_instrument_has_streams': lambda rd: rd != 'CE01ISSM-SBD17-01-FLORTD000',
+                 'resolve_names': lambda rds: dict((rd, {'name': 'name ' + rd, 'long_name': 'long name ' + rd})
+                                                   for rd in rds)}
+        self.saved = dict((name, getattr(c2, name)) for name in stubs)
+        for name, stub in stubs.items():
+            setattr(c2, name, stub)
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(self.c2, name, value)
+        self.app_context.pop()
+
+    def test_crawl(self):
+        toc = self.c2._compile_c2_toc_standard()
+        self.assertEqual([item['reference_designator'] for item in toc['moorings']],
+                         ['CE01ISSM', 'CE02SHBP', 'RS01SBPS'])
+        # The platforms of the failing mooring are dropped, the rest of the hierarchy is kept.
+        self.assertEqual([item['reference_designator'] for item in toc['platforms']],
+                         ['CE01ISSM-MFD35', 'CE01ISSM-SBD17', 'RS01SBPS-PC01A'])
+        self.assertEqual(toc['platforms'][2]['display_name'], 'long name RS01SBPS-PC01A')
+        # Malformed instruments and instruments without streams are skipped.
+        self.assertEqual([item['reference_designator'] for item in toc['instruments']],
+                         ['CE01ISSM-MFD35-04-ADCPTM000', 'CE01ISSM-SBD17-06-CTDBPC000',
+                          'RS01SBPS-PC01A-4A-CTDPFA103'])
+        self.assertEqual(toc['instruments'][1]['instrument_code'], '06-CTDBPC000')
+        self.assertEqual(toc['index']['platform_instruments']['CE01ISSM-SBD17'], [1])
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+'''
+Tests cached values served stale while they are rebuilt.
+
+'''
+
+import unittest
+import threading
+import time
+from ooiservices.app import create_app, cache, redis_store
+from ooiservices.app.cache_tools import RefreshingValue, cache_metrics, new_version
+
+
+class RefreshingValueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.builds = []
+        self.key = 'test_refreshing_value_%s' % new_version()
+        # Short lock and wait timeouts, so a lock which is never taken fails the tests instead of hanging them.
+        self.value = RefreshingValue(self.key, self.build, soft_timeout=60, timeout=600, lock_timeout=5,
+                                     wait_timeout=5)
+
+    def tearDown(self):
+        for key in [self.key, self.value.built_key]:
+            cache.delete(key)
+        redis_store.delete(self.value.lock_key)
+        self.app_context.pop()
+
+    def build(self):
+        time.sleep(0.2)
+        self.builds.append(threading.current_thread().name)
+        value = ['build %d' % len(self.builds)]
+        self.value.set(value)
+        return value
+
+    def test_miss_single_flight(self):
+        results = []
+
+        def get():
+            with self.app.app_context():
+                results.append(self.value.get())
+
+        threads = [threading.Thread(target=get) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(results, [['build 1']] * 5)
+        metrics = cache_metrics()[self.key]
+        self.assertEqual(metrics['misses'], 5)
+        self.assertEqual(metrics['rebuilds'], 1)
+        self.assertEqual(metrics['waits'], 4)
+        self.assertEqual(redis_store.get(self.value.lock_key), None)
+
+    def test_stale_while_revalidate(self):
+        self.assertEqual(self.value.get(), ['build 1'])
+        self.assertEqual(self.value.get(), ['build 1'])
+        self.assertEqual(cache_metrics()[self.key]['hits'], 1)
+
+        # Stale: the previous value is served while it is rebuilt in the background.
+        cache.set(self.value.built_key, time.time() - 120)
+        self.assertEqual(self.value.get(), ['build 1'])
+        self.assertEqual(self.value.get(), ['build 1'])
+        time.sleep(0.5)
+        self.assertEqual(self.value.get(), ['build 2'])
+        self.assertEqual(len(self.builds), 2)
+        metrics = cache_metrics()[self.key]
+        self.assertEqual(metrics['stale_hits'], 2)
+        self.assertEqual(metrics['background_rebuilds'], 1)
+
+    def test_build_error(self):
+        def fail():
+            raise Exception('uframe unavailable')
+        value = RefreshingValue(self.key, fail, soft_timeout=60, timeout=600, lock_timeout=5, wait_timeout=5)
+        with self.assertRaises(Exception):
+            value.get()
+        self.assertEqual(cache_metrics()[self.key]['rebuild_errors'], 1)
+        self.assertEqual(redis_store.get(value.lock_key), None)
+
+    def test_empty_value_is_a_hit(self):
+        value = RefreshingValue(self.key, lambda: self.fail('rebuilt'), soft_timeout=60, timeout=600,
+                                lock_timeout=5, wait_timeout=5)
+        value.set([])
+        self.assertEqual(value.get(), [])
+        self.assertEqual(cache_metrics()[self.key]['hits'], 1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+'''
+Tests bounded concurrent execution of blocking requests.
+
+'''
+
+import unittest
+import threading
+import time
+from flask import request, current_app
+from ooiservices.app import create_app
+
+
+class ConcurrencyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.concurrency import run_concurrently, run_in_background
+        self.run_concurrently = run_concurrently
+        self.run_in_background = run_in_background
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_order(self):
+        # Items completing in reverse order are returned in item order.
+        def work(item):
+            time.sleep(0.01 * (5 - item))
+            return item * 10
+        results = self.run_concurrently(work, range(5), max_workers=5)
+        self.assertEqual(results, [(0, None), (10, None), (20, None), (30, None), (40, None)])
+        self.assertEqual(self.run_concurrently(work, []), [])
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+        self.run_concurrently(work, range(8), max_workers=3)
+        self.assertTrue(running[1] <= 3)
+
+    def test_errors(self):
+        def work(item):
+            if item == 'bad':
+                raise Exception('uframe request failed')
+            return item.upper()
+        results = self.run_concurrently(work, ['a', 'bad', 'c'])
+        self.assertEqual(results, [('A', None), (None, 'uframe request failed'), ('C', None)])
+
+    def test_timeout(self):
+        def work(item):
+            if item == 'slow':
+                time.sleep(2)
+            return item
+        started = time.time()
+        results = self.run_concurrently(work, ['slow', 'fast'], max_workers=2, timeout=0.2)
+        self.assertTrue(time.time() - started < 1)
+        self.assertEqual(results, [(None, 'Timed out after 0.2 seconds.'), ('fast', None)])
+
+    def test_context(self):
+        # Work runs in an application context of the same app, with a copy of the request arguments.
+        def work(item):
+            return current_app.name, request.path, request.args.get('startdate'), item
+        with self.app.test_request_context('/uframe/get_data', query_string='startdate=2015-01-01'):
+            results = self.run_concurrently(work, [1, 2], max_workers=2)
+        self.assertEqual(results, [((self.app.name, '/uframe/get_data', '2015-01-01', 1), None),
+                                   ((self.app.name, '/uframe/get_data', '2015-01-01', 2), None)])
+
+        results = self.run_concurrently(lambda item: current_app.name, [1])
+        self.assertEqual(results, [(self.app.name, None)])
+
+    def test_background(self):
+        done = threading.Event()
+        seen = []
+
+        def work(value):
+            seen.append((value, request.args.get('startdate')))
+            done.set()
+        with self.app.test_request_context('/uframe/get_data', query_string='startdate=2015-01-01'):
+            self.run_in_background(work, 'value')
+        self.assertTrue(done.wait(5))
+        self.assertEqual(seen, [('value', '2015-01-01')])
+
+        # Failures are logged, not raised.
+        failed = threading.Event()
+
+        def fail():
+            failed.set()
+            raise Exception('failed')
+        self.run_in_background(fail)
+        self.assertTrue(failed.wait(5))
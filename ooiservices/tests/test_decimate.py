@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+'''
+Tests server side decimation of timeseries plot data.
+
+'''
+
+import unittest
+from collections import OrderedDict
+import numpy as np
+from ooiservices.app import create_app
+
+
+class DecimateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe.decimate import minmax_indices, lttb_indices, decimate_frame
+        from ooiservices.app.uframe.particles import ParticleFrame
+        self.minmax_indices = minmax_indices
+        self.lttb_indices = lttb_indices
+        self.decimate_frame = decimate_frame
+        self.ParticleFrame = ParticleFrame
+        self.x = np.arange(100000, dtype=float)
+        self.y = np.sin(self.x / 1000.0)
+        # A single sample spike which blind subsampling would usually miss.
+        self.y[54321] = 25.0
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_minmax_keeps_spike(self):
+        indices = self.minmax_indices(self.x, self.y, 1000)
+        self.assertTrue(len(indices) <= 1000)
+        self.assertTrue(54321 in indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_minmax_ignores_nan(self):
+        self.y[10] = np.nan
+        indices = self.minmax_indices(self.x, self.y, 1000)
+        self.assertFalse(10 in indices)
+
+    def test_lttb(self):
+        indices = self.lttb_indices(self.x, self.y, 2000)
+        self.assertEqual(len(indices), 2000)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], len(self.x) - 1)
+        self.assertTrue(54321 in indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_small_input_unchanged(self):
+        indices = self.lttb_indices(self.x[:50], self.y[:50], 2000)
+        self.assertEqual(indices.tolist(), list(range(50)))
+
+    def test_decimate_frame(self):
+        columns = OrderedDict([('temperature', self.y)])
+        qaqc = OrderedDict([('temperature', np.zeros(len(self.x), dtype=np.int64))])
+        frame = self.ParticleFrame(self.x, np.array(['stream'] * len(self.x), dtype=object), columns, qaqc)
+        result = self.decimate_frame(frame, 'minmax', 500, ['temperature'])
+        self.assertTrue(len(result) <= 500)
+        self.assertEqual(result.received, len(self.x))
+        self.assertEqual(result.column('temperature').max(), 25.0)
+        with self.assertRaises(ValueError):
+            self.decimate_frame(frame, 'average', 500, ['temperature'])
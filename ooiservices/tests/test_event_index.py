@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+'''
+Tests the index of uframe events by reference designator.
+
+'''
+
+import unittest
+from ooiservices.app import create_app
+
+
+def make_event(event_id, event_class, ref_des, tense, start_date, deployment_number=None):
+    subsite, node, sensor = ref_des.split('-', 2)
+    event = {'id': event_id,
+             'eventClass': event_class,
+             'referenceDesignator': {'full': True, 'subsite': subsite, 'node': node, 'sensor': sensor},
+             'asset': {'metaData': []},
+             'tense': tense,
+             'startDate': start_date,
+             'endDate': None,
+             'eventDescription': None,
+             'eventType': 'Location',
+             'notes': None}
+    if event_class == '.DeploymentEvent':
+        event.update({'cruiseNumber': 'KN-217', 'cruisePlanDocument': None, 'depth': 148.0,
+                      'locationLonLat': [-70.88, 40.1], 'deploymentNumber': deployment_number})
+    return event
+
+
+class EventIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import event_index
+        self.event_index = event_index
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_build_event_index(self):
+        rd = 'CP02PMCO-WFP01-05-PARADK000'
+        data = [make_event(1, '.DeploymentEvent', rd, 'PAST', 1366000000000, 1),
+                make_event(2, '.DeploymentEvent', rd, 'PRESENT', 1397410140000, 2),
+                make_event(3, '.CalibrationEvent', rd, 'PRESENT', 1397410140000),
+                make_event(4, '.DeploymentEvent', 'CE01ISSM-MFD35-04-ADCPTM000', 'PAST', 1397410140000, 1),
+                {'id': 5, 'eventClass': '.DeploymentEvent', 'asset': {'metaData': None}}]
+        index = self.event_index.build_event_index(data)
+
+        self.assertEqual([event['id'] for event in index['events'][rd]], [1, 2, 3])
+        self.assertEqual(index['events'][rd][1]['start_date'], 'April 13 2014, 05:29:00 PM')
+        self.assertEqual(index['deployments'][rd]['deployment_number'], 2)
+        self.assertEqual(index['deployments'][rd]['lat_lon'], [-70.88, 40.1])
+        self.assertNotIn('CE01ISSM-MFD35-04-ADCPTM000', index['deployments'])
+        self.assertEqual(len(index['events']['CE01ISSM-MFD35-04-ADCPTM000']), 1)
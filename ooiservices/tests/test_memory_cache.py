@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+'''
+Tests the per-process memory cache in front of redis and its use by sharded values.
+
+'''
+
+import unittest
+import time
+from operator import itemgetter
+from ooiservices.app import create_app, cache
+from ooiservices.app.memory_cache import MemoryCache, memory_cache, on_invalidate, _invalidate_local
+from ooiservices.app.sharded_cache import ShardedValue, decode_sized, MANIFEST_SIZE
+
+
+class MemoryCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.store = ShardedValue('test_memory_cache_streams', timeout=600, group=itemgetter('reference_designator'),
+                                  shard_size=10)
+
+    def tearDown(self):
+        self.store.delete()
+        memory_cache.clear()
+        self.app_context.pop()
+
+    def test_lru_by_bytes(self):
+        local = MemoryCache(max_bytes=100)
+        local.set('a', 'value a', 40)
+        local.set('b', 'value b', 40)
+        self.assertEqual(local.get('a'), 'value a')
+        local.set('c', 'value c', 40)
+        # 'b' is the least recently used entry.
+        self.assertEqual(local.get('b'), None)
+        self.assertEqual(local.get('a'), 'value a')
+        self.assertEqual(local.get('c'), 'value c')
+        local.set('d', 'too large', 101)
+        self.assertEqual(local.get('d'), None)
+        stats = local.stats()
+        self.assertEqual(stats['bytes'], 80)
+        self.assertEqual(stats['evictions'], 1)
+
+        self.app.config['L1_CACHE_MAX_AGE'] = 0.1
+        local.set('e', 'volatile', 10, volatile=True)
+        self.assertEqual(local.get('e'), 'volatile')
+        time.sleep(0.2)
+        self.assertEqual(local.get('e'), None)
+
+    def test_invalidate(self):
+        calls = []
+        on_invalidate('test_memory_cache_key', lambda: calls.append(1))
+        memory_cache.set('test_memory_cache_key', 'value', 10, volatile=True)
+        _invalidate_local('test_memory_cache_key')
+        self.assertEqual(memory_cache.get('test_memory_cache_key'), None)
+        self.assertEqual(calls, [1])
+
+    def test_sharded_value_served_from_memory(self):
+        streams = [{'reference_designator': 'CE01ISSM-MFD35-04-ADCPTM%03d' % (i % 7), 'stream': 'stream %d' % i}
+                   for i in range(45)]
+        rd = streams[3]['reference_designator']
+        group = [item for item in streams if item['reference_designator'] == rd]
+        self.store.set(streams)
+        self.assertEqual(self.store.get(), streams)
+        self.assertEqual(self.store.get_group(rd), group)
+
+        # Shards, group index and manifest are now read from memory, without redis.
+        manifest = cache.get(self.store.key)
+        cache.delete_many(*self.store._shard_keys(manifest))
+        self.assertEqual(self.store.get(), streams)
+        self.assertEqual(self.store.page(12, 5), (streams[12:17], 45))
+        self.assertEqual(self.store.get_group(rd), group)
+
+        # A replaced value is read once its manifest is invalidated (through pub/sub in other processes).
+        other = ShardedValue(self.store.key, timeout=600, shard_size=10)
+        other.set(streams[:5])
+        self.assertEqual(self.store.get(), streams[:5])
+
+        # An out of date manifest in memory, whose shards were removed, is dropped and read again.
+        memory_cache.clear()
+        memory_cache.set(self.store.key, manifest, 256, volatile=True)
+        self.assertEqual(self.store.get(), streams[:5])
+
+    def test_decoded_size(self):
+        streams = [{'reference_designator': 'CE01ISSM-MFD35-04-ADCPTM%03d' % (i % 7), 'stream': 'stream %d' % i,
+                    'parameters': ['parameter_%d' % n for n in range(20)]} for i in range(45)]
+        self.store.set(streams)
+        memory_cache.clear()
+        self.store.get()
+
+        # Shards are charged at the estimated size of their decoded items, not their compressed size.
+        shards = cache.get_many(*self.store._shard_keys(cache.get(self.store.key))[:-1])
+        decoded = sum([decode_sized(data)[1] for data in shards])
+        self.assertEqual(memory_cache.stats()['bytes'], MANIFEST_SIZE + decoded)
+        self.assertTrue(decoded > 10 * sum([len(data) for data in shards]))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+'''
+Tests the parameter metadata index built from the uframe toc.
+
+'''
+
+import unittest
+from ooiservices.app import create_app
+
+
+class ParameterIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe.parameter_index import build_parameter_index
+        self.build_parameter_index = build_parameter_index
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_build_parameter_index(self):
+        toc = [{'reference_designator': 'CP02PMCO-SBS01-00-RTE000000',
+                'instrument_parameters': [
+                    {'fillValue': '-9999999', 'particleKey': 'time', 'pdId': 'PD7', 'shape': 'SCALAR',
+                     'stream': 'rte_o_dcl_instrument_recovered', 'type': 'DOUBLE',
+                     'units': 'seconds since 1900-01-01', 'unsigned': False},
+                    {'fillValue': '-9999999', 'particleKey': 'time', 'pdId': 'PD7', 'shape': 'SCALAR',
+                     'stream': 'rte_o_dcl_instrument', 'type': 'DOUBLE',
+                     'units': 'seconds since 1900-01-01', 'unsigned': False},
+                    {'fillValue': '-9999999', 'particleKey': 'rte_current', 'pdId': 'PD1180', 'shape': 'SCALAR',
+                     'stream': 'rte_o_dcl_instrument_recovered', 'type': 'FLOAT', 'units': 'mA', 'unsigned': False}]},
+               {'reference_designator': 'CE01ISSM-MFD35-00-DCLENG000', 'instrument_parameters': []}]
+        index = self.build_parameter_index(toc)
+        self.assertEqual(sorted(index.keys()), ['CE01ISSM-MFD35-00-DCLENG000', 'CP02PMCO-SBS01-00-RTE000000'])
+        parameters = index['CP02PMCO-SBS01-00-RTE000000']
+        self.assertEqual(parameters['rte_current']['pdId'], 'PD1180')
+        self.assertEqual(parameters['rte_current']['units'], 'mA')
+        self.assertEqual(parameters['time']['stream'], 'rte_o_dcl_instrument_recovered')
+        self.assertEqual(index['CE01ISSM-MFD35-00-DCLENG000'], {})
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+'''
+Tests incremental decoding of uframe particle responses.
+
+'''
+
+import unittest
+import json
+import numpy as np
+from ooiservices.app import create_app
+
+
+def split_chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class ParticleStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe.particles import iter_particles, ParticleStreamError
+        self.iter_particles = iter_particles
+        self.ParticleStreamError = ParticleStreamError
+        self.particles = [{'pk': {'time': 3600000000.0 + i, 'stream': 'ctdbp_cdef_instrument'},
+                           'temperature': 10.5 + i, 'name': u'd\xe9bit %d' % i} for i in range(50)]
+        self.body = json.dumps(self.particles, indent=1, ensure_ascii=False).encode('utf-8')
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_decode_any_chunk_size(self):
+        for size in [1, 7, 64, 1024 * 32]:
+            result = list(self.iter_particles(split_chunks(self.body, size)))
+            self.assertEqual(result, self.particles)
+
+    def test_empty_array(self):
+        self.assertEqual(list(self.iter_particles([b'[', b' ]'])), [])
+
+    def test_missing_closing_bracket(self):
+        body = self.body.rstrip()[:-1]
+        result = list(self.iter_particles(split_chunks(body, 100)))
+        self.assertEqual(result, self.particles)
+
+    def test_particle_limit(self):
+        particles = self.iter_particles(split_chunks(self.body, 100), max_particles=10)
+        received = []
+        with self.assertRaises(self.ParticleStreamError):
+            for particle in particles:
+                received.append(particle)
+        self.assertEqual(len(received), 10)
+
+    def test_byte_limit(self):
+        with self.assertRaises(self.ParticleStreamError):
+            list(self.iter_particles(split_chunks(self.body, 100), max_bytes=500))
+
+    def test_error_response(self):
+        body = b'{"message": "Failed", "requestUUID": "abc-123"}'
+        try:
+            list(self.iter_particles(split_chunks(body, 8)))
+            self.fail('ParticleStreamError not raised')
+        except self.ParticleStreamError as err:
+            self.assertTrue('requestUUID' in err.body)
+
+    def test_malformed_response(self):
+        with self.assertRaises(self.ParticleStreamError):
+            list(self.iter_particles([b'[{"a": 1}, {"b": ']))
+
+
+class ParticleFrameTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe.particles import ParticleFrame
+        self.ParticleFrame = ParticleFrame
+        self.particles = []
+        for i in range(10):
+            particle = {'pk': {'time': 3600000000.0 + i, 'stream': 'ctdbp_cdef_instrument'},
+                        'temperature': 10.0 + i, 'pressure': None if i == 3 else i,
+                        'temperature_qc_results': i % 2}
+            self.particles.append(particle)
+        self.particles.append({'pk': {'time': 3600000100.0, 'stream': 'other_stream'},
+                               'temperature': 99.0, 'pressure': 1})
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_columns(self):
+        frame = self.ParticleFrame.from_particles(iter(self.particles), ['time', 'temperature', 'pressure'],
+                                                  stream='ctdbp_cdef_instrument')
+        self.assertEqual(len(frame), 10)
+        self.assertEqual(frame.received, 11)
+        self.assertEqual(frame.time.dtype, np.float64)
+        self.assertEqual(list(frame.columns.keys()), ['temperature', 'pressure'])
+        self.assertTrue(np.isnan(frame.column('pressure')[3]))
+        self.assertEqual(frame.qc('temperature').tolist(), [0, 1] * 5)
+        self.assertEqual(frame.qc('pressure').tolist(), [0] * 10)
+
+    def test_check_first_particle(self):
+        def check(particle):
+            raise Exception('invalid')
+        with self.assertRaises(Exception):
+            self.ParticleFrame.from_particles(self.particles, ['temperature'], check=check)
+
+    def test_take_and_records(self):
+        frame = self.ParticleFrame.from_particles(self.particles, ['temperature'])
+        subset = frame.take(frame.column('temperature') > 15)
+        self.assertEqual(len(subset), 5)
+        records = subset.to_records()
+        self.assertEqual(records[-1], {'pk': {'time': 3600000100.0, 'stream': 'other_stream'}, 'temperature': 99.0})
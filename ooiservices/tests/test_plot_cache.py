@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+'''
+Tests the keys and timeouts of the rendered plot cache.
+
+'''
+
+import unittest
+from datetime import datetime, timedelta
+from ooiservices.app import create_app
+
+INSTRUMENT = 'CE01ISSM-MFD35-04-ADCPTM000'
+STREAM = 'telemetered_adcp_velocity_earth'
+
+
+class PlotCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app.config.update(PLOT_CACHE_TIMEOUT_HISTORICAL=604800, PLOT_CACHE_TIMEOUT_RECENT=300)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import plot_cache
+        from ooiservices.app.uframe.event_index import event_index
+        self.plot_cache = plot_cache
+        self.event_index = event_index
+
+    def tearDown(self):
+        self.event_index.clear()
+        self.app_context.pop()
+
+    def key(self, query_string, instrument=INSTRUMENT, stream=STREAM):
+        with self.app.test_request_context('/uframe/plot/%s/%s' % (instrument, stream), query_string=query_string):
+            return self.plot_cache.plot_cache_key(instrument, stream)
+
+    def test_key_normalization(self):
+        key = self.key('yvar=eastward_seawater_velocity&startdate=2015-01-01T00:00:00.000Z'
+                       '&enddate=2015-02-01T00:00:00.000Z')
+        self.assertTrue(key.startswith('plot_'))
+        # Argument order, default values and equivalent date formats give the same key.
+        self.assertEqual(key, self.key('enddate=2015-02-01T00:00:00Z&yvar=eastward_seawater_velocity'
+                                       '&format=svg&xvar=time&startdate=2015-01-01 00:00:00+00:00'))
+        self.assertEqual(key, self.key('yvar=eastward_seawater_velocity&startdate=2015-01-01T00:00:00.000Z'
+                                       '&enddate=2015-02-01T00:00:00.000Z&event=true&height=100.0'))
+        self.assertEqual(key, self.key('yvar= eastward_seawater_velocity&startdate=2014-12-31T19:00:00-05:00'
+                                       '&enddate=2015-02-01T00:00:00.000Z&dpa_flag=0'))
+
+        # Other plots have other keys.
+        self.assertNotEqual(key, self.key('yvar=northward_seawater_velocity&startdate=2015-01-01T00:00:00.000Z'
+                                          '&enddate=2015-02-01T00:00:00.000Z'))
+        self.assertNotEqual(key, self.key('yvar=eastward_seawater_velocity&startdate=2015-01-01T00:00:00.000Z'
+                                          '&enddate=2015-02-01T00:00:01.000Z'))
+        self.assertNotEqual(key, self.key('yvar=eastward_seawater_velocity&startdate=2015-01-01T00:00:00.000Z'
+                                          '&enddate=2015-02-01T00:00:00.000Z', instrument=INSTRUMENT[:-1] + '1'))
+
+    def test_key_event_version(self):
+        with_events = 'yvar=eastward_seawater_velocity&startdate=2015-01-01&enddate=2015-02-01'
+        without_events = with_events + '&event=false'
+        key, no_events_key = self.key(with_events), self.key(without_events)
+        # Publishing a new event index changes the key of plots showing events only.
+        self.event_index.publish({'events': {}, 'deployments': {}})
+        self.assertNotEqual(key, self.key(with_events))
+        self.assertEqual(no_events_key, self.key(without_events))
+        key = self.key(with_events)
+        self.assertEqual(key, self.key(with_events))
+        self.event_index.publish({'events': {}, 'deployments': {}})
+        self.assertNotEqual(key, self.key(with_events))
+
+    def test_timeout(self):
+        past = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        future = (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        self.assertEqual(self.plot_cache.plot_cache_timeout(past), 604800)
+        self.assertEqual(self.plot_cache.plot_cache_timeout('2015-02-01 00:00:00'), 604800)
+        self.assertEqual(self.plot_cache.plot_cache_timeout(future), 300)
+        # Windows with an end which cannot be parsed are treated as recent.
+        self.assertEqual(self.plot_cache.plot_cache_timeout('not a date'), 300)
+        self.assertEqual(self.plot_cache.plot_cache_timeout(None), 300)
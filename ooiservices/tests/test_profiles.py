@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+'''
+Tests profile segmentation of profiler and glider data.
+
+'''
+
+import unittest
+from unittest import skipIf
+import os
+import time
+import numpy as np
+from ooiservices.app import create_app
+
+
+def make_profiler_data(n, period=2000.0, max_depth=200.0, sample_interval=1.0):
+    """ Synthetic profiler data: a triangle wave in depth, sampled every sample_interval seconds.
+    """
+    t = 3600000000.0 + np.arange(n) * sample_interval
+    phase = np.mod(t - t[0], period) / period
+    depth = max_depth * (1.0 - np.abs(2.0 * phase - 1.0))
+    return t, depth
+
+
+class ProfileSegmenterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe.profiles import ProfileSegmenter
+        self.ProfileSegmenter = ProfileSegmenter
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_profiles_found(self):
+        t, depth = make_profiler_data(20000)
+        ids = self.ProfileSegmenter().segment(t, depth)
+        self.assertEqual(len(ids), len(t))
+        # One profile per half period, excluding the partial first and last segments.
+        profiles = np.unique(ids[ids >= 0])
+        self.assertTrue(len(profiles) >= 17)
+        self.assertEqual(profiles.tolist(), list(range(len(profiles))))
+        # Profile ids never decrease with time.
+        self.assertTrue(np.all(np.diff(ids[ids >= 0]) >= 0))
+
+    def test_unsorted_input_and_duplicate_times(self):
+        t, depth = make_profiler_data(10000)
+        ids = self.ProfileSegmenter().segment(t, depth)
+
+        t2 = np.concatenate((t, t[::97]))
+        depth2 = np.concatenate((depth, depth[::97]))
+        shuffle = np.random.RandomState(1).permutation(len(t2))
+        ids2 = self.ProfileSegmenter().segment(t2[shuffle], depth2[shuffle])
+
+        restored = np.empty_like(ids2)
+        restored[shuffle] = ids2
+        self.assertEqual(restored[:len(t)].tolist(), ids.tolist())
+        self.assertEqual(restored[len(t):].tolist(), ids[::97].tolist())
+
+    def test_no_profiles(self):
+        t = np.arange(1000, dtype=float)
+        with self.assertRaises(ValueError):
+            self.ProfileSegmenter().segment(t, np.ones(1000))
+
+    @skipIf(not os.getenv('OOI_BENCHMARKS'), 'Benchmarks run only when OOI_BENCHMARKS is set.')
+    def test_linear_scaling(self):
+        """ Benchmark: segmenting 4x the particles should take roughly 4x as long, not 16x.
+        """
+        timings = {}
+        for n in [100000, 400000]:
+            t, depth = make_profiler_data(n)
+            segmenter = self.ProfileSegmenter()
+            best = None
+            for i in range(3):
+                t0 = time.time()
+                segmenter.segment(t, depth)
+                elapsed = time.time() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            timings[n] = best
+        self.assertTrue(timings[400000] < 8 * max(timings[100000], 0.001),
+                        'profile segmentation does not scale linearly: %r' % timings)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+'''
+Tests storage of large cached values in shards and the size of the shard encodings (decode times are
+benchmarked when OOI_BENCHMARKS is set).
+
+'''
+
+import unittest
+from unittest import skipIf
+import os
+import cPickle as pickle
+import time
+from operator import itemgetter
+from ooiservices.app import create_app, cache
+from ooiservices.app.sharded_cache import ShardedValue, encode, decode, msgpack
+
+
+def make_streams(count):
+    """ Synthetic stream list entries, the size of the compiled stream list entries.
+    """
+    streams = []
+    for i in range(count):
+        rd = 'CE%02dISSM-MFD%02d-%02d-CTDBPC%03d' % (i % 10, i % 37, i % 13, i % 1000)
+        parameters = ['parameter_%d' % n for n in range(40)]
+        streams.append({'reference_designator': rd,
+                        'stream_name': 'telemetered_ctdbp-cdef-dcl-instrument',
+                        'start': '2014-01-01T00:00:00.000Z',
+                        'end': '2016-01-01T00:00:00.000Z',
+                        'array_name': 'Endurance',
+                        'site_name': 'Inshore Surface Mooring',
+                        'display_name': u'CTD Pumped',
+                        'long_display_name': u'Endurance Inshore Surface Mooring - Multi-Function Node - CTD',
+                        'variables': parameters,
+                        'units': ['1'] * len(parameters),
+                        'parameter_id': ['pd%d' % n for n in range(len(parameters))],
+                        'parameter_display_name': [name.title() for name in parameters],
+                        'lat_lon': [44.6583, -124.0956],
+                        'depth': 25.0})
+    return streams
+
+
+class ShardedValueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.streams = make_streams(5000)
+        self.store = ShardedValue('test_sharded_streams', timeout=600, group=itemgetter('reference_designator'),
+                                  shard_size=250)
+
+    def tearDown(self):
+        self.store.delete()
+        self.app_context.pop()
+
+    def test_list(self):
+        self.store.set(self.streams)
+        self.assertEqual(self.store.count(), 5000)
+        self.assertEqual(self.store.get(), self.streams)
+
+        items, total = self.store.page(990, 20)
+        self.assertEqual(total, 5000)
+        self.assertEqual(items, self.streams[990:1010])
+        self.assertEqual(self.store.page(4990, 20)[0], self.streams[4990:])
+
+        rd = self.streams[7]['reference_designator']
+        self.assertEqual(self.store.get_group(rd), [item for item in self.streams if item['reference_designator'] == rd])
+        self.assertEqual(self.store.get_group('unknown'), [])
+
+        # Replacing the value removes the shards of the previous value.
+        manifest = cache.get(self.store.key)
+        self.store.set(self.streams[:10])
+        self.assertEqual(cache.get(self.store._shard_key(manifest['version'], 0)), None)
+        self.assertEqual(self.store.get(), self.streams[:10])
+
+    def test_dict_and_unsharded_value(self):
+        store = ShardedValue('test_sharded_dict', timeout=600, shard_size=3)
+        value = dict(('CE0%dISSM' % i, {'name': 'Mooring %d' % i, 'id': i}) for i in range(10))
+        store.set(value)
+        self.assertEqual(store.get(), value)
+        self.assertEqual(store.get_group('CE04ISSM'), {'name': 'Mooring 4', 'id': 4})
+        self.assertEqual(store.get_group('unknown'), None)
+
+        # Values cached before sharding are still read.
+        cache.set('test_sharded_dict', value)
+        self.assertEqual(store.get(), value)
+        self.assertEqual(store.get_group('CE04ISSM'), {'name': 'Mooring 4', 'id': 4})
+        store.delete()
+        self.assertEqual(store.get(), None)
+
+    def test_encodings(self):
+        value = [{'id': 1, 'name': u'caf\xe9', 'data': 'bytes', 'values': [1.5, None, True]}]
+        for codec in ['msgpack', 'pickle']:
+            for compression in ['zlib', 'lz4', '']:
+                self.assertEqual(decode(encode(value, codec, compression)), value)
+
+    def test_size(self):
+        pickled = len(pickle.dumps(self.streams, pickle.HIGHEST_PROTOCOL))
+        sizes = dict(('%s %s' % (codec, compression or 'none'), len(encode(self.streams, codec, compression)))
+                     for codec in ['pickle', 'msgpack'] for compression in ['', 'zlib'])
+        self.assertTrue(sizes['pickle zlib'] * 3 < pickled, sizes)
+        if msgpack is not None:
+            self.assertTrue(sizes['msgpack zlib'] * 3 < pickled, sizes)
+
+    @skipIf(not os.getenv('OOI_BENCHMARKS'), 'Benchmarks run only when OOI_BENCHMARKS is set.')
+    def test_decode_benchmark(self):
+        results = {}
+        for codec in ['pickle', 'msgpack']:
+            for compression in ['', 'zlib']:
+                data = encode(self.streams, codec, compression)
+                start = time.time()
+                decode(data)
+                results['%s %s' % (codec, compression or 'none')] = (len(data), time.time() - start)
+        summary = ', '.join(['%s: %d bytes %.3fs' % (name, size, seconds)
+                             for name, (size, seconds) in sorted(results.items())])
+
+        # Reading a page or a group decodes one shard instead of the whole list.
+        self.store.set(self.streams)
+        start = time.time()
+        self.store.get()
+        full_seconds = time.time() - start
+        start = time.time()
+        self.store.page(2500, 20)
+        self.store.get_group(self.streams[2500]['reference_designator'])
+        page_seconds = (time.time() - start) / 2
+        self.assertTrue(page_seconds * 5 < full_seconds,
+                        'seconds: page %.4f, full list %.4f; %s' % (page_seconds, full_seconds, summary))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+'''
+Tests the data catalog stream list search index.
+
+'''
+
+import unittest
+from ooiservices.app import create_app
+
+
+def make_stream(rd, stream_name, end, array_name, site_name, parameters):
+    return {'reference_designator': rd,
+            'stream_name': stream_name,
+            'end': end,
+            'start': '2014-01-01T00:00:00.000Z',
+            'array_name': array_name,
+            'site_name': site_name,
+            'platform_name': site_name,
+            'assembly_name': 'Mooring Riser',
+            'display_name': rd[-9:],
+            'long_display_name': ' - '.join([array_name, site_name, rd[-9:]]),
+            'parameter_display_name': parameters}
+
+
+class StreamIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import stream_index
+        self.stream_index = stream_index
+        self.streams = [
+            make_stream('GP03FLMA-RIS01-04-PHSENF000', 'recovered-inst_phsen-abcdef-metadata',
+                        '2015-06-01T00:00:00.000Z', 'Station Papa', 'Flanking Subsurface Mooring A',
+                        ['Time, UTC', 'Seawater pH']),
+            make_stream('CE01ISSM-MFD35-04-ADCPTM000', 'telemetered_adcp-velocity-earth',
+                        '2016-01-01T00:00:00.000Z', 'Endurance', 'Inshore Surface Mooring',
+                        ['Time, UTC', 'Eastward Seawater Velocity']),
+            make_stream('CE01ISSM-MFD37-03-CTDBPC000', 'telemetered_ctdbp-cdef-dcl-instrument',
+                        '2015-01-01T00:00:00.000Z', 'Endurance', 'Inshore Surface Mooring',
+                        ['Time, UTC', 'Seawater Temperature']),
+            make_stream('RS03AXPS-SF03A-2A-CTDPFA302', 'streamed_ctdpf-sbe43-sample',
+                        '2016-02-01T00:00:00.000Z', 'Cabled', 'Axial Base Shallow Profiler Mooring',
+                        ['Time, UTC', 'Seawater Temperature'])]
+        self.index = self.stream_index.build_stream_index(self.streams)
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_search(self):
+        self.assertEqual(self.stream_index.search(self.index, ['endurance']), set([1, 2]))
+        self.assertEqual(self.stream_index.search(self.index, ['Endurance', 'ctd']), set([2]))
+        self.assertEqual(self.stream_index.search(self.index, ['temperature']), set([2, 3]))
+        self.assertEqual(self.stream_index.search(self.index, ['pH']), set([0]))
+        self.assertEqual(self.stream_index.search(self.index, ['velocity', 'cabled']), set())
+        self.assertEqual(self.stream_index.search(self.index, ['nothing']), set())
+
+    def test_concepts_and_prefixes(self):
+        self.assertEqual(self.stream_index.concept_ids(self.index, ['ce01issm', 'RS03']), set([1, 2, 3]))
+        self.assertEqual(self.stream_index.concept_ids(self.index, ['ADCPT']), set([1]))
+        self.assertEqual(self.stream_index.prefix_ids(self.index, ['CE01ISSM-MFD35']), set([1]))
+        self.assertEqual(self.stream_index.prefix_ids(self.index, ['RS', 'GP03FLMA-RIS01-04-PHSENF000']), set([0, 3]))
+
+    def test_end_time(self):
+        # 2015-01-01 to 2015-12-31 (unix seconds)
+        self.assertEqual(self.stream_index.end_time_ids(self.index, 1420070400, 1451520000), set([0, 2]))
+
+    def test_sort_and_page(self):
+        order = self.stream_index.sorted_ids(self.index, 'end')
+        self.assertEqual(order, [2, 0, 1, 3])
+        self.assertEqual(self.stream_index.page(order, None, 1, 2), [0, 1])
+        self.assertEqual(self.stream_index.page(order, None, 1, 2, reverse=True), [1, 0])
+        self.assertEqual(self.stream_index.page(order, None, 3, 5, reverse=True), [2])
+        self.assertEqual(self.stream_index.page(order, set([1, 2, 3]), 1, 1, reverse=True), [1])
+        self.assertEqual(self.stream_index.page(order, set([0, 2]), 0, None), [2, 0])
+        self.assertEqual(self.stream_index.sorted_ids(self.index, 'reference_designator'), [1, 2, 0, 3])
+        self.assertEqual(self.stream_index.sorted_ids(self.index, 'not_a_field'), None)
+
+    def test_cursor(self):
+        order = self.stream_index.sorted_ids(self.index, 'end')
+        ids, position = self.stream_index.page_after(order, None, None, 3)
+        self.assertEqual(ids, [2, 0, 1])
+        cursor = self.stream_index.encode_cursor(self.index, order, position, 'end', False)
+        position = self.stream_index.decode_cursor(self.index, order, cursor, 'end', False)
+        self.assertEqual(self.stream_index.page_after(order, None, position, 3), ([3], None))
+        self.assertEqual(self.stream_index.page_after(order, set([0, 3]), None, 1, reverse=True), ([3], 3))
+        self.assertRaises(ValueError, self.stream_index.decode_cursor, self.index, order, cursor, 'start', False)
+        self.assertRaises(ValueError, self.stream_index.decode_cursor, self.index, order, 'not a cursor', 'end',
+                          False)
+
+        # After a rebuild the cursor continues after the same stream.
+        index = self.stream_index.build_stream_index(self.streams[1:])
+        order = self.stream_index.sorted_ids(index, 'end')
+        position = self.stream_index.decode_cursor(index, order, cursor, 'end', False)
+        ids = self.stream_index.page_after(order, None, position)[0]
+        self.assertEqual([index['streams'][i]['stream_name'] for i in ids], ['streamed_ctdpf-sbe43-sample'])
+
+        index = self.stream_index.build_stream_index(self.streams[:1] + self.streams[2:])
+        order = self.stream_index.sorted_ids(index, 'end')
+        self.assertRaises(ValueError, self.stream_index.decode_cursor, index, order, cursor, 'end', False)
+
+    def test_summaries_and_projection(self):
+        stream = dict(self.streams[0], variables=['time', 'ph_seawater'], parameter_id=['pd7', 'pd939'])
+        self.assertEqual(self.stream_index.stream_summary(stream), self.streams[0])
+        self.assertEqual(self.stream_index.stream_parameters(stream),
+                         {'variables': ['time', 'ph_seawater'], 'parameter_id': ['pd7', 'pd939']})
+        self.assertEqual(self.stream_index.project(self.index['streams'][1],
+                                                   ['reference_designator', 'end', 'unknown']),
+                         {'reference_designator': 'CE01ISSM-MFD35-04-ADCPTM000', 'end': '2016-01-01T00:00:00.000Z'})
+
+    def test_min(self):
+        stream = dict(self.streams[0], cruise_number=None, deployment_number=3, depth='NaN', lat_lon=None,
+                      stream_display_name=None, stream_type='recovered-inst', variables=['time', 'ph_seawater'],
+                      parameter_id=['pd7', 'pd939'], units=['seconds since 1900-01-01', '1'],
+                      variable_type={'time': 'float64'}, variable_types={'time': 'float'},
+                      variables_shape={'time': 'scalar'}, download={'csv': 'api/uframe/get_csv'})
+        expected = set(['array_name', 'assembly_name', 'cruise_number', 'deployment_number', 'depth', 'display_name',
+                        'end', 'lat_lon', 'long_display_name', 'parameter_display_name', 'platform_name',
+                        'reference_designator', 'site_name', 'start', 'stream_display_name', 'stream_name',
+                        'stream_type'])
+        # 'min' streams keep every field but the parameter arrays and download links, read from the summary.
+        self.assertEqual(set(self.stream_index.stream_min(stream)), expected)
+        summary = self.stream_index.stream_summary(stream)
+        self.assertEqual(set(self.stream_index.stream_min(summary)), expected)
+        self.assertEqual(self.stream_index.stream_min(summary)['parameter_display_name'],
+                         ['Time, UTC', 'Seawater pH'])
+
+    def test_get_stream(self):
+        streams = [dict(stream, variables=['time'], parameter_id=['pd7']) for stream in self.streams]
+        self.stream_index.stream_list_store.set([self.stream_index.stream_summary(stream) for stream in streams])
+        self.stream_index.stream_parameters_store.set(dict((self.stream_index.stream_key(stream),
+                                                            self.stream_index.stream_parameters(stream))
+                                                           for stream in streams))
+        try:
+            # Summaries and parameter arrays are joined again.
+            self.assertEqual(self.stream_index.get_stream(streams[1]['reference_designator'],
+                                                          streams[1]['stream_name']), streams[1])
+            self.assertEqual(self.stream_index.get_stream(streams[1]['reference_designator'], 'other'), None)
+        finally:
+            self.stream_index.stream_list_store.delete()
+            self.stream_index.stream_parameters_store.delete()
+
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+'''
+Tests the time-window tile cache for uframe particle data.
+
+'''
+
+import unittest
+from ooiservices.app import create_app, cache
+
+DAY = 86400
+FIRST = 16000
+COSMO_CONSTANT = 2208988800
+
+
+def make_particle(unix_time):
+    return {'pk': {'time': unix_time + COSMO_CONSTANT, 'stream': 'ctdbp_cdef_instrument'},
+            'temperature': float(unix_time % DAY)}
+
+
+class TileCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app.config['UFRAME_TILE_CACHE_DIR'] = ''
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe.tile_cache import TileCache
+        from ooiservices.app.uframe.particles import NoParticlesError
+        self.NoParticlesError = NoParticlesError
+        self.tiles = TileCache('CE01ISSM', 'MFD37', '03-CTDBPC000', 'telemetered', 'ctdbp_cdef_instrument',
+                               '0', [7, 193], ['temperature'], 64, DAY)
+        # Serve requests from self.particles instead of uframe, recording each requested window.
+        self.tiles.request = self.request
+        self.requests = []
+        self.particles = []
+        self.no_data = False
+        self.clear()
+
+    def tearDown(self):
+        self.clear()
+        self.app_context.pop()
+
+    def clear(self):
+        for index in range(FIRST - 1, FIRST + 6):
+            cache.delete(self.tiles.key(index))
+
+    def request(self, begin, end, limit):
+        self.requests.append((begin, end))
+        if self.no_data:
+            raise self.NoParticlesError('No data available for the requested time window.')
+        return [particle for particle in self.particles
+                if begin <= particle['pk']['time'] - COSMO_CONSTANT <= end]
+
+    def test_split(self):
+        start = FIRST * DAY
+        # Particles on a tile boundary belong to the tile starting there.
+        self.particles = [make_particle(start + offset) for offset in [0, 10, DAY - 1, DAY, 2 * DAY + 5]]
+        tiles = self.tiles.fetch(FIRST, FIRST + 3)
+        self.assertEqual(self.requests, [(start, start + 3 * DAY)])
+        self.assertEqual(sorted(tiles.keys()), [FIRST, FIRST + 1, FIRST + 2])
+        self.assertEqual(list(tiles[FIRST].column('temperature')), [0.0, 10.0, DAY - 1.0])
+        self.assertEqual(list(tiles[FIRST + 1].column('temperature')), [0.0])
+        self.assertEqual(list(tiles[FIRST + 2].column('temperature')), [5.0])
+        self.assertEqual([tiles[index].received for index in sorted(tiles)], [3, 1, 1])
+
+    def test_missing_runs(self):
+        start = FIRST * DAY
+        self.particles = [make_particle(start + day * DAY + 100) for day in range(5)]
+        self.tiles.get_window(start + DAY, start + 2 * DAY)
+        self.assertEqual(self.requests, [(start + DAY, start + 2 * DAY)])
+
+        # Only the runs of tiles not yet cached are requested, one request per run.
+        self.requests = []
+        frame = self.tiles.get_window(start, start + 4 * DAY)
+        self.assertEqual(self.requests, [(start, start + DAY), (start + 2 * DAY, start + 4 * DAY)])
+        self.assertEqual(len(frame), 4)
+
+        self.requests = []
+        self.tiles.get_window(start, start + 4 * DAY)
+        self.assertEqual(self.requests, [])
+
+    def test_window_trim(self):
+        start = FIRST * DAY
+        self.particles = [make_particle(start + offset) for offset in range(0, 2 * DAY, 3600)]
+        frame = self.tiles.get_window(start + 7200, start + DAY + 3600)
+        times = frame.time - COSMO_CONSTANT
+        # The window bounds are inclusive.
+        self.assertEqual(times[0], start + 7200)
+        self.assertEqual(times[-1], start + DAY + 3600)
+        self.assertEqual(len(frame), 24)
+
+    def test_no_data(self):
+        start = FIRST * DAY
+        self.no_data = True
+        frame = self.tiles.get_window(start, start + 2 * DAY)
+        self.assertEqual(len(frame), 0)
+        self.assertEqual(len(self.requests), 1)
+
+        # Empty tiles are cached like any other.
+        self.tiles.get_window(start, start + 2 * DAY)
+        self.assertEqual(len(self.requests), 1)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+'''
+Tests the incremental refresh of the compiled uframe toc.
+
+'''
+
+import unittest
+from copy import deepcopy
+from ooiservices.app import create_app, cache
+
+
+def make_toc(rds, end_time='2016-01-01T00:00:00.000Z'):
+    instruments = []
+    parameters_by_stream = {}
+    for rd in rds:
+        stream = rd[-9:].lower() + '_instrument'
+        instruments.append({'reference_designator': rd,
+                            'platform_code': rd[:8],
+                            'mooring_code': rd[9:14],
+                            'instrument_code': rd[15:],
+                            'streams': [{'stream': stream, 'method': 'telemetered', 'sensor': rd,
+                                         'beginTime': '2015-01-01T00:00:00.000Z', 'endTime': end_time}]})
+        parameters_by_stream[stream] = ['PD7']
+    definitions = [{'pdId': 'PD7', 'particle_key': 'time', 'shape': 'SCALAR', 'type': 'DOUBLE',
+                    'units': 'seconds since 1900-01-01', 'fillValue': '-9999999'}]
+    return {'instruments': instruments, 'parameters_by_stream': parameters_by_stream,
+            'parameter_definitions': definitions}
+
+
+class TocCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import toc_cache
+        from ooiservices.app.uframe.vocab import vocab_table
+        self.toc_cache = toc_cache
+        self.vocab_table = vocab_table
+        self.processed = []
+        self.rds = ['CE01ISSM-MFD35-04-ADCPTM000', 'CE01ISSM-MFD37-03-CTDBPC000', 'RS03AXPS-SF03A-2A-CTDPFA302']
+
+    def tearDown(self):
+        self.toc_cache.compiled_toc.clear()
+        self.vocab_table.clear()
+        cache.delete('toc_deltas')
+        self.app_context.pop()
+
+    def process(self, data):
+        result = []
+        for instrument in data['instruments']:
+            self.processed.append(instrument['reference_designator'])
+            result.append({'reference_designator': instrument['reference_designator'],
+                           'streams': instrument['streams']})
+        return result
+
+    def test_refresh(self):
+        toc, first = self.toc_cache.refresh_compiled_toc(make_toc(self.rds), self.process)
+        self.assertEqual(self.processed, self.rds)
+        self.assertEqual([item['reference_designator'] for item in toc], self.rds)
+        self.assertEqual(self.toc_cache.get_toc_version(), first)
+
+        # Unchanged toc: nothing is processed and the version is kept.
+        self.processed = []
+        toc, version = self.toc_cache.refresh_compiled_toc(make_toc(self.rds), self.process)
+        self.assertEqual(self.processed, [])
+        self.assertEqual(version, first)
+        self.assertEqual(len(toc), 3)
+
+        # One instrument changed, one removed and one added.
+        rds = self.rds[1:] + ['GP03FLMA-RIS01-04-PHSENF000']
+        data = make_toc(rds)
+        data['instruments'][1]['streams'][0]['endTime'] = '2016-02-01T00:00:00.000Z'
+        toc, second = self.toc_cache.refresh_compiled_toc(data, self.process)
+        self.assertEqual(sorted(self.processed), ['GP03FLMA-RIS01-04-PHSENF000', 'RS03AXPS-SF03A-2A-CTDPFA302'])
+        self.assertEqual([item['reference_designator'] for item in toc], rds)
+        self.assertEqual(toc[1]['streams'][0]['endTime'], '2016-02-01T00:00:00.000Z')
+        self.assertEqual(self.toc_cache.get_toc_reference_designators(), rds)
+
+        delta = self.toc_cache.toc_delta_since(first)
+        self.assertEqual(delta, {'added': ['GP03FLMA-RIS01-04-PHSENF000'],
+                                 'removed': ['CE01ISSM-MFD35-04-ADCPTM000'],
+                                 'changed': ['RS03AXPS-SF03A-2A-CTDPFA302']})
+        self.assertEqual(self.toc_cache.toc_delta_since(second), {'added': [], 'removed': [], 'changed': []})
+        self.assertEqual(self.toc_cache.toc_delta_since('unknown'), None)
+
+        # Parameter definitions are part of an instrument's content.
+        self.processed = []
+        data = make_toc(rds)
+        data['instruments'][1]['streams'][0]['endTime'] = '2016-02-01T00:00:00.000Z'
+        data['parameter_definitions'][0]['units'] = 'seconds since 1970-01-01'
+        self.toc_cache.refresh_compiled_toc(deepcopy(data), self.process)
+        self.assertEqual(sorted(self.processed), sorted(rds))
+        self.assertEqual(sorted(self.toc_cache.toc_delta_since(first)['changed']),
+                         ['CE01ISSM-MFD37-03-CTDBPC000', 'RS03AXPS-SF03A-2A-CTDPFA302'])
+
+    def test_vocab_change(self):
+        toc, first = self.toc_cache.refresh_compiled_toc(make_toc(self.rds), self.process)
+
+        # Display names are resolved from the vocabulary: a new vocab table processes every instrument again.
+        self.processed = []
+        self.vocab_table.publish({'vocab_dict': {}, 'vocab_codes': {}})
+        toc, second = self.toc_cache.refresh_compiled_toc(make_toc(self.rds), self.process)
+        self.assertEqual(self.processed, self.rds)
+        self.assertNotEqual(second, first)
+        self.assertEqual(self.toc_cache.toc_delta_since(first), {'added': [], 'removed': [], 'changed': self.rds})
+
+        self.processed = []
+        toc, version = self.toc_cache.refresh_compiled_toc(make_toc(self.rds), self.process)
+        self.assertEqual(self.processed, [])
+        self.assertEqual(version, second)
+
+    def test_merge_deltas(self):
+        deltas = [{'added': ['A', 'B'], 'removed': ['C'], 'changed': ['D']},
+                  {'added': ['C'], 'removed': ['B', 'D'], 'changed': ['A']}]
+        self.assertEqual(self.toc_cache.merge_deltas(deltas), {'added': ['A'], 'removed': ['D'], 'changed': ['C']})
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+'''
+Tests the hierarchical model of the processed uframe toc.
+
+'''
+
+import unittest
+from ooiservices.app import create_app, cache
+
+
+def make_toc(rds):
+    toc = []
+    for rd in rds:
+        toc.append({'reference_designator': rd,
+                    'mooring_code': rd[:8],
+                    'platform_code': rd[9:14],
+                    'instrument_code': rd[15:],
+                    'mooring_display_name': 'Mooring %s' % rd[:8],
+                    'platform_display_name': 'Platform %s' % rd[:14],
+                    'instrument_display_name': 'Instrument %s' % rd,
+                    'streams': [{'stream': rd[-9:].lower() + '_instrument', 'method': 'telemetered'}],
+                    'instrument_parameters': [{'particleKey': 'time', 'pdId': 'PD7'}]})
+    return toc
+
+
+class TocTreeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import toc_tree
+        self.toc_tree = toc_tree
+        self.rds = ['CE01ISSM-MFD35-04-ADCPTM000', 'CE01ISSM-MFD37-03-CTDBPC000', 'CE01ISSM-MFD37-03-DOSTAD000',
+                    'CE02SHSM-RID27-03-CTDBPC000', 'RS03AXPS-SF03A-2A-CTDPFA302']
+        self.tree = self.toc_tree.build_toc_tree(make_toc(self.rds), {'CE': 'Coastal Endurance'})
+
+    def tearDown(self):
+        self.toc_tree.toc_tree.clear()
+        cache.delete('toc_tree_toc_version')
+        self.app_context.pop()
+
+    def test_levels(self):
+        arrays = self.toc_tree.get_toc_level(self.tree, 'array')
+        self.assertEqual([item['reference_designator'] for item in arrays], ['CE', 'RS'])
+        self.assertEqual(arrays[0]['display_name'], 'Coastal Endurance')
+        moorings = self.toc_tree.get_toc_level(self.tree, 'mooring')
+        self.assertEqual([item['reference_designator'] for item in moorings], ['CE01ISSM', 'CE02SHSM', 'RS03AXPS'])
+        platforms = self.toc_tree.get_toc_level(self.tree, 'platform')
+        self.assertEqual(len(platforms), 4)
+        self.assertEqual(platforms[1], {'reference_designator': 'CE01ISSM-MFD37', 'level': 'platform',
+                                        'parent': 'CE01ISSM', 'display_name': 'Platform CE01ISSM-MFD37',
+                                        'array_code': 'CE', 'mooring_code': 'CE01ISSM', 'platform_code': 'MFD37'})
+        instruments = self.toc_tree.get_toc_level(self.tree, 'instrument', details=False)
+        self.assertEqual([item['reference_designator'] for item in instruments], self.rds)
+        self.assertTrue('streams' not in instruments[0])
+
+    def test_branch(self):
+        branch = self.toc_tree.get_toc_branch(self.tree, 'CE01ISSM-MFD37')
+        self.assertEqual(len(branch), 1)
+        self.assertEqual([item['reference_designator'] for item in branch[0]['children']],
+                         ['CE01ISSM-MFD37-03-CTDBPC000', 'CE01ISSM-MFD37-03-DOSTAD000'])
+        self.assertEqual(branch[0]['children'][0]['streams'][0]['stream'], 'ctdbpc000_instrument')
+
+        # A partial reference designator returns the topmost matching nodes.
+        branch = self.toc_tree.get_toc_branch(self.tree, 'CE0')
+        self.assertEqual([item['reference_designator'] for item in branch], ['CE01ISSM', 'CE02SHSM'])
+        branch = self.toc_tree.get_toc_branch(self.tree, 'CE', depth=1)
+        self.assertEqual([item['reference_designator'] for item in branch[0]['children']], ['CE01ISSM', 'CE02SHSM'])
+        self.assertTrue('children' not in branch[0]['children'][0])
+        self.assertEqual(self.toc_tree.get_toc_branch(self.tree, 'GP'), [])
+        self.assertEqual(len(self.toc_tree.get_toc_branch(self.tree, '')), 2)
+
+    def test_update(self):
+        self.toc_tree.update_toc_tree(make_toc(self.rds), 'v1')
+        self.assertEqual(len(self.toc_tree.toc_tree.get()['levels']['instrument']), 5)
+        # Not rebuilt for the same toc version.
+        self.toc_tree.update_toc_tree(make_toc(self.rds[:2]), 'v1')
+        self.assertEqual(len(self.toc_tree.toc_tree.get()['levels']['instrument']), 5)
+        self.toc_tree.update_toc_tree(make_toc(self.rds[:2]), 'v2')
+        self.assertEqual(len(self.toc_tree.toc_tree.get()['levels']['instrument']), 2)
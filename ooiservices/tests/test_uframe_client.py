@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+'''
+Tests for the pooled uframe client (ooiservices/app/uframe/client.py).
+
+'''
+
+import unittest
+import gzip
+import io
+import os
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError, ReadTimeout
+from requests.models import Response
+from requests.packages.urllib3.response import HTTPResponse
+from ooiservices.app import create_app
+
+
+class FakeRaw(object):
+    def release_conn(self):
+        pass
+
+
+class FakeAdapter(BaseAdapter):
+    """ Adapter answering from a list of outcomes (status codes or exceptions to raise).
+    """
+    def __init__(self, outcomes):
+        super(FakeAdapter, self).__init__()
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = Response()
+        response.url = request.url
+        response.request = request
+        if isinstance(outcome, tuple):
+            response.status_code, headers, body = outcome
+            response.headers.update(headers)
+            response.raw = HTTPResponse(body=io.BytesIO(body), headers=headers, preload_content=False)
+        else:
+            response.status_code = outcome
+            response._content = b'{}'
+            response.raw = FakeRaw()
+        return response
+
+    def close(self):
+        pass
+
+
+class UFrameClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import client
+        self.client_module = client
+        self.sleeps = []
+        self._sleep = self.client_module.time.sleep
+        self.client_module.time.sleep = self.sleeps.append
+        self.client = self.client_module.UFrameClient()
+
+    def tearDown(self):
+        self.client_module.time.sleep = self._sleep
+        self.app_context.pop()
+
+    def mount(self, url, outcomes):
+        adapter = FakeAdapter(outcomes)
+        self.client.session(url).mount('http://', adapter)
+        return adapter
+
+    def test_base_url_and_endpoint_name(self):
+        url = 'http://localhost:12576/sensor/inv/CE01ISSM/MFD35/04-ADCPTM000?limit=10'
+        self.assertEqual(self.client_module.base_url(url), 'http://localhost:12576')
+        self.assertEqual(self.client_module.endpoint_name('get', url), 'GET localhost:12576/sensor/inv')
+        self.assertEqual(self.client_module.endpoint_name('put', 'http://localhost:12573/assets/1234', depth=2),
+                         'PUT localhost:12573/assets/{id}')
+
+    def test_session_per_base_url(self):
+        first = self.client.session('http://localhost:12576/sensor/inv')
+        self.assertIs(first, self.client.session('http://localhost:12576/sensor/inv/toc'))
+        self.assertIsNot(first, self.client.session('http://localhost:12573/assets'))
+
+    def test_default_timeout_and_metrics(self):
+        adapter = self.mount('http://localhost:12576', [200, 404])
+        self.client.get('http://localhost:12576/sensor/inv/toc')
+        self.client.get('http://localhost:12576/sensor/inv/XX', timeout=(1, 2))
+        self.assertEqual(adapter.requests[0][1]['timeout'], (5, 30))
+        self.assertEqual(adapter.requests[1][1]['timeout'], (1, 2))
+        metrics = self.client.metrics()['GET localhost:12576/sensor/inv']
+        self.assertEqual(metrics['count'], 2)
+        self.assertEqual(metrics['errors'], 0)
+        self.assertEqual(metrics['status_codes'], {'200': 1, '404': 1})
+
+    def test_retry_with_backoff(self):
+        adapter = self.mount('http://localhost:12576', [ConnectionError('refused'), 503, 200])
+        response = self.client.get('http://localhost:12576/sensor/inv/toc')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(adapter.requests), 3)
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+        self.assertEqual(self.client.metrics()['GET localhost:12576/sensor/inv']['errors'], 1)
+
+    def test_no_retry(self):
+        # Read timeouts and non idempotent requests are not retried.
+        adapter = self.mount('http://localhost:12576', [ReadTimeout('slow'), ConnectionError('refused')])
+        self.assertRaises(ReadTimeout, self.client.get, 'http://localhost:12576/sensor/inv/toc')
+        self.assertRaises(ConnectionError, self.client.post, 'http://localhost:12576/sensor/inv/toc')
+        self.assertEqual(len(adapter.requests), 2)
+        self.assertEqual(self.sleeps, [])
+
+    def test_retries_exhausted(self):
+        self.mount('http://localhost:12576', [503, 503, 503])
+        response = self.client.get('http://localhost:12576/sensor/inv/toc')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+
+
+class ProxyResponseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app.config['UFRAME_PROXY_CHUNK_SIZE'] = 1024
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import client
+        self.client_module = client
+        self._client = self.client_module.uframe_client
+        self.client_module.uframe_client = self.client_module.UFrameClient()
+
+    def tearDown(self):
+        self.client_module.uframe_client = self._client
+        self.app_context.pop()
+
+    def test_proxy_binary_body(self):
+        body = os.urandom(8192)
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as f:
+            f.write(body)
+        compressed = compressed.getvalue()
+        headers = {'Content-Type': 'application/netcdf', 'Content-Length': str(len(compressed)),
+                   'Content-Encoding': 'gzip', 'Content-Disposition': 'attachment; filename=data.nc',
+                   'Server': 'uframe'}
+        adapter = FakeAdapter([(200, headers, compressed)])
+        self.client_module.uframe_client.session('http://localhost:12576').mount('http://', adapter)
+
+        response = self.client_module.proxy_response('http://localhost:12576/sensor/inv/XX?format=application/netcdf')
+        self.assertTrue(adapter.requests[0][1]['stream'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/netcdf')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Content-Disposition'], 'attachment; filename=data.nc')
+        self.assertNotIn('Server', response.headers)
+        chunks = list(response.response)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(b''.join(chunks), compressed)
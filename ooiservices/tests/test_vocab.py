@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+'''
+Tests the in-process vocabulary table and bulk display name resolution.
+
+'''
+
+import unittest
+from unittest import skipIf
+import os
+import time
+from ooiservices.app import create_app, cache
+
+ARRAYS = {'CE': 'Endurance', 'CP': 'Pioneer', 'GA': 'Argentine Basin', 'GI': 'Irminger Sea',
+          'GP': 'Station Papa', 'GS': 'Southern Ocean', 'RS': 'Cabled'}
+SUBSITES = {'ISSM': 'Inshore Surface Mooring', 'OSSM': 'Offshore Surface Mooring',
+            'FLMA': 'Flanking Subsurface Mooring A', 'FLMB': 'Flanking Subsurface Mooring B',
+            'HYPM': 'Apex Profiler Mooring', 'SUMO': 'Apex Surface Mooring'}
+NODES = {'MF': 'Multi-Function Node', 'RI': 'Mooring Riser', 'SB': 'Surface Buoy', 'WF': 'Wire-Following Profiler'}
+CLASSES = {'CTDBP': 'CTD Pumped', 'DOSTA': 'Dissolved Oxygen Stable Response', 'FLORT': '3-Wavelength Fluorometer',
+           'NUTNR': 'Nitrate', 'PHSEN': 'Seawater pH', 'VELPT': 'Single Point Velocity Meter'}
+
+
+def make_vocab():
+    """ Vocabulary for a synthetic reference designator set the size of the OOI set (~1000 instruments).
+    """
+    vocab_dict = {}
+    for array_code, array_name in sorted(ARRAYS.items()):
+        vocab_dict[array_code] = {'long_name': array_name, 'name': array_name, 'id': 0}
+        for subsite_code, subsite_name in sorted(SUBSITES.items()):
+            mooring = '%s01%s' % (array_code, subsite_code)
+            vocab_dict[mooring] = {'long_name': ' '.join([array_name, subsite_name]), 'name': subsite_name, 'id': 0}
+            for node_code, node_name in sorted(NODES.items()):
+                platform = '%s-%s%s01' % (mooring, node_code, 'C' if node_code != 'RI' else 'D')
+                vocab_dict[platform] = {'long_name': ' '.join([array_name, subsite_name]) + ' - ' + node_name,
+                                        'name': node_name, 'id': 0}
+                for port, (class_code, class_name) in enumerate(sorted(CLASSES.items())):
+                    rd = '%s-%02d-%sA000' % (platform, port, class_code)
+                    long_name = ' - '.join([' '.join([array_name, subsite_name]), node_name, class_name])
+                    vocab_dict[rd] = {'long_name': long_name, 'name': class_name, 'id': len(vocab_dict)}
+    codes = {'arrays': ARRAYS, 'subsites': SUBSITES, 'nodes': NODES, 'classes': CLASSES}
+    return vocab_dict, codes
+
+
+class VocabTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TESTING_CONFIG')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        from ooiservices.app.uframe import vocab
+        self.vocab = vocab
+        self.vocab_dict, self.codes = make_vocab()
+        self.vocab.publish_vocab(self.vocab_dict, self.codes)
+
+    def tearDown(self):
+        self.vocab.vocab_table.clear()
+        self.vocab.vocab_dict_store.delete()
+        cache.delete('vocab_codes')
+        self.app_context.pop()
+
+    def test_lookup(self):
+        rd = 'CE01ISSM-MFC01-02-FLORTA000'
+        self.assertEqual(len(rd), 27)
+        self.assertEqual(self.vocab.get_display_name_by_rd(rd), '3-Wavelength Fluorometer')
+        self.assertEqual(self.vocab.get_long_display_name_by_rd(rd),
+                         'Endurance Inshore Surface Mooring - Multi-Function Node - 3-Wavelength Fluorometer')
+        self.assertEqual(self.vocab.get_display_name_by_rd('CE01ISSM'), 'Inshore Surface Mooring')
+        self.assertEqual(self.vocab.get_display_name_by_rd('CE01ISSM-MFC01'), 'Multi-Function Node')
+        self.assertEqual(self.vocab.get_display_name_by_rd('CE'), 'Endurance')
+
+        names = self.vocab.resolve_names([rd, rd[:8], rd[:14]])
+        self.assertEqual(names[rd]['name'], '3-Wavelength Fluorometer')
+        self.assertEqual(names[rd[:8]]['long_name'], 'Endurance Inshore Surface Mooring')
+        self.assertEqual(names[rd[:14]]['name'], 'Multi-Function Node')
+
+    def test_republish(self):
+        rd = 'CE01ISSM-MFC01-02-FLORTA000'
+        vocab_dict = dict(self.vocab_dict)
+        vocab_dict[rd] = dict(vocab_dict[rd], name='Fluorometer')
+        self.vocab.publish_vocab(vocab_dict, self.codes)
+        self.assertEqual(self.vocab.get_display_name_by_rd(rd), 'Fluorometer')
+
+    def all_reference_designators(self):
+        rds = []
+        for rd in self.vocab_dict:
+            if len(rd) == 27:
+                rds.extend([rd, rd[:8], rd[:14]])
+        return rds
+
+    def test_resolve_all_names(self):
+        rds = self.all_reference_designators()
+        self.assertTrue(len(rds) > 3000)
+        names = self.vocab.resolve_names(rds)
+        self.assertEqual(len(names), len(set(rds)))
+        self.assertEqual([names[rd]['name'] for rd in rds[:300]],
+                         [self.vocab.get_display_name_by_rd(rd) for rd in rds[:300]])
+
+    @skipIf(not os.getenv('OOI_BENCHMARKS'), 'Benchmarks run only when OOI_BENCHMARKS is set.')
+    def test_resolve_names_benchmark(self):
+        rds = self.all_reference_designators()
+
+        # Lookup through the cache: vocab_dict entry and vocab_codes fetched for each display name.
+        sample = rds[:300]
+        start = time.time()
+        for rd in sample:
+            self.vocab.vocab_dict_store.get_group(rd)['name']
+            cache.get('vocab_codes')
+        cached_seconds = (time.time() - start) / len(sample)
+
+        start = time.time()
+        self.vocab.resolve_names(rds)
+        resolve_seconds = (time.time() - start) / len(rds)
+
+        self.assertTrue(resolve_seconds * 10 < cached_seconds,
+                        'seconds per name: resolve_names %.6f, cache lookups %.6f' % (resolve_seconds, cached_seconds))
+
+    def test_batched_database_lookups(self):
+        queries = []
+
+        def load(keys):
+            queries.append(sorted(keys))
+            return dict((key, key.upper()) for key in keys if not key.startswith('missing'))
+
+        names = ['stream_%d' % i for i in range(self.vocab.DB_BATCH_SIZE + 10)] + ['missing_stream']
+        with self.vocab.name_cycle():
+            result = self.vocab._load_names('stream', names, load)
+            self.assertEqual(len(queries), 2)
+            self.assertEqual(len(result), self.vocab.DB_BATCH_SIZE + 10)
+            self.assertEqual(result['stream_7'], 'STREAM_7')
+
+            # Names (found or not) are loaded once per cycle.
+            self.assertEqual(self.vocab._load_names('stream', ['stream_7', 'missing_stream'], load),
+                             {'stream_7': 'STREAM_7'})
+            self.assertEqual(self.vocab._load_names('stream', ['stream_7', 'other'], load),
+                             {'stream_7': 'STREAM_7', 'other': 'OTHER'})
+            self.assertEqual(queries[2:], [['other']])
+
+        # Outside a cycle nothing is memoized.
+        self.vocab._load_names('stream', ['stream_7'], load)
+        self.assertEqual(queries[3:], [['stream_7']])